@@ -1,11 +1,60 @@
-from .tracing.setup import setup_tracing
-from .tracing.session import enable_session_tracking, set_session_id
-from .integrations import instrument_openai
-from .integrations import instrument_anthropic 
-from .tracing.decorators import trace, span
+import importlib
 
+# Public names resolve on first access (PEP 562), so `import agensight` stays
+# cheap and doesn't pull in the tracing stack or any provider SDK up front.
+_LAZY_ATTRS = {
+    "setup_tracing": ".tracing.setup",
+    "enable_session_tracking": ".tracing.session",
+    "set_session_id": ".tracing.session",
+    "instrument_openai": ".integrations",
+    "instrument_anthropic": ".integrations",
+    "trace": ".tracing.decorators",
+    "span": ".tracing.decorators",
+    "capture_context": ".tracing.propagation",
+    "attach_context": ".tracing.propagation",
+    "with_trace_context": ".tracing.propagation",
+    "configure_tracing": ".tracing.config",
+    "get_agent_config": ".agent_config",
+    "register_price": ".tracing.pricing",
+    "usage": ".tracing.usage",
+    "set_budget": ".tracing.usage",
+    "remove_budget": ".tracing.usage",
+    "reset_usage": ".tracing.usage",
+    "BudgetExceededError": ".tracing.usage",
+}
+
+__all__ = ["init", *_LAZY_ATTRS]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
+
+def init(
+    name="default",
+    mode="dev",
+    auto_instrument_llms=True,
+    session=None,
+    max_queue_size=None,
+    max_export_batch_size=None,
+    schedule_delay_millis=None,
+    drop_policy=None,
+    adaptive_batching=None,
+):
+    from .integrations import instrument_anthropic, instrument_openai
+    from .tracing.config import configure_tracing
+    from .tracing.session import enable_session_tracking, set_session_id
+    from .tracing.setup import setup_tracing
 
-def init(name="default", mode="dev", auto_instrument_llms=True, session=None):
     mode_to_exporter = {
         "dev": "db",
         "console": "console",
@@ -13,12 +62,21 @@ def init(name="default", mode="dev", auto_instrument_llms=True, session=None):
         "db": "db",  # also accept direct db
     }
     exporter_type = mode_to_exporter.get(mode, "console")
-    setup_tracing(service_name=name, exporter_type=exporter_type)
+    setup_tracing(
+        service_name=name,
+        exporter_type=exporter_type,
+        max_queue_size=max_queue_size,
+        max_export_batch_size=max_export_batch_size,
+        schedule_delay_millis=schedule_delay_millis,
+        drop_policy=drop_policy,
+        adaptive_batching=adaptive_batching,
+    )
 
     if session:
         enable_session_tracking()
         set_session_id(session)
     
+    configure_tracing(auto_instrument_llms=auto_instrument_llms)
     if auto_instrument_llms:
         instrument_openai()
         instrument_anthropic()
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Runtime access to agent prompts and model parameters.
+
+    config = agensight.get_agent_config("Planner")
+    messages = [{"role": "system", "content": config.render(city="Paris")}]
+    client.chat.completions.create(messages=messages, **config.model_params)
+
+Configs are read from the project's `.agensight/config.json` (falling back to
+`agensight.config.json`), or from a saved version with `version=`. Parsed
+agents and their compiled templates are cached in-process: a lookup is a
+dict access, and the file is re-checked with one os.stat at most every
+`check_interval` seconds, so edits made in the dashboard are picked up
+without a restart. Reads take no locks.
+"""
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from string import Formatter
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from .utils.agentUtils import extract_variables
+from .utils.file_cache import FileCache
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+# Saved versions are dotted numbers ("1.0.3"), as config_utils names version_{version}.json
+_VERSION_NUMBER = re.compile(r"[0-9]+(?:\.[0-9]+)*\Z")
+
+
+class PromptTemplate:
+    """
+    A prompt with `{variable}` placeholders, parsed once. Prompts using only
+    plain `{name}` fields render by joining the pre-split literals, which
+    avoids rescanning long prompt text on every call; anything fancier
+    (format specs, attribute access) falls back to str.format_map. A prompt
+    with unbalanced braces loads fine but raises ValueError when rendered, so
+    one bad prompt doesn't break the other agents of its config.
+    """
+
+    __slots__ = ("text", "variables", "error", "_parts", "_simple")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.error: Optional[ValueError] = None
+        try:
+            parts = list(Formatter().parse(text))
+        except ValueError as e:
+            self.error = e
+            self.variables: Tuple[str, ...] = ()
+            self._parts = ()
+            self._simple = False
+            return
+        self.variables = tuple(dict.fromkeys(extract_variables(text)))
+        self._simple = all(
+            name is None or (_IDENTIFIER.match(name) and not spec and conversion is None)
+            for _, name, spec, conversion in parts
+        )
+        self._parts = tuple((literal, name) for literal, name, _, _ in parts)
+
+    def render(self, values: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> str:
+        if self.error is not None:
+            raise ValueError(f"Malformed prompt template: {self.error}")
+        values = {**values, **kwargs} if values else kwargs
+        missing = [name for name in self.variables if name.split(".")[0].split("[")[0] not in values]
+        if missing:
+            raise KeyError(f"Missing prompt variables: {', '.join(missing)}")
+        if not self._simple:
+            return self.text.format_map(values)
+        out = []
+        for literal, name in self._parts:
+            out.append(literal)
+            if name is not None:
+                out.append(str(values[name]))
+        return "".join(out)
+
+    def __repr__(self):
+        return f"PromptTemplate(variables={list(self.variables)!r})"
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """One agent's prompt and model parameters. Shared and read-only."""
+    name: str
+    prompt: PromptTemplate
+    model_params: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    raw: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        return self.prompt.variables
+
+    def render(self, values: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> str:
+        """The prompt with its variables filled in"""
+        return self.prompt.render(values, **kwargs)
+
+
+def _freeze(value: Any) -> Any:
+    """A read-only deep copy of parsed JSON: dicts become mappingproxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _compile(config: Dict) -> Dict[str, AgentConfig]:
+    agents = {}
+    # Each agent stands alone: a malformed entry is skipped, not fatal to the rest
+    for agent in config.get("agents", []):
+        if not isinstance(agent, dict):
+            continue
+        name = agent.get("name")
+        if not name:
+            continue
+        model_params = agent.get("modelParams")
+        agents[name] = AgentConfig(
+            name=name,
+            prompt=PromptTemplate(str(agent.get("prompt") or "")),
+            model_params=MappingProxyType(dict(model_params) if isinstance(model_params, dict) else {}),
+            raw=_freeze(agent),
+        )
+    return agents
+
+
+def _load_agents(path: str) -> Dict[str, AgentConfig]:
+    with open(path, "r") as f:
+        return _compile(json.load(f))
+
+
+class AgentConfigClient:
+    def __init__(self, project_dir: Optional[str] = None, check_interval: float = 1.0):
+        # Resolved once: per-call lookups shouldn't pay for os.getcwd()
+        self.project_dir = os.path.abspath(project_dir or os.getcwd())
+        self.config_dir = os.path.join(self.project_dir, ".agensight")
+        self._cache = FileCache(check_interval=check_interval)
+        self._main_sources = (
+            (os.path.join(self.config_dir, "config.json"), _load_agents),
+            (os.path.join(self.project_dir, "agensight.config.json"), _load_agents),
+        )
+        self._version_sources: Dict[str, tuple] = {}
+
+    def _sources(self, version: Optional[str]):
+        if not version:
+            return self._main_sources
+        sources = self._version_sources.get(version)
+        if sources is None:
+            # Also keeps the version from naming a file outside the versions directory
+            if not _VERSION_NUMBER.match(str(version)):
+                raise ValueError(f"Invalid config version {version!r}; expected a version number like '1.0.0'")
+            path = os.path.join(self.config_dir, "versions", f"version_{version}.json")
+            sources = self._version_sources[version] = ((path, self._load_version),)
+        return sources
+
+    def _load_version(self, path: str) -> Dict[str, AgentConfig]:
+        # Saved versions are trees of content-addressed objects (or full copies in older ones)
+        from .server.utils.config_store import FileObjectStore, load_tree
+
+        with open(path, "r") as f:
+            version_data = json.load(f)
+        if "tree" in version_data:
+            return _compile(load_tree(version_data["tree"], FileObjectStore(os.path.join(self.config_dir, "objects"))))
+        return _compile(version_data.get("config") or {})
+
+    def agents(self, version: Optional[str] = None) -> Mapping[str, AgentConfig]:
+        """All agents of the main config, or of a saved version"""
+        for path, loader in self._sources(version):
+            try:
+                return self._cache.get(path, loader)
+            except FileNotFoundError:
+                continue
+        where = f"version {version}" if version else "config"
+        raise FileNotFoundError(f"No agensight {where} found under {self.project_dir}")
+
+    def get(self, name: str, version: Optional[str] = None) -> AgentConfig:
+        agents = self.agents(version)
+        try:
+            return agents[name]
+        except KeyError:
+            raise KeyError(f"Agent {name!r} not found; known agents: {', '.join(agents) or 'none'}") from None
+
+
+_default_client: Optional[AgentConfigClient] = None
+_default_client_lock = threading.Lock()
+
+
+def _client() -> AgentConfigClient:
+    global _default_client
+    client = _default_client
+    if client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = AgentConfigClient()
+            client = _default_client
+    return client
+
+
+def get_agent_config(name: str, version: Optional[str] = None) -> AgentConfig:
+    """
+    The prompt and model parameters of agent `name`, from the main config or
+    a saved `version`. Cached; the config file is re-checked at most once a
+    second.
+    """
+    return _client().get(name, version)
@@ -0,0 +1,77 @@
+"""
+Post-import hooks: run a callback once a module has been imported.
+
+Instrumentation registers with `when_imported("openai", patch)`; if the SDK is
+already loaded the callback runs immediately, otherwise it runs right after
+the application's own `import openai` finishes. Provider SDKs that are never
+imported are never loaded (or required) by agensight.
+"""
+import importlib.abc
+import sys
+import threading
+from typing import Callable, Dict, List
+
+_hooks: Dict[str, List[Callable]] = {}
+_lock = threading.RLock()
+
+
+def _run_hooks(name: str) -> None:
+    with _lock:
+        callbacks = _hooks.pop(name, [])
+    module = sys.modules.get(name)
+    for callback in callbacks:
+        callback(module)
+
+
+class _LoaderWrapper(importlib.abc.Loader):
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.loader.exec_module(module)
+        _run_hooks(self.name)
+
+    def __getattr__(self, item):
+        return getattr(self.loader, item)
+
+
+class _HookFinder(importlib.abc.MetaPathFinder):
+    def __init__(self):
+        self._in_progress = set()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in _hooks or fullname in self._in_progress:
+            return None
+        self._in_progress.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._in_progress.discard(fullname)
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _LoaderWrapper(spec.loader, fullname)
+        return spec
+
+
+_finder = _HookFinder()
+
+
+def when_imported(name: str, callback: Callable) -> None:
+    """Call `callback(module)` once module `name` is imported (now, if it already is)."""
+    with _lock:
+        if name not in sys.modules:
+            _hooks.setdefault(name, []).append(callback)
+            if _finder not in sys.meta_path:
+                sys.meta_path.insert(0, _finder)
+            return
+    callback(sys.modules[name])
@@ -1,8 +1,7 @@
-from anthropic._types import NOT_GIVEN
-from anthropic import Anthropic
-from anthropic.resources.messages import Messages
 from opentelemetry import trace
 import functools
+from agensight.tracing.usage import check_budget
+from ._hooks import when_imported
 
 _is_patched = False
 tracer = trace.get_tracer("claude")
@@ -13,6 +12,7 @@ def _wrap_create(original_create):
         model = kwargs.get("model", "claude-3")
         messages = kwargs.get("messages", [])
         max_tokens = kwargs.get("max_tokens", None)
+        check_budget()
 
         with tracer.start_as_current_span("claude.chat") as span:
             span.set_attribute("gen_ai.system", "Anthropic")
@@ -37,6 +37,11 @@ def _wrap_create(original_create):
                     span.set_attribute("gen_ai.usage.prompt_tokens", prompt_tokens)
                 if completion_tokens is not None:
                     span.set_attribute("gen_ai.usage.completion_tokens", completion_tokens)
+                # Billed apart from input_tokens, which doesn't include them
+                for key in ("cache_read_input_tokens", "cache_creation_input_tokens"):
+                    cache_tokens = getattr(usage, key, None)
+                    if cache_tokens:
+                        span.set_attribute(f"gen_ai.usage.{key}", cache_tokens)
 
 
 
@@ -50,12 +55,19 @@ def _wrap_create(original_create):
     return wrapper
 
 
-def instrument_anthropic():
+def _instrument(_module):
     global _is_patched
     if _is_patched:
         return
     try:
+        from anthropic.resources.messages import Messages
+
         Messages.create = _wrap_create(Messages.create)
         _is_patched = True
     except Exception:
-        pass
\ No newline at end of file
+        pass
+
+
+def instrument_anthropic():
+    """Patch `anthropic` Messages.create once the application imports `anthropic`."""
+    when_imported("anthropic", _instrument)
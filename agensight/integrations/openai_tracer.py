@@ -1,5 +1,6 @@
-from opentelemetry.instrumentation.openai import OpenAIInstrumentor
 from opentelemetry import trace
+from agensight.tracing.usage import guarded
+from ._hooks import when_imported
 
 def wrap_openai_with_tool_extraction():
     """Monkey patch OpenAI to extract tool calls"""
@@ -54,13 +55,32 @@ def wrap_openai_with_tool_extraction():
     except Exception as e:
         print(f"[agensight] Failed to patch OpenAI for tool extraction: {e}")
 
-def instrument_openai():
-    """
-    Instruments the OpenAI client for tracing.
-    Automatically adds span context to OpenAI API calls.
-    """
+_is_patched = False
+
+
+def _instrument(_module):
+    global _is_patched
+    if _is_patched:
+        return
     try:
+        from opentelemetry.instrumentation.openai import OpenAIInstrumentor
+
         OpenAIInstrumentor().instrument()
         wrap_openai_with_tool_extraction()
+        # Outside the instrumentor's wrapper, so a blocked call never starts a span
+        from openai.resources.chat.completions import AsyncCompletions, Completions
+
+        Completions.create = guarded(Completions.create)
+        AsyncCompletions.create = guarded(AsyncCompletions.create)
+        _is_patched = True
     except Exception as e:
         print(f"[agensight] OpenAI instrumentation failed: {e}")
+
+
+def instrument_openai():
+    """
+    Instruments the OpenAI client for tracing.
+    Automatically adds span context to OpenAI API calls. The patch is applied
+    when the application imports `openai` (immediately if it already has).
+    """
+    when_imported("openai", _instrument)
@@ -1,11 +1,29 @@
-from agensight.tracing.setup import setup_tracing
-from agensight.tracing.session import enable_session_tracking
-from agensight.integrations import instrument_openai
-from agensight.integrations import instrument_anthropic 
-from agensight.tracing.decorators import trace, span
+import importlib
+
+_LAZY_ATTRS = {
+    "setup_tracing": "agensight.tracing.setup",
+    "enable_session_tracking": "agensight.tracing.session",
+    "instrument_openai": "agensight.integrations",
+    "instrument_anthropic": "agensight.integrations",
+    "trace": "agensight.tracing.decorators",
+    "span": "agensight.tracing.decorators",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
 
 
 def init(name="default", exporter_type=None, auto_instrument_llms=True):
+    from agensight.integrations import instrument_anthropic, instrument_openai
+    from agensight.tracing.session import enable_session_tracking
+    from agensight.tracing.setup import setup_tracing
+
     setup_tracing(service_name=name, exporter_type=exporter_type)
     enable_session_tracking()
     if auto_instrument_llms:
@@ -1,18 +1,29 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 import os
 import logging
 from typing import Dict
-from flask import Flask
-from starlette.middleware.wsgi import WSGIMiddleware
 
 # Import routers from route modules
-from .routes.config import config_router, config_bp
-from .routes.trace import trace_router, trace_bp
-from .routes.prompt import prompt_router, prompt_bp
-from fastapi.responses import FileResponse
+from .routes.config import config_router
+from .routes.trace import trace_router
+from .routes.prompt import prompt_router
+from .routes.legacy import legacy_router
+from .routes.stream import stream_router
+from .routes.session import session_router
+from .routes.cost import cost_router
+from fastapi.responses import FileResponse, PlainTextResponse
+from agensight.tracing import metrics
+from agensight.tracing.db import ensure_schema
+from .data_source import data_source
+from .static_files import CachedStaticFiles
 
 
 
@@ -22,6 +33,8 @@ from .migration_util import import_mock_data
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# config_utils may have configured the root logger first; keep our startup logs visible
+logger.setLevel(logging.INFO)
 
 # Create FastAPI app
 app = FastAPI(title="AgenSight API")
@@ -38,31 +51,64 @@ app.add_middleware(
     expose_headers=["Content-Type", "Authorization"],
 )
 
-class NoCacheStaticFiles(StaticFiles):
-    async def get_response(self, path, scope):
-        response = await super().get_response(path, scope)
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+# Compress API responses over 1 KB. Precompressed static assets already carry
+# Content-Encoding and event streams are excluded, so both pass through as-is.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+def _route_template(request: Request) -> str:
+    """Path template of the matched route, including the prefix of the router it came from"""
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    path = request.scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    # Newer FastAPI keeps included routers, whose routes' paths leave out the prefix
+    start = path.find("/", 1)
+    while start != -1:
+        if regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
         return response
+    finally:
+        # Label by route template, not raw path, to keep label cardinality bounded.
+        metrics.http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=_route_template(request),
+            status=str(status),
+        )
+
 # Register FastAPI routes
 app.include_router(config_router, prefix="/api")
 app.include_router(trace_router, prefix="/api")
 app.include_router(prompt_router, prefix="/api")
+app.include_router(stream_router, prefix="/api")
+app.include_router(session_router, prefix="/api")
+app.include_router(cost_router, prefix="/api")
+# Legacy routes, formerly a mounted Flask app, keep their /flask-compat URLs
+app.include_router(legacy_router, prefix="/flask-compat")
 
-# Create Flask app for backward compatibility
-flask_app = Flask(__name__)
-flask_app.register_blueprint(config_bp)
-flask_app.register_blueprint(prompt_bp)
-flask_app.register_blueprint(trace_bp)
-
-# Mount Flask app for backward compatibility
-# This allows both FastAPI and Flask routes to work
-app.mount("/flask-compat", WSGIMiddleware(flask_app))
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of the server's self-metrics"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 # Serve static files
 static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ui/out"))
-app.mount("/", NoCacheStaticFiles(directory=static_dir,html=True), name="static")
+app.mount("/", CachedStaticFiles(directory=static_dir, html=True), name="static")
 
 @app.get("/")
 async def root():
@@ -73,49 +119,52 @@ async def health_check():
     """Check if the API is running"""
     return {"status": "healthy", "version": "1.0.0"}
 
+def _init_config():
+    """Initialize the file-based configuration system"""
+    from .utils.config_utils import ensure_config_initialized
+
+    config = ensure_config_initialized()
+    if config is not None:
+        logger.info(f"Configuration initialized with {len(config.get('agents', []))} agents")
+
+
+# Startup work that doesn't have to finish before the server accepts
+# connections; each phase is also done on demand by whatever needs it first.
+STARTUP_PHASES = {
+    "config": _init_config,
+    "data_source": data_source.get,
+    "trace_schema": ensure_schema,
+}
+
+
+def _record_phase(name: str, seconds: float):
+    metrics.startup_phase_duration.set(seconds, phase=name)
+    logger.info(f"Startup phase '{name}' took {seconds * 1000:.0f} ms")
+
+
+def _run_phase(name: str, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        logger.error(f"Startup phase '{name}' failed: {str(e)}")
+    finally:
+        _record_phase(name, time.perf_counter() - started)
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Run startup tasks"""
+    """Start the startup phases in the background so the socket opens immediately"""
     logger.info("Server starting up...")
+    loop = asyncio.get_running_loop()
+    app.state.startup_tasks = [
+        loop.run_in_executor(None, _run_phase, name, fn) for name, fn in STARTUP_PHASES.items()
+    ]
     logger.info("🚀 AgenSight is running! Open http://0.0.0.0:5001/dashboard in your browser.")
 
-    # Initialize the configuration system (file-based only)
-    try:
-        from .utils.config_utils import initialize_config, ensure_version_directory
-        
-        logger.info("Ensuring version directory exists...")
-        ensure_version_directory()
-        
-        # Check if agensight.config.json exists in the project root
-        user_dir = os.getcwd()  # This should be the project root
-        user_config_path = os.path.join(user_dir, 'agensight.config.json')
-        
-        if os.path.exists(user_config_path):
-            logger.info(f"Found user config at: {user_config_path}")
-            
-            # Create .agensight directory if it doesn't exist
-            agensight_dir = os.path.join(user_dir, '.agensight')
-            os.makedirs(agensight_dir, exist_ok=True)
-            
-            # Copy the config to the .agensight directory
-            internal_config_path = os.path.join(agensight_dir, 'config.json')
-            import shutil
-            shutil.copy2(user_config_path, internal_config_path)
-            logger.info(f"Copied user config to: {internal_config_path}")
-        
-        logger.info("Initializing configuration system...")
-        config = initialize_config()
-        logger.info(f"Configuration initialized with {len(config.get('agents', []))} agents")
-    except Exception as e:
-        logger.error(f"Error initializing configuration: {str(e)}")
-    
-    logger.info("Server startup complete")
-
 @app.get("/debug/data")
 async def debug_data():
     """Debug endpoint to check data import"""
-    from .data_source import data_source
-    
     try:
         # Get counts from database
         conn = data_source._get_connection()
@@ -149,6 +198,9 @@ async def debug_data():
             "message": str(e)
         }
 
+_record_phase("import", time.perf_counter() - _import_started)
+
+
 def start_server():
     """Start the server"""
     uvicorn.run("agensight.server.app:app", host="0.0.0.0", port=5001,log_level="info")
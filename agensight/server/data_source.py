@@ -6,9 +6,14 @@ import sqlite3
 import os
 import logging
 import datetime
+import threading
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+from .utils.config_store import (
+    MemoryObjectStore, SQLiteObjectStore, build_tree, diff_trees, is_tree, load_tree, store_config
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -50,6 +55,14 @@ class DataSource:
                 is_current BOOLEAN DEFAULT FALSE
             )
             """)
+
+            # Content-addressed agents and prompts referenced by config_versions trees
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS config_objects (
+                hash TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            )
+            """)
             
             # Create traces table
             cursor.execute("""
@@ -147,7 +160,7 @@ class DataSource:
             row = cursor.fetchone()
             if row:
                 logger.info(f"Found config for version {version} in database")
-                return json.loads(row[0])
+                return self._decode_config(conn, row[0])
             
             logger.warning(f"No config found for version {version} in database")
             return None
@@ -189,7 +202,8 @@ class DataSource:
             cursor.execute("""
             INSERT INTO config_versions (version, config, commit_message, timestamp, is_current)
             VALUES (?, ?, ?, ?, ?)
-            """, (new_version, json.dumps(config_data), commit_message, timestamp, sync_to_main))
+            """, (new_version, json.dumps(store_config(config_data, SQLiteObjectStore(conn))),
+                  commit_message, timestamp, sync_to_main))
             
             # If sync_to_main is True, update all other versions to not be current
             if sync_to_main:
@@ -208,6 +222,34 @@ class DataSource:
         finally:
             conn.close()
     
+    def _decode_config(self, conn, text: str) -> Dict:
+        """A config_versions.config value: a tree of config_objects, or a full copy in older rows"""
+        value = json.loads(text)
+        return load_tree(value, SQLiteObjectStore(conn)) if is_tree(value) else value
+
+    def diff_config_versions(self, from_version: str, to_version: str) -> Optional[Dict]:
+        """Agents added, removed and changed between two versions, or None if either is missing"""
+        conn = self._get_connection()
+        try:
+            trees = []
+            for version in (from_version, to_version):
+                row = conn.execute("SELECT config FROM config_versions WHERE version = ?", (version,)).fetchone()
+                if row is None:
+                    return None
+                value = json.loads(row[0])
+                if is_tree(value):
+                    trees.append((value, SQLiteObjectStore(conn)))
+                else:
+                    tree, objects = build_tree(value)
+                    trees.append((tree, MemoryObjectStore(objects)))
+            (old, old_store), (new, new_store) = trees
+            return diff_trees(old, new, old_store, new_store)
+        except Exception as e:
+            logger.error(f"Error diffing config versions: {str(e)}")
+            return None
+        finally:
+            conn.close()
+
     def sync_config(self, version: str) -> bool:
         """Sync a configuration version to main"""
         conn = self._get_connection()
@@ -245,14 +287,16 @@ class DataSource:
                     return None
             else:
                 # Get the current config
-                cursor = self._get_connection().cursor()
-                cursor.execute("SELECT version, config FROM config_versions WHERE is_current = TRUE LIMIT 1")
-                row = cursor.fetchone()
-                if not row:
-                    logger.error("No current config found")
-                    return None
-                config_version = row[0]
-                config = json.loads(row[1])
+                conn = self._get_connection()
+                try:
+                    row = conn.execute("SELECT version, config FROM config_versions WHERE is_current = TRUE LIMIT 1").fetchone()
+                    if not row:
+                        logger.error("No current config found")
+                        return None
+                    config_version = row[0]
+                    config = self._decode_config(conn, row[1])
+                finally:
+                    conn.close()
             
             # Find the agent to update
             agent_index = None
@@ -434,5 +478,25 @@ class DataSource:
             "connections": []
         }
 
-# Create a singleton instance
-data_source = DataSource() 
\ No newline at end of file
+class LazyDataSource:
+    """
+    Proxy that builds the DataSource (and runs its DDL) on first use rather
+    than at import, so importing the server stays cheap.
+    """
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self) -> DataSource:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = DataSource()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+# Shared instance, initialized on first attribute access
+data_source = LazyDataSource() 
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+HTTP load-test driver for the AgenSight server.
+
+Discovers trace and span ids from a running server, then hammers the `/api`
+endpoints from a pool of keep-alive connections and reports per-endpoint
+p50/p99 latency, errors and throughput.
+"""
+import gzip
+import http.client
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+ENDPOINTS = {
+    "traces": lambda ids, rng: "/api/traces",
+    "trace_spans": lambda ids, rng: f"/api/traces/{rng.choice(ids['traces'])}/spans",
+    "span_details": lambda ids, rng: f"/api/span/{rng.choice(ids['spans'])}/details",
+}
+
+
+class _Connection:
+    """One keep-alive HTTP connection, reopened after failures."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.factory = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.timeout = timeout
+        self.conn = None
+
+    def get(self, path: str):
+        if self.conn is None:
+            self.conn = self.factory(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = self.conn.getresponse()
+            body = response.read()
+            # Decode like a browser would; large API responses are gzipped
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return response.status, body
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def discover_ids(base_url: str, max_traces: int = 200, timeout: float = 30.0) -> Dict[str, List[str]]:
+    """Collect trace ids and span ids to request, using the server's own API."""
+    conn = _Connection(base_url, timeout)
+    status, body = conn.get("/api/traces")
+    if status != 200:
+        raise RuntimeError(f"GET /api/traces returned {status}")
+
+    traces = [t["id"] for t in json.loads(body)][:max_traces]
+    spans = []
+    for trace_id in traces[:20]:
+        status, body = conn.get(f"/api/traces/{trace_id}/spans")
+        if status == 200:
+            spans.extend(agent["span_id"] for agent in json.loads(body).get("agents", []))
+    return {"traces": traces, "spans": spans}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(
+    base_url: str = "http://127.0.0.1:5001",
+    endpoints: Optional[List[str]] = None,
+    concurrency: int = 8,
+    duration: float = 30.0,
+    max_requests: Optional[int] = None,
+    timeout: float = 30.0,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """
+    Run `concurrency` workers against `endpoints` until `duration` seconds
+    pass or `max_requests` have been sent, and return a latency report.
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    ids = discover_ids(base_url, timeout=timeout)
+    if not ids["traces"]:
+        endpoints = [e for e in endpoints if e == "traces"]
+    if not ids["spans"]:
+        endpoints = [e for e in endpoints if e != "span_details"]
+    if not endpoints:
+        raise RuntimeError("No data to load-test against; seed the DB first (agensight synth)")
+
+    latencies = {name: [] for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+    lock = threading.Lock()
+    sent = 0
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        nonlocal sent
+        rng = random.Random(seed + worker_id)
+        conn = _Connection(base_url, timeout)
+        local = {name: [] for name in endpoints}
+        local_errors = {name: 0 for name in endpoints}
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests is not None and sent >= max_requests:
+                    break
+                sent += 1
+            name = rng.choice(endpoints)
+            path = ENDPOINTS[name](ids, rng)
+            start = time.perf_counter()
+            try:
+                status, _ = conn.get(path)
+                ok = 200 <= status < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                local[name].append(elapsed)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in endpoints:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    report = {"base_url": base_url, "concurrency": concurrency, "seconds": round(wall, 2), "endpoints": {}}
+    total = 0
+    for name in endpoints:
+        values = sorted(latencies[name])
+        total += len(values)
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "p50_ms": round(_percentile(values, 50) * 1000, 2) if values else None,
+            "p99_ms": round(_percentile(values, 99) * 1000, 2) if values else None,
+            "max_ms": round(values[-1] * 1000, 2) if values else None,
+            "rps": round(len(values) / wall, 1) if wall else None,
+        }
+    report["total_rps"] = round(total / wall, 1) if wall else None
+    return report
+
+
+def format_report(report: Dict[str, object]) -> str:
+    lines = [
+        f"{report['base_url']}  concurrency={report['concurrency']}  {report['seconds']}s  "
+        f"throughput={report['total_rps']} req/s",
+        f"{'endpoint':<14} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}",
+    ]
+    for name, stats in report["endpoints"].items():
+        lines.append(
+            f"{name:<14} {stats['requests']:>9} {stats['errors']:>7} {str(stats['p50_ms']):>9} "
+            f"{str(stats['p99_ms']):>9} {str(stats['max_ms']):>9} {str(stats['rps']):>8}"
+        )
+    return "\n".join(lines)
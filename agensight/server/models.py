@@ -40,6 +40,13 @@ class SpanDetails(BaseModel):
     completions: List[Dict[str, Any]]
     tools: List[Dict[str, Any]]
 
+class SpanDetailsRequest(BaseModel):
+    """Request model for fetching the details of many spans: by id, or a page of a trace's spans"""
+    span_ids: Optional[List[str]] = None
+    trace_id: Optional[str] = None
+    limit: int = Field(200, ge=1, le=1000)
+    cursor: Optional[str] = None
+
 class Span(BaseModel):
     duration: float
     end_time: float
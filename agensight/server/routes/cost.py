@@ -0,0 +1,62 @@
+"""
+LLM cost over time.
+
+The exporter prices each LLM span as it writes it (tracing/pricing.py) and
+adds the cost to its trace, its session and an hourly per-model bucket in
+`cost_buckets`. A cost chart is a range read of those buckets, summed into
+coarser intervals here; trace and session costs are on their own rows
+(`traces.cost`, `sessions.total_cost`).
+"""
+import sqlite3
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from agensight.tracing.db import COST_BUCKET_SECONDS, ensure_schema, get_db
+
+cost_router = APIRouter(tags=["costs"])
+
+INTERVALS = {"hour": COST_BUCKET_SECONDS, "day": 86400, "week": 7 * 86400}
+DEFAULT_RANGE = 7 * 86400
+
+
+@cost_router.get("/costs")
+def get_costs(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    interval: str = Query("hour", pattern="^(hour|day|week)$"),
+    by_model: bool = False,
+):
+    """Calls, tokens and USD cost per interval (UTC-aligned) between `start` and `end` (epoch seconds)"""
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - DEFAULT_RANGE
+    step = INTERVALS[interval]
+    group = "bucket, model" if by_model else "bucket"
+    try:
+        ensure_schema()
+        conn = get_db()
+        rows = conn.execute(
+            f"""
+            SELECT (bucket_start / ?) * ? AS bucket, {"model," if by_model else ""}
+                   SUM(calls) AS calls, SUM(unpriced_calls) AS unpriced_calls,
+                   SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+                   SUM(cached_tokens) AS cached_tokens, SUM(cost) AS cost
+            FROM cost_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY {group}
+            ORDER BY {group}
+            """,
+            (step, step, int(start // COST_BUCKET_SECONDS) * COST_BUCKET_SECONDS, end),
+        ).fetchall()
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    buckets = [dict(row) for row in rows]
+    return {
+        "interval": step,
+        "start": start,
+        "end": end,
+        "total_cost": sum(b["cost"] for b in buckets),
+        "buckets": buckets,
+    }
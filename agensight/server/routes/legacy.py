@@ -0,0 +1,195 @@
+"""
+Legacy routes formerly served by a Flask app mounted at /flask-compat.
+
+They keep their original request and response shapes — plain JSON bodies
+and `{"error": ...}` on failure — but are thin adapters over the same config
+services as the /api routes. Like those, handlers are plain `def`: the
+services block on the config writer lock and on file I/O, so they run in
+FastAPI's threadpool rather than on the event loop.
+"""
+import copy
+import logging
+from fastapi import APIRouter, Body, Depends
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, Optional
+
+from ..utils.config_utils import (
+    ConfigError, VersionConflictError, VersionNotFoundError, create_default_config, get_version, initialize_config,
+    list_config_versions, read_main_config, rollback_to_version, update_agent,
+    commit_config_version, sync_version_to_main, ensure_config_initialized
+)
+
+logger = logging.getLogger(__name__)
+
+legacy_router = APIRouter(
+    prefix="/api", tags=["legacy"], include_in_schema=False, dependencies=[Depends(ensure_config_initialized)]
+)
+
+
+def error_response(message: str, status_code: int = 500) -> JSONResponse:
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+def config_error_response(e: ConfigError) -> JSONResponse:
+    if isinstance(e, VersionConflictError):
+        return error_response(str(e), 409)
+    return error_response(str(e), 404 if isinstance(e, VersionNotFoundError) else 500)
+
+
+@legacy_router.get("/config")
+def get_config(version: Optional[str] = None):
+    try:
+        # No version: initialize the config system if needed and use the main config
+        config = get_version(version) if version else initialize_config()
+        if config is None:
+            # Unknown versions fall back to the main .agensight/config.json, as they always have
+            try:
+                config = read_main_config()
+            except ConfigError:
+                config = create_default_config()
+        if not config.get('connections') and len(config.get('agents', [])) >= 2:
+            config = {**config, 'connections': [
+                {"from": config['agents'][0]['name'], "to": config['agents'][1]['name']}
+            ]}
+        return config
+    except Exception as e:
+        logger.error(f"Error loading config: {e}")
+        return create_default_config()
+
+
+@legacy_router.get("/config/versions")
+def get_config_versions():
+    try:
+        return list_config_versions()
+    except Exception as e:
+        logger.error(f"Error getting config versions: {e}")
+        return [{'version': '1.0.0', 'commit_message': 'Initial version', 'timestamp': '', 'is_current': True}]
+
+
+@legacy_router.post("/update_agent")
+def update_agent_legacy(data: Dict[str, Any] = Body(...)):
+    agent_data = data.get('agent')
+    if not agent_data or not agent_data.get('name'):
+        return error_response('Missing required agent data', 400)
+
+    sync_to_main = data.get('sync_to_main', False)
+    try:
+        version = update_agent(
+            agent_data,
+            data.get('version'),
+            data.get('commit_message', 'Updated agent'),
+            sync_to_main,
+        )
+    except ConfigError as e:
+        return config_error_response(e)
+    return {
+        'success': True,
+        'version': version,
+        'synced_to_main': sync_to_main,
+        'message': f"Agent updated successfully in version {version}"
+    }
+
+
+@legacy_router.post("/config/rollback")
+def rollback_config(data: Dict[str, Any] = Body(...)):
+    """Roll back to a specific version of the configuration"""
+    version = data.get('version')
+    if not version:
+        return error_response('Missing version parameter', 400)
+
+    result = rollback_to_version(
+        version,
+        data.get('commit_message', f"Rolled back to version {version}"),
+        data.get('sync_to_main', False),
+    )
+    if not result.get('success', False):
+        return error_response(result.get('error', 'Failed to rollback'))
+    return result
+
+
+@legacy_router.post("/config/commit")
+def commit_version(data: Dict[str, Any] = Body(...)):
+    """Create a new commit from a source version or the main config"""
+    source_version = data.get('source_version')
+    sync_to_main = data.get('sync_to_main', False)
+    try:
+        new_version = commit_config_version(source_version, data.get('commit_message', 'Manual commit'), sync_to_main)
+    except ConfigError as e:
+        return config_error_response(e)
+    return {
+        'success': True,
+        'version': new_version,
+        'source_version': source_version,
+        'synced_to_main': sync_to_main,
+        'message': f"Created new version {new_version}"
+    }
+
+
+@legacy_router.post("/config/sync")
+def sync_to_main(data: Dict[str, Any] = Body(...)):
+    """Sync a specific version to the main config file"""
+    version = data.get('version')
+    if not version:
+        return error_response('Missing version parameter', 400)
+    try:
+        sync_version_to_main(version)
+    except ConfigError as e:
+        return config_error_response(e)
+    return {
+        'success': True,
+        'version': version,
+        'message': f"Successfully synced version {version} to main config file"
+    }
+
+
+@legacy_router.post("/update_prompt")
+def update_prompt(data: Dict[str, Any] = Body(...)):
+    """Deprecated: use /api/update_agent instead"""
+    logger.warning("The /api/update_prompt endpoint is deprecated. Please use /api/update_agent instead.")
+    name = data.get('name')
+    prompt_text = data.get('prompt')
+    if name is None or prompt_text is None:
+        return error_response('Missing required fields', 400)
+
+    try:
+        # An unknown version falls back to the main config
+        version = data.get('version')
+        config = get_version(version) if version else None
+        if config is None:
+            version, config = None, read_main_config()
+        agent = next((a for a in config.get('agents', []) if a.get('name') == name), None)
+        if not agent:
+            return error_response('Agent not found', 404)
+
+        agent = copy.deepcopy(agent)
+        agent['prompt'] = prompt_text
+        if 'modelParams' in data:
+            agent['modelParams'] = data['modelParams']
+
+        # Without a version the update becomes a new version synced to main
+        version = update_agent(agent, version, data.get('commit_message', 'Updated prompt'), sync_to_main=not version)
+    except ConfigError as e:
+        return config_error_response(e)
+    return {
+        'success': True,
+        'version': version,
+        'message': f"Prompt updated successfully in version {version}"
+    }
+
+
+@legacy_router.post("/versions/create")
+def create_version(data: Dict[str, Any] = Body(...)):
+    """Create a new version from the main config"""
+    try:
+        new_version = commit_config_version(
+            None,
+            data.get('commit_message', 'Manual version creation'),
+            data.get('sync_to_main', True),
+        )
+    except ConfigError as e:
+        return config_error_response(e)
+    return {
+        'success': True,
+        'version': new_version,
+        'message': f"Created new version {new_version}"
+    }
@@ -0,0 +1,94 @@
+"""
+Sessions and their rollups.
+
+Aggregates (trace count, first/last seen, tokens, errors, latency, cost) are kept
+on the sessions row by the exporter, so listing sessions reads one index and
+a session's traces come from the traces.session_id index. Both lists are
+paginated with an opaque keyset cursor: pass a response's `next_cursor` back
+as `cursor` for the next page.
+"""
+import logging
+import sqlite3
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from agensight.tracing.db import change_counter, ensure_schema, get_db
+from ..utils.http_cache import conditional_response, make_etag
+from ..utils.pagination import make_cursor, parse_cursor
+
+session_router = APIRouter(tags=["sessions"])
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _page(conn, sql: str, params: tuple, after: Optional[Tuple[float, str]], limit: int, key: str, order: str):
+    """Rows of `sql` after the keyset position `after`, plus the cursor of the next page"""
+    if after is not None:
+        sql += f" AND ({key}, id) < (?, ?)"
+        params += after
+    sql += f" ORDER BY {order} LIMIT ?"
+    rows = [dict(row) for row in conn.execute(sql, params + (limit + 1,)).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = make_cursor(rows[-1][key], rows[-1]["id"])
+    return rows, next_cursor
+
+
+@session_router.get("/sessions")
+def list_sessions(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Sessions, most recently active first"""
+    after = parse_cursor(cursor)
+    try:
+        ensure_schema()
+        conn = get_db()
+        # Bumped by triggers on every write to sessions, whichever columns change
+        etag = make_etag("sessions", limit, cursor, change_counter(conn, "sessions"))
+
+        def build():
+            sessions, next_cursor = _page(
+                conn, "SELECT * FROM sessions WHERE last_seen IS NOT NULL", (), after, limit,
+                "last_seen", "last_seen DESC, id DESC",
+            )
+            return {"sessions": sessions, "next_cursor": next_cursor}
+
+        return conditional_response(request, etag, build)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@session_router.get("/sessions/{session_id}")
+def get_session(
+    session_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """A session's rollups and its traces, newest first"""
+    after = parse_cursor(cursor)
+    try:
+        ensure_schema()
+        conn = get_db()
+        session = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        # The aggregates change whenever the session's traces do
+        etag = make_etag("session", session_id, limit, cursor, *tuple(session))
+
+        def build():
+            traces, next_cursor = _page(
+                conn, "SELECT * FROM traces WHERE session_id = ?", (session_id,), after, limit,
+                "started_at", "started_at DESC, id DESC",
+            )
+            return {"session": dict(session), "traces": traces, "next_cursor": next_cursor}
+
+        return conditional_response(request, etag, build)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,141 @@
+"""
+Live tail of exported spans as Server-Sent Events.
+
+Each `span` event carries one span row and uses the span's rowid as its event
+id, so a reconnecting EventSource resumes from Last-Event-ID. After each batch
+a `trace` event is sent for every trace the batch touched, shaped like the
+entries of /api/traces. The DB is polled with `PRAGMA data_version`, which only
+changes when another connection commits, so an idle stream costs one pragma
+per interval.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from agensight.tracing.db import get_db
+
+stream_router = APIRouter(tags=["stream"])
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 15.0
+RETRY_MILLIS = 2000
+BATCH_LIMIT = 500
+
+SPAN_COLUMNS = "rowid, id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status"
+
+
+class SpanTail:
+    """Cursor over the spans table in rowid (export) order"""
+
+    def __init__(self, conn, after: Optional[int] = None, trace_id: Optional[str] = None):
+        self.conn = conn
+        self.trace_id = trace_id
+        self.data_version = None
+        # Without a cursor, start at the end: only spans exported from now on
+        self.cursor = after if after is not None else self._max_rowid()
+
+    def _max_rowid(self) -> int:
+        try:
+            return self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM spans").fetchone()[0]
+        except sqlite3.OperationalError:
+            # Nothing exported yet; the spans table is created by the first exporter
+            return 0
+
+    def _changed(self) -> bool:
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self.data_version
+        self.data_version = version
+        return changed
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """New spans after the cursor, and the rows of the traces they belong to"""
+        if not self._changed():
+            return [], []
+
+        sql = f"SELECT {SPAN_COLUMNS} FROM spans WHERE rowid > ?"
+        params: list = [self.cursor]
+        if self.trace_id:
+            sql += " AND trace_id = ?"
+            params.append(self.trace_id)
+        try:
+            rows = self.conn.execute(sql + " ORDER BY rowid LIMIT ?", params + [BATCH_LIMIT]).fetchall()
+        except sqlite3.OperationalError:
+            return [], []
+        if not rows:
+            return [], []
+
+        if len(rows) == BATCH_LIMIT:
+            # More rows are waiting; don't wait for the next commit to fetch them
+            self.data_version = None
+        self.cursor = rows[-1]["rowid"]
+        spans = [dict(row) for row in rows]
+
+        trace_ids = list(dict.fromkeys(span["trace_id"] for span in spans))
+        placeholders = ",".join("?" * len(trace_ids))
+        traces = self.conn.execute(f"SELECT * FROM traces WHERE id IN ({placeholders})", trace_ids).fetchall()
+        return spans, [dict(row) for row in traces]
+
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _span_events(request: Request, after: Optional[int], trace_id: Optional[str]):
+    # Polls run in the threadpool, so the connection moves between threads
+    conn = get_db(check_same_thread=False)
+    try:
+        tail = await run_in_threadpool(SpanTail, conn, after, trace_id)
+        yield f"retry: {RETRY_MILLIS}\n\n"
+        last_sent = time.monotonic()
+
+        while not await request.is_disconnected():
+            try:
+                spans, traces = await run_in_threadpool(tail.poll)
+            except sqlite3.DatabaseError as e:
+                logger.error(f"Span stream failed: {str(e)}")
+                yield format_event("error", {"detail": str(e)})
+                return
+
+            for span in spans:
+                yield format_event("span", span, span.pop("rowid"))
+            for trace in traces:
+                yield format_event("trace", trace)
+
+            if spans:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(POLL_INTERVAL)
+    finally:
+        conn.close()
+
+
+@stream_router.get("/stream/spans")
+async def stream_spans(
+    request: Request,
+    after: Optional[int] = Query(None, description="Resume after this span cursor (0 replays everything)"),
+    trace_id: Optional[str] = Query(None, description="Only stream spans of this trace"),
+):
+    """Stream newly exported spans and trace updates as Server-Sent Events"""
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    return StreamingResponse(
+        _span_events(request, after, trace_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
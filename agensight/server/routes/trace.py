@@ -1,69 +1,316 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Dict, List, Optional, Any
-from flask import Blueprint, jsonify, request
 
-from agensight.tracing.db import get_db
-from agensight.tracing.utils import transform_trace_to_agent_view
+from agensight.tracing.db import ERROR_STATUS, change_counter, ensure_schema, get_db
+from agensight.tracing.utils import transform_trace_to_agent_view, expand_span_attributes
+from agensight.tracing.compression import inflate, inflate_row
+import json
 import sqlite3
 
 from ..data_source import data_source
-from ..models import SpanDetails
+from ..models import SpanDetails, SpanDetailsRequest
+from ..utils.http_cache import COMPLETED_CACHE_CONTROL, conditional_response, make_etag
+from ..utils.pagination import make_cursor, parse_cursor
+from ..utils.timeline import build_timeline, trace_extent
 import logging
 
 trace_router = APIRouter(tags=["traces"])
-trace_bp = Blueprint('trace', __name__)
 logger = logging.getLogger(__name__)
 
+MAX_TIMELINE_WIDTH = 10000
+
+DEFAULT_TREE_PAGE_SIZE = 200
+MAX_TREE_PAGE_SIZE = 1000
+TREE_COLUMNS = "id, parent_id, name, started_at, ended_at, duration, kind, status, cost, tokens"
+
+MAX_DETAILS_SPANS = 1000
+# Span ids per IN (...) query, well under SQLite's limit on bound parameters
+DETAILS_CHUNK_SIZE = 500
+
+
+# Version keys: cheap aggregates that change whenever the rows behind a
+# response do, so a matching If-None-Match is answered before any payload
+# is built. Spans are written once; a trace only changes by gaining spans
+# (and its traces row's token total), and a span's details only by gaining
+# tools copied up from child spans exported later.
+
+def _traces_version(conn):
+    # Bumped by triggers on every write to traces: new rows, but also session
+    # links and token and cost totals added to existing ones
+    return change_counter(conn, "traces")
+
+
+def _trace_version(conn, trace_id: str):
+    """
+    Version key for a trace. There is no signal that a trace has all its
+    spans (the exporter can write a root before its queued children), so
+    trace responses are always revalidated rather than cached for a while.
+    """
+    spans = conn.execute("SELECT COUNT(*), MAX(rowid) FROM spans WHERE trace_id = ?", (trace_id,)).fetchone()
+    trace = conn.execute("SELECT ended_at, total_tokens FROM traces WHERE id = ?", (trace_id,)).fetchone()
+    return tuple(spans) + (tuple(trace) if trace else (None, None))
+
+
+def _span_version(conn, span_id: str):
+    """Version key for a span's details, or None if the span isn't written yet"""
+    span = conn.execute("SELECT rowid FROM spans WHERE id = ?", (span_id,)).fetchone()
+    if span is None:
+        return None
+    tools = conn.execute("SELECT COUNT(*), MAX(id) FROM tools WHERE span_id = ?", (span_id,)).fetchone()
+    return (span[0],) + tuple(tools)
+
 
 @trace_router.get("/traces")
-def list_traces():
+def list_traces(request: Request):
     try:
+        ensure_schema()
         conn = get_db()
-        rows = conn.execute("SELECT * FROM traces ORDER BY started_at DESC").fetchall()
-        return [dict(row) for row in rows]
+        etag = make_etag("traces", _traces_version(conn))
+
+        def build():
+            rows = conn.execute("SELECT * FROM traces ORDER BY started_at DESC").fetchall()
+            return [dict(row) for row in rows]
+
+        return conditional_response(request, etag, build)
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @trace_router.get("/span/{span_id}/details")
-def get_span_details(span_id: str):
+def get_span_details(span_id: str, request: Request):
+    try:
+        conn = get_db()
+        version = _span_version(conn, span_id)
+
+        # Details of a span that isn't written yet are empty for now, not final
+        etag = make_etag("details", span_id, *version) if version else None
+        return conditional_response(request, etag, lambda: _span_details(conn, [span_id])[span_id])
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@trace_router.post("/spans/details")
+def get_spans_details(body: SpanDetailsRequest):
+    """
+    Prompts, completions and tools of many spans in one response: the spans
+    in `span_ids`, or a page of `trace_id`'s spans in start order (pass
+    `next_cursor` back as `cursor` for the next page).
+    """
+    if (body.span_ids is None) == (body.trace_id is None):
+        raise HTTPException(status_code=400, detail="Pass either span_ids or trace_id")
+    if body.span_ids is not None and len(body.span_ids) > MAX_DETAILS_SPANS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DETAILS_SPANS} span_ids per request")
+    after = parse_cursor(body.cursor)
     try:
         conn = get_db()
-        prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ? ORDER BY message_index", (span_id,)).fetchall()
-        completions = conn.execute("SELECT * FROM completions WHERE span_id = ?", (span_id,)).fetchall()
-        tools = conn.execute("SELECT * FROM tools WHERE span_id = ?", (span_id,)).fetchall()
-
-        return {
-            "prompts": [dict(p) for p in prompts],
-            "completions": [dict(c) for c in completions],
-            "tools": [dict(t) for t in tools]
-        }
+        next_cursor = None
+        if body.span_ids is not None:
+            span_ids = body.span_ids
+        else:
+            sql = "SELECT id, started_at FROM spans WHERE trace_id = ?"
+            params = (body.trace_id,)
+            if after is not None:
+                sql += " AND (started_at, id) > (?, ?)"
+                params += after
+            rows = conn.execute(sql + " ORDER BY started_at, id LIMIT ?", params + (body.limit + 1,)).fetchall()
+            if len(rows) > body.limit:
+                rows = rows[:body.limit]
+                next_cursor = make_cursor(rows[-1]["started_at"], rows[-1]["id"])
+            span_ids = [row["id"] for row in rows]
+        return {"spans": _span_details(conn, span_ids), "next_cursor": next_cursor}
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _span_details(conn, span_ids: List[str]) -> Dict[str, dict]:
+    """Prompts, completions and tools of each span, fetched with one IN query per table and chunk of ids"""
+    details = {span_id: {"prompts": [], "completions": [], "tools": []} for span_id in span_ids}
+    ids = list(details)
+    for i in range(0, len(ids), DETAILS_CHUNK_SIZE):
+        chunk = ids[i:i + DETAILS_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(
+            f"SELECT * FROM prompts WHERE span_id IN ({placeholders}) ORDER BY span_id, message_index", chunk
+        ):
+            details[row["span_id"]]["prompts"].append(inflate_row(row, "content"))
+        for row in conn.execute(f"SELECT * FROM completions WHERE span_id IN ({placeholders}) ORDER BY span_id, id", chunk):
+            details[row["span_id"]]["completions"].append(inflate_row(row, "content"))
+        for row in conn.execute(f"SELECT * FROM tools WHERE span_id IN ({placeholders}) ORDER BY span_id, id", chunk):
+            details[row["span_id"]]["tools"].append(dict(row))
+    return details
+
+
+@trace_router.get("/span/{span_id}/attributes")
+def get_span_attributes(span_id: str, request: Request):
+    try:
+        conn = get_db()
+        version = _span_version(conn, span_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail=f"Span {span_id} not found")
+
+        def build():
+            row = conn.execute("SELECT attributes FROM spans WHERE id = ?", (span_id,)).fetchone()
+            prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ? ORDER BY message_index", (span_id,)).fetchall()
+            completions = conn.execute("SELECT * FROM completions WHERE span_id = ? ORDER BY id", (span_id,)).fetchall()
+            details = {
+                "prompts": [inflate_row(p, "content") for p in prompts],
+                "completions": [inflate_row(c, "content") for c in completions],
+            }
+            return expand_span_attributes(json.loads(inflate(row["attributes"])), details)
+
+        # Attributes, prompts and completions are written with the span and never change
+        return conditional_response(
+            request, make_etag("attributes", span_id, version[0]), build, COMPLETED_CACHE_CONTROL
+        )
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @trace_router.get("/traces/{trace_id}/spans")
-def get_structured_trace(trace_id: str):
+def get_structured_trace(trace_id: str, request: Request):
     try:
         conn = get_db()
-        spans = conn.execute("SELECT * FROM spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)).fetchall()
-        spans = [dict(s) for s in spans]
-
-        span_details_by_id = {}
-        for span in spans:
-            span_id = span["id"]
-            prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ?", (span_id,)).fetchall()
-            completions = conn.execute("SELECT * FROM completions WHERE span_id = ?", (span_id,)).fetchall()
-            tools = conn.execute("SELECT * FROM tools WHERE span_id = ?", (span_id,)).fetchall()
-
-            span_details_by_id[span_id] = {
-                "prompts": [dict(p) for p in prompts],
-                "completions": [dict(c) for c in completions],
-                "tools": [dict(t) for t in tools],
+        version = _trace_version(conn, trace_id)
+        etag = make_etag("trace", trace_id, *version)
+        return conditional_response(request, etag, lambda: _build_structured_trace(conn, trace_id))
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@trace_router.get("/traces/{trace_id}/timeline")
+def get_trace_timeline(
+    trace_id: str,
+    request: Request,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    width: int = Query(1000, ge=1, le=MAX_TIMELINE_WIDTH),
+    min_px: float = Query(1.0, gt=0),
+):
+    """
+    A trace's spans laid out for a viewport of `width` pixels between `start`
+    and `end` (epoch seconds, default: the whole trace). Spans narrower than
+    `min_px` are merged into aggregate bars with counts.
+    """
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    try:
+        conn = get_db()
+        version = _trace_version(conn, trace_id)
+        if not version[0]:
+            raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+        etag = make_etag("timeline", trace_id, start, end, width, min_px, *version)
+
+        def build():
+            rows = conn.execute(
+                "SELECT id, parent_id, name, started_at, ended_at, status FROM spans WHERE trace_id = ? ORDER BY started_at",
+                (trace_id,),
+            ).fetchall()
+            rows = [dict(row) for row in rows]
+            first, last = trace_extent(rows)
+            view_start = start if start is not None else first
+            view_end = end if end is not None else last
+            return {"trace_id": trace_id, **build_timeline(rows, view_start, view_end, width, min_px)}
+
+        return conditional_response(request, etag, build)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@trace_router.get("/traces/{trace_id}/tree")
+def get_trace_tree(
+    trace_id: str,
+    request: Request,
+    node: Optional[str] = None,
+    limit: int = Query(DEFAULT_TREE_PAGE_SIZE, ge=1, le=MAX_TREE_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    One level of a trace's span tree: span `node` and its children, or the
+    trace's top-level spans if no node is given. Every span comes with a
+    summary of its subtree, so a branch is fetched only when it's expanded
+    (by passing a child's id as `node`). Children are ordered by start time
+    and paginated with `cursor`.
+    """
+    after = parse_cursor(cursor)
+    try:
+        conn = get_db()
+        version = _trace_version(conn, trace_id)
+        if not version[0]:
+            raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+        etag = make_etag("tree", trace_id, node, limit, cursor, *version)
+
+        def build():
+            if node is not None:
+                node_row = conn.execute(
+                    f"SELECT {TREE_COLUMNS} FROM spans WHERE id = ? AND trace_id = ?", (node, trace_id)
+                ).fetchone()
+                if node_row is None:
+                    raise HTTPException(status_code=404, detail=f"Span {node} not found in trace {trace_id}")
+                sql = f"SELECT {TREE_COLUMNS} FROM spans WHERE trace_id = ? AND parent_id = ?"
+                params = (trace_id, node)
+            else:
+                node_row = None
+                # Spans whose parent isn't written yet (the root of a running trace) show at the top too
+                sql = f"""
+                    SELECT {TREE_COLUMNS} FROM spans WHERE trace_id = ? AND (
+                        parent_id IS NULL OR NOT EXISTS (SELECT 1 FROM spans AS p WHERE p.id = spans.parent_id)
+                    )"""
+                params = (trace_id,)
+            if after is not None:
+                sql += " AND (started_at, id) > (?, ?)"
+                params += after
+            sql += " ORDER BY started_at, id LIMIT ?"
+            children = [dict(row) for row in conn.execute(sql, params + (limit + 1,)).fetchall()]
+            next_cursor = None
+            if len(children) > limit:
+                children = children[:limit]
+                next_cursor = make_cursor(children[-1]["started_at"], children[-1]["id"])
+
+            spans = children + ([dict(node_row)] if node_row is not None else [])
+            summaries = _subtree_summaries(conn, trace_id, [span["id"] for span in spans])
+            for span in spans:
+                span["subtree"] = summaries.get(span["id"])
+            return {
+                "trace_id": trace_id,
+                "node": spans[-1] if node_row is not None else None,
+                "children": children,
+                "next_cursor": next_cursor,
             }
 
-        structured = transform_trace_to_agent_view(spans, span_details_by_id)
-        return JSONResponse(content=structured)
+        return conditional_response(request, etag, build)
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _subtree_summaries(conn, trace_id: str, span_ids: List[str]) -> Dict[str, dict]:
+    """
+    Descendant count, error count, summed duration, tokens and cost of the
+    subtree under each span (itself included), walked with the
+    (trace_id, parent_id) index.
+    """
+    if not span_ids:
+        return {}
+    placeholders = ",".join("?" * len(span_ids))
+    rows = conn.execute(
+        f"""
+        WITH RECURSIVE subtree(root, id, duration, status, tokens, cost) AS (
+            SELECT id, id, duration, status, tokens, cost FROM spans WHERE trace_id = ? AND id IN ({placeholders})
+            UNION ALL
+            SELECT subtree.root, s.id, s.duration, s.status, s.tokens, s.cost
+            FROM subtree JOIN spans AS s ON s.trace_id = ? AND s.parent_id = subtree.id
+        )
+        SELECT root, COUNT(*) - 1 AS descendant_count, SUM(status = ?) AS error_count,
+               TOTAL(duration) AS total_duration, CAST(TOTAL(tokens) AS INTEGER) AS tokens, TOTAL(cost) AS cost
+        FROM subtree GROUP BY root
+        """,
+        (trace_id, *span_ids, trace_id, ERROR_STATUS),
+    ).fetchall()
+    return {row["root"]: {key: row[key] for key in row.keys() if key != "root"} for row in rows}
+
+
+def _build_structured_trace(conn, trace_id: str):
+    spans = conn.execute("SELECT * FROM spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)).fetchall()
+    spans = [dict(s) for s in spans]
+
+    span_details_by_id = _span_details(conn, [span["id"] for span in spans])
+    return transform_trace_to_agent_view(spans, span_details_by_id)
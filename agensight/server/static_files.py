@@ -0,0 +1,79 @@
+"""
+Static file serving for the dashboard build in ui/out.
+
+* Next.js content-hashed assets under `_next/static/` never change for a
+  given URL, so they are served `immutable` with a one-year max-age.
+* Everything else (HTML, favicon, ...) is `no-cache`: the browser keeps it but
+  revalidates with the ETag and gets a 304 when nothing changed.
+* Precompressed `.br` / `.gz` siblings written at build time by
+  `ui/scripts/precompress.py` are served when the client's Accept-Encoding
+  allows it, with `Vary: Accept-Encoding`. A sibling older than its
+  original is stale and ignored.
+"""
+import os
+from typing import List
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE_PREFIX = "/_next/static/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred first; suffix of the precompressed sibling file
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Codings the client accepts (q > 0), from an Accept-Encoding header"""
+    accepted = []
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.append(coding)
+    return accepted
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = os.fspath(full_path)
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if coding in accepted or "*" in accepted:
+                try:
+                    sibling_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                # Older than the file it was compressed from: left over from a previous build
+                if sibling_stat.st_mtime < stat_result.st_mtime:
+                    continue
+                stat_result = sibling_stat
+                encoding = coding
+                break
+
+        if encoding:
+            # The content type is still guessed from the original name ("app.js.br" -> JavaScript)
+            response = super().file_response(full_path + suffix, stat_result, scope, status_code)
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        if IMMUTABLE_PREFIX in full_path.replace(os.sep, "/"):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
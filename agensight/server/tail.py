@@ -0,0 +1,82 @@
+"""
+Client for the server's live span stream (/api/stream/spans).
+
+Reads the Server-Sent Events, prints one line per span and reconnects with
+Last-Event-ID when the connection drops, so no span is skipped or repeated.
+"""
+import http.client
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+
+def read_events(response) -> Iterator[Tuple[str, Optional[str], str]]:
+    """(event, id, data) for each event of a text/event-stream response"""
+    event, event_id, data = "message", None, []
+    for raw in response:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, event_id, "\n".join(data)
+            event, event_id, data = "message", None, []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "id":
+            event_id = value
+        elif field == "data":
+            data.append(value)
+
+
+def stream_spans(
+    base_url: str,
+    trace_id: Optional[str] = None,
+    after: Optional[int] = None,
+    retry: float = 2.0,
+) -> Iterator[Tuple[str, Dict]]:
+    """Yield ("span" | "trace", row) from a running server, reconnecting on errors"""
+    parts = urlsplit(base_url)
+    factory = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    last_id = None if after is None else str(after)
+
+    while True:
+        query = {"trace_id": trace_id} if trace_id else {}
+        headers = {"Accept": "text/event-stream"}
+        if last_id is not None:
+            headers["Last-Event-ID"] = last_id
+        conn = factory(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        try:
+            conn.request("GET", "/api/stream/spans" + (f"?{urlencode(query)}" if query else ""), headers=headers)
+            response = conn.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"GET /api/stream/spans returned {response.status}")
+            for event, event_id, data in read_events(response):
+                if event_id is not None:
+                    last_id = event_id
+                if event in ("span", "trace"):
+                    yield event, json.loads(data)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"[agensight] stream disconnected ({e}); retrying", file=sys.stderr)
+        finally:
+            conn.close()
+        time.sleep(retry)
+
+
+def format_span(span: Dict) -> str:
+    started = datetime.fromtimestamp(span["started_at"]).strftime("%H:%M:%S")
+    duration_ms = (span.get("duration") or 0) * 1000
+    status = "ERROR" if "ERROR" in (span.get("status") or "") else "ok"
+    indent = "  " if span.get("parent_id") else ""
+    return f"{started}  {span['trace_id'][:8]}  {indent}{span['name']:<40} {duration_ms:9.1f} ms  {status}"
+
+
+def format_trace(trace: Dict) -> str:
+    tokens = trace.get("total_tokens")
+    return f"--- trace {trace['id'][:8]} {trace.get('name') or ''}" + (f" ({tokens} tokens)" if tokens else "")
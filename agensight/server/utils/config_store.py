@@ -0,0 +1,232 @@
+"""
+Content-addressed storage for config versions.
+
+A version is stored as a small tree instead of a full copy of the config:
+
+    {"tree_format": 1,
+     "agents": [{"name": "Planner", "object": <hash>, "prompt": <hash>}, ...],
+     "settings": {...every other top-level key, e.g. connections...}}
+
+Each agent (with its prompt blanked) and each prompt text is an immutable
+object named by the SHA-256 of its bytes, so an edit to one prompt writes one
+new prompt object and a new tree; everything else is shared with earlier
+versions. Diffing two versions compares hashes and only loads objects that
+differ.
+
+Objects live under `.agensight/objects/ab/cdef...` for the file-based config
+system (`FileObjectStore`) and in the `config_objects` table for the
+DB-backed `DataSource` (`SQLiteObjectStore`). Rewriting a version in place
+can leave objects no tree references; `prune_objects` deletes those.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+TREE_FORMAT = 1
+
+
+def _encode(value: Any) -> bytes:
+    # Key order is kept: configs round-trip exactly as the UI wrote them
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def object_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileObjectStore:
+    """Objects as files under `root`, fanned out by the first two hex digits"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), 'rb') as f:
+            return f.read()
+
+    def digests(self) -> Iterator[str]:
+        """Hashes of the stored objects"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                # Temporary files of writes that never finished are listed too, so they get pruned
+                yield prefix + name
+
+    def delete(self, digest: str) -> None:
+        path = self._path(digest)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # Other objects share the directory
+
+
+class SQLiteObjectStore:
+    """Objects as rows of `config_objects`, written in the caller's transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, digest: str, data: bytes) -> None:
+        self.conn.execute(
+            "INSERT OR IGNORE INTO config_objects (hash, data) VALUES (?, ?)", (digest, data.decode('utf-8'))
+        )
+
+    def get(self, digest: str) -> bytes:
+        row = self.conn.execute("SELECT data FROM config_objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"Config object {digest} not found")
+        return row[0].encode('utf-8')
+
+
+class MemoryObjectStore:
+    """Objects held in memory, for trees built from legacy full-copy versions"""
+
+    def __init__(self, objects: Optional[Dict[str, bytes]] = None):
+        self.objects = dict(objects or {})
+
+    def put(self, digest: str, data: bytes) -> None:
+        self.objects.setdefault(digest, data)
+
+    def get(self, digest: str) -> bytes:
+        return self.objects[digest]
+
+
+def is_tree(value: Any) -> bool:
+    return isinstance(value, dict) and value.get('tree_format') == TREE_FORMAT
+
+
+def build_tree(config: Dict) -> Tuple[Dict, Dict[str, bytes]]:
+    """The tree for `config` and the objects it references, without storing anything"""
+    objects: Dict[str, bytes] = {}
+
+    def add(value: Any) -> str:
+        data = _encode(value)
+        digest = object_hash(data)
+        objects[digest] = data
+        return digest
+
+    entries = []
+    for agent in config.get('agents', []):
+        agent = dict(agent)
+        entry = {'name': agent.get('name')}
+        if isinstance(agent.get('prompt'), str):
+            entry['prompt'] = add(agent['prompt'])
+            # Keep the key in place so the agent's key order survives
+            agent['prompt'] = None
+        entry['object'] = add(agent)
+        entries.append(entry)
+
+    tree = {'tree_format': TREE_FORMAT}
+    # Configs without an agents key round-trip without one
+    if 'agents' in config:
+        tree['agents'] = entries
+    tree['settings'] = {k: v for k, v in config.items() if k != 'agents'}
+    return tree, objects
+
+
+def store_config(config: Dict, store) -> Dict:
+    """Write the objects of `config` to `store` and return its tree"""
+    tree, objects = build_tree(config)
+    for digest, data in objects.items():
+        store.put(digest, data)
+    return tree
+
+
+def _load_agent(entry: Dict, store) -> Dict:
+    agent = json.loads(store.get(entry['object']))
+    if 'prompt' in entry:
+        agent['prompt'] = json.loads(store.get(entry['prompt']))
+    return agent
+
+
+def load_tree(tree: Dict, store) -> Dict:
+    """Reconstruct the full config from a tree"""
+    config = {}
+    if 'agents' in tree:
+        config['agents'] = [_load_agent(entry, store) for entry in tree['agents']]
+    config.update(tree.get('settings', {}))
+    return config
+
+
+def tree_objects(tree: Dict) -> Set[str]:
+    """Hashes of the objects a tree references"""
+    digests = set()
+    for entry in tree.get('agents', []):
+        digests.add(entry['object'])
+        if 'prompt' in entry:
+            digests.add(entry['prompt'])
+    return digests
+
+
+def prune_objects(store: FileObjectStore, trees: Iterable[Dict]) -> int:
+    """
+    Delete the objects of `store` that none of `trees` references; returns how
+    many were deleted. `trees` must be every tree stored with `store`, and no
+    writer may be storing a config meanwhile.
+    """
+    keep = set()
+    for tree in trees:
+        keep |= tree_objects(tree)
+    removed = 0
+    for digest in list(store.digests()):
+        if digest not in keep:
+            store.delete(digest)
+            removed += 1
+    return removed
+
+
+def diff_trees(old: Dict, new: Dict, old_store, new_store=None) -> Dict[str, List]:
+    """
+    Agents added, removed and changed (with the changed fields) between two
+    trees, plus the changed top-level settings. Unchanged agents are detected
+    by hash alone; only changed agents' objects are read.
+    """
+    new_store = new_store or old_store
+    old_agents = {e['name']: e for e in old.get('agents', [])}
+    new_agents = {e['name']: e for e in new.get('agents', [])}
+
+    changed = []
+    for name, entry in new_agents.items():
+        before = old_agents.get(name)
+        if before is None:
+            continue
+        fields = []
+        if before.get('prompt') != entry.get('prompt'):
+            fields.append('prompt')
+        if before['object'] != entry['object']:
+            a = json.loads(old_store.get(before['object']))
+            b = json.loads(new_store.get(entry['object']))
+            fields.extend(k for k in dict.fromkeys(list(a) + list(b)) if k != 'prompt' and a.get(k) != b.get(k))
+        if fields:
+            changed.append({'name': name, 'fields': fields})
+
+    old_settings, new_settings = old.get('settings', {}), new.get('settings', {})
+    return {
+        'added': [name for name in new_agents if name not in old_agents],
+        'removed': [name for name in old_agents if name not in new_agents],
+        'changed': changed,
+        'settings': [k for k in dict.fromkeys(list(old_settings) + list(new_settings))
+                     if old_settings.get(k) != new_settings.get(k)],
+    }
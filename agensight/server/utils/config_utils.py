@@ -5,33 +5,57 @@ import os
 import json
 import logging
 import datetime
+import contextlib
 import copy
+import functools
 import glob
+import hashlib
 import re
 import sys
-from .file_ops import read_config, write_config
+import threading
+from .file_ops import read_config, write_config, write_json_atomic
+from .config_store import (
+    FileObjectStore, MemoryObjectStore, build_tree, diff_trees, load_tree, prune_objects, store_config
+)
+from agensight.utils.file_cache import FileCache, load_json
+from .http_cache import etag_matches
 from typing import Dict, List, Any, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized within this process only
+    fcntl = None
+
 # Configure logging
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# Parsed config, version and manifest files, revalidated by mtime/size.
+# Values are shared: copy before mutating (get_version and read_main_config do).
+config_cache = FileCache()
+
+# Directories already created by this process; path lookups only mkdir once
+_created_dirs = set()
+
+
+def _ensure_dir(path):
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+    return path
+
+
 # Constants
 def get_user_dir():
     """
     Return the directory where the user is running the SDK (usually their project root).
     This is where agensight.config.json and .agensight should be created.
     """
-    project_root = os.getcwd()
-    logger.info(f"Using user's current working directory as project root: {project_root}")
-    return project_root
+    return os.getcwd()
 
 def get_config_dir():
     """Get the configuration directory (.agensight in the user's project root)"""
-    user_dir = get_user_dir()
-    config_dir = os.path.join(user_dir, ".agensight")
-    os.makedirs(config_dir, exist_ok=True)
-    return config_dir
+    return _ensure_dir(os.path.join(get_user_dir(), ".agensight"))
 
 def get_config_file_path():
     """Get the path to the main config file"""
@@ -39,9 +63,7 @@ def get_config_file_path():
 
 def get_version_dir_path():
     """Get the path to the versions directory"""
-    version_dir = os.path.join(get_config_dir(), "versions")
-    os.makedirs(version_dir, exist_ok=True)
-    return version_dir
+    return _ensure_dir(os.path.join(get_config_dir(), "versions"))
 
 # Original constants - replace these with the function calls
 # CONFIG_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
@@ -56,6 +78,86 @@ def get_version_history_file_path():
 
 VERSION_FILE_PATTERN = 'version_{}.json'  # Format for individual version files
 
+def get_object_store():
+    """Content-addressed store for the agents and prompts of config versions"""
+    return FileObjectStore(os.path.join(get_config_dir(), "objects"))
+
+
+def _version_config(version_data):
+    """The config of a version file: a tree of stored objects, or a full copy in older versions"""
+    if 'tree' in version_data:
+        return load_tree(version_data['tree'], get_object_store())
+    return version_data.get('config')
+
+
+def _load_version_config(path):
+    with open(path, 'r') as f:
+        return _version_config(json.load(f))
+
+
+def _load_config_hash(path):
+    return config_hash(read_config(path))
+
+
+def _set_version_config(version_data, config):
+    version_data.pop('config', None)
+    version_data['hash'] = config_hash(config)
+    version_data['tree'] = store_config(config, get_object_store())
+
+
+_write_lock = threading.RLock()
+_writer_state = threading.local()
+
+
+@contextlib.contextmanager
+def config_writer():
+    """
+    Run config mutations one at a time: a lock within this process and, where
+    fcntl is available, a lock file shared with other processes using the same
+    .agensight directory. Re-entrant, so serialized functions can call each other.
+    """
+    with _write_lock:
+        depth = getattr(_writer_state, 'depth', 0)
+        _writer_state.depth = depth + 1
+        try:
+            if depth or fcntl is None:
+                yield
+                return
+            with open(os.path.join(get_config_dir(), '.write.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            _writer_state.depth = depth
+
+
+def _in_writer():
+    # Writers revalidate cached files on every read, so they never build on a stale copy
+    return getattr(_writer_state, 'depth', 0) > 0
+
+
+def serialized(fn):
+    """Run `fn` as the single config writer (see config_writer)"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with config_writer():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _write_json(path, data):
+    """Atomically write a config file and drop its cached parses"""
+    try:
+        write_config(path, data)
+    except FileNotFoundError:
+        # The directory was removed while we were running
+        _created_dirs.discard(os.path.dirname(path))
+        _ensure_dir(os.path.dirname(path))
+        write_config(path, data)
+    config_cache.invalidate(path)
+
 def ensure_version_directory():
     """
     Ensure the .agensight directory exists for version storage
@@ -64,14 +166,10 @@ def ensure_version_directory():
     Returns:
         bool: True if directory exists or was created successfully, False otherwise
     """
-    os.makedirs(get_config_dir(), exist_ok=True)
-    os.makedirs(get_version_dir_path(), exist_ok=True)
-    
-    # Create history file if it doesn't exist
-    if not os.path.exists(get_version_history_file_path()):
-        with open(get_version_history_file_path(), 'w') as f:
-            json.dump([], f)
+    _created_dirs.clear()
+    get_version_dir_path()
     
+    # history.json, the version manifest, is built on first read
     return True
 
 
@@ -85,21 +183,105 @@ def get_version_file_path(version):
     Returns:
         str: Full path to the version file
     """
-    # Add debug logging to help diagnose path formatting
-    logger.info(f"[DEBUG-CRITICAL] Building version file path for version: '{version}' (type: {type(version)})")
-    
-    # Ensure version is a string
-    version_str = str(version)
-    
-    # Format the filename using the pattern
-    filename = VERSION_FILE_PATTERN.format(version_str)
-    
-    # Construct the full path
-    full_path = os.path.join(get_version_dir_path(), filename)
-    
-    logger.info(f"[DEBUG-CRITICAL] Generated version file path: '{full_path}'")
-    
-    return full_path
+    return os.path.join(get_version_dir_path(), VERSION_FILE_PATTERN.format(version))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Version manifest (versions/history.json)
+#
+# {"format": 1, "versions": {"1.0.2": {"version", "commit_message",
+#  "timestamp", "hash"}, ...}}, with "hash" the content hash of the version's
+# config. It is rewritten atomically on every save, so listing versions and
+# finding the current one never parse the version files themselves.
+# ─────────────────────────────────────────────────────────────────────────────
+
+MANIFEST_FORMAT = 1
+
+
+def config_hash(config):
+    """Content hash of a config, independent of key order and formatting"""
+    canonical = json.dumps(config, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def version_sort_key(version):
+    """Sort key ordering version strings semantically ("1.0.10" after "1.0.9")"""
+    try:
+        return tuple(int(part) for part in str(version).split('.'))
+    except ValueError:
+        return (-1,)
+
+
+def _manifest_entry(version_data):
+    return {
+        'version': version_data.get('version'),
+        'commit_message': version_data.get('commit_message', 'No commit message'),
+        'timestamp': version_data.get('timestamp', ''),
+        'hash': version_data.get('hash') or config_hash(_version_config(version_data)),
+    }
+
+
+def _write_manifest(manifest):
+    path = get_version_history_file_path()
+    write_json_atomic(path, manifest)
+    config_cache.put(path, manifest)
+
+
+def rebuild_version_manifest():
+    """Rebuild history.json from the version files"""
+    versions = {}
+    for file_path in glob.glob(os.path.join(get_version_dir_path(), 'version_*.json')):
+        try:
+            with open(file_path, 'r') as f:
+                version_data = json.load(f)
+            if isinstance(version_data, dict) and 'version' in version_data:
+                versions[str(version_data['version'])] = _manifest_entry(version_data)
+        except Exception as e:
+            logger.error(f"Error loading version from {file_path}: {e}")
+
+    manifest = {'format': MANIFEST_FORMAT, 'versions': versions}
+    _write_manifest(manifest)
+    logger.info(f"[VERSION] Rebuilt version manifest with {len(versions)} versions")
+    return manifest
+
+
+@serialized
+def prune_config_objects():
+    """
+    Delete objects under .agensight/objects that no version file references,
+    e.g. the old prompts of a version rewritten by update_version. Runs as the
+    config writer, so no version is being stored meanwhile; nothing is deleted
+    if any version file can't be read. Returns the number of objects deleted.
+    """
+    trees = []
+    for file_path in glob.glob(os.path.join(get_version_dir_path(), 'version_*.json')):
+        try:
+            with open(file_path, 'r') as f:
+                version_data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Not pruning config objects: could not read {file_path}: {e}")
+            return 0
+        if isinstance(version_data, dict) and 'tree' in version_data:
+            trees.append(version_data['tree'])
+    return prune_objects(get_object_store(), trees)
+
+
+def read_version_manifest():
+    """The version manifest, rebuilt if it is missing or unreadable"""
+    try:
+        manifest = config_cache.get(get_version_history_file_path())
+        if isinstance(manifest, dict) and manifest.get('format') == MANIFEST_FORMAT:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return rebuild_version_manifest()
+
+
+def _record_version(version_data):
+    """Add or replace a version's manifest entry after its file was written"""
+    manifest = copy.deepcopy(read_version_manifest())
+    manifest['versions'][str(version_data['version'])] = _manifest_entry(version_data)
+    _write_manifest(manifest)
 
 
 def get_version_history():
@@ -107,34 +289,10 @@ def get_version_history():
     Get all versions from the version history (metadata only)
     
     Returns:
-        list: A list of version metadata (without the full configs)
+        list: Version metadata with content hashes, from the version manifest
     """
     try:
-        ensure_version_directory()
-        
-        # Get all version files
-        version_pattern = os.path.join(get_version_dir_path(), 'version_*.json')
-        version_files = glob.glob(version_pattern)
-        
-        # Extract metadata from each file
-        result = []
-        for file_path in version_files:
-            try:
-                with open(file_path, 'r') as f:
-                    version_data = json.load(f)
-                    
-                # Extract just the metadata
-                if isinstance(version_data, dict) and 'version' in version_data:
-                    result.append({
-                        'version': version_data.get('version'),
-                        'commit_message': version_data.get('commit_message', 'No commit message'),
-                        'timestamp': version_data.get('timestamp', '')
-                    })
-            except Exception as e:
-                logger.error(f"Error loading version from {file_path}: {e}")
-                continue
-                
-        return result
+        return [dict(info) for info in read_version_manifest()['versions'].values()]
     except Exception as e:
         logger.error(f"Error getting version history: {e}")
         return []
@@ -142,7 +300,7 @@ def get_version_history():
 
 def get_latest_version_number():
     """
-    Get the latest version number from the version history
+    Get the highest version number in the version history
     
     Returns:
         str: The latest version number or '0.0.1' if no versions exist
@@ -152,10 +310,10 @@ def get_latest_version_number():
         if not versions:
             logger.info("[VERSION] No versions found, returning default 0.0.1")
             return '0.0.1'
-            
-        # Sort versions by timestamp (newest first)
-        versions.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        latest_version = versions[0]['version']
+
+        # By version number, not timestamp: updating a version in place bumps
+        # its timestamp, and the next number must still be past every version
+        latest_version = max((v['version'] for v in versions), key=version_sort_key)
         logger.info(f"[VERSION] Latest version is {latest_version}")
         return latest_version
     except Exception as e:
@@ -193,6 +351,11 @@ def get_next_version_number(latest_version, specified_version=None):
     return f"{major}.{minor}.{patch}"
 
 
+def _cached_version(version):
+    """The shared, cached config of a version; raises FileNotFoundError if it doesn't exist"""
+    return config_cache.get(get_version_file_path(version), _load_version_config, fresh=_in_writer())
+
+
 def get_version(version):
     """
     Get a specific version from the version history
@@ -201,19 +364,13 @@ def get_version(version):
         version (str): The version number to retrieve
         
     Returns:
-        dict: The config at that version, or None if not found
+        dict: A copy of the config at that version, or None if not found
     """
     try:
-        version_path = get_version_file_path(version)
-        if not os.path.exists(version_path):
-            logger.warning(f"Version file not found: {version_path}")
-            return None
-            
-        with open(version_path, 'r') as f:
-            version_data = json.load(f)
-            
-        # Return just the config, not the metadata
-        return version_data.get('config')
+        return copy.deepcopy(_cached_version(version))
+    except FileNotFoundError:
+        logger.warning(f"Version file not found for version {version}")
+        return None
     except Exception as e:
         logger.error(f"Error getting version {version}: {e}")
         return None
@@ -236,12 +393,16 @@ def get_version_with_metadata(version_number):
             return None
             
         with open(version_path, 'r') as f:
-            return json.load(f)
+            version_data = json.load(f)
+        version_data['config'] = _version_config(version_data)
+        version_data.pop('tree', None)
+        return version_data
     except Exception as e:
         logger.error(f"Error getting version with metadata {version_number}: {e}")
         return None
 
 
+@serialized
 def save_version(config, commit_message, sync_to_main=False, use_existing_version=None):
     """
     Save a version of the config to the version history
@@ -260,27 +421,20 @@ def save_version(config, commit_message, sync_to_main=False, use_existing_versio
     try:
         # If a specific version is requested to be updated
         if use_existing_version:
-            logger.info(f"[DEBUG-CRITICAL] Attempting to update existing version: {use_existing_version}")
             version_path = get_version_file_path(use_existing_version)
             
             if os.path.exists(version_path):
-                logger.info(f"[DEBUG-CRITICAL] Found existing version file to update: {version_path}")
                 success = update_version(use_existing_version, config, commit_message)
                 if success:
-                    logger.info(f"[DEBUG-CRITICAL] Successfully updated existing version: {use_existing_version}")
-                    
                     # Update the main config file if requested
                     if sync_to_main:
-                        with open(get_config_file_path(), 'w') as f:
-                            json.dump(config, f, indent=2)
-                        logger.info(f"[DEBUG-CRITICAL] Updated main config file with version {use_existing_version}")
-                    
+                        _write_json(get_config_file_path(), config)
                     return use_existing_version
                 else:
-                    logger.error(f"[DEBUG-CRITICAL] Failed to update existing version: {use_existing_version}")
+                    logger.error(f"Failed to update existing version: {use_existing_version}")
                     # Fall through to create a new version
             else:
-                logger.warning(f"[DEBUG-CRITICAL] Requested version {use_existing_version} does not exist, will create new version")
+                logger.warning(f"Requested version {use_existing_version} does not exist, will create new version")
                 # Fall through to create a new version
                 
         # Generate version number
@@ -312,19 +466,17 @@ def save_version(config, commit_message, sync_to_main=False, use_existing_versio
             'version': new_version,
             'commit_message': message,
             'timestamp': timestamp,
-            'config': config_copy
         }
+        _set_version_config(version_data, config_copy)
         
-        version_path = get_version_file_path(new_version)
-        with open(version_path, 'w') as f:
-            json.dump(version_data, f, indent=2)
+        _write_json(get_version_file_path(new_version), version_data)
+        _record_version(version_data)
         
         logger.info(f"[SAVE_VERSION] Saved version {new_version} with message: {message}")
         
         # Update the main config file if requested
         if sync_to_main:
-            with open(get_config_file_path(), 'w') as f:
-                json.dump(config_copy, f, indent=2)
+            _write_json(get_config_file_path(), config_copy)
             logger.info(f"[SAVE_VERSION] Updated main config file")
             
         return new_version
@@ -333,6 +485,7 @@ def save_version(config, commit_message, sync_to_main=False, use_existing_versio
         return None
 
 
+@serialized
 def rollback_to_version(version, commit_message=None, sync_to_main=False):
     """
     Roll back to a specific version of the configuration
@@ -406,6 +559,7 @@ def create_default_config():
     }
 
 
+@serialized
 def initialize_config():
     """
     Initialize the configuration system.
@@ -440,8 +594,7 @@ def initialize_config():
                 
                 # Copy it to our internal config location if it doesn't exist there yet
                 if not os.path.exists(get_config_file_path()):
-                    with open(get_config_file_path(), 'w') as f:
-                        json.dump(config, f, indent=2)
+                    _write_json(get_config_file_path(), config)
                     logger.info(f"[CONFIG] Copied user config to internal location: {get_config_file_path()}")
             except Exception as e:
                 logger.error(f"[CONFIG] Error loading user config: {str(e)}")
@@ -464,14 +617,12 @@ def initialize_config():
             config = create_default_config()
             
             # Save it to our internal location
-            with open(get_config_file_path(), 'w') as f:
-                json.dump(config, f, indent=2)
+            _write_json(get_config_file_path(), config)
             logger.info(f"[CONFIG] Saved default config to internal location: {get_config_file_path()}")
             
             # Also save it to the user's project root if they don't have one
             if not os.path.exists(user_config_path):
-                with open(user_config_path, 'w') as f:
-                    json.dump(config, f, indent=2)
+                _write_json(user_config_path, config)
                 logger.info(f"[CONFIG] Saved default config to user location: {user_config_path}")
         
         # Check if we have any versions saved yet
@@ -493,6 +644,45 @@ def initialize_config():
         return create_default_config()
 
 
+# Config directories whose startup initialization has run in this process
+_initialized_dirs = set()
+_initialize_lock = threading.Lock()
+
+
+def ensure_config_initialized():
+    """
+    Once per process and config directory: copy the project's
+    agensight.config.json over .agensight/config.json, initialize_config and
+    prune unreferenced config objects.
+    The server runs this as a background startup phase; config routes call it
+    first too, so a request either triggers it or waits for it to finish and
+    never reads the config mid-copy. Returns the config if this call did the
+    initialization, else None.
+    """
+    config_dir = get_config_dir()
+    if config_dir in _initialized_dirs:
+        return None
+    with _initialize_lock:
+        if config_dir in _initialized_dirs:
+            return None
+        with config_writer():
+            user_config_path = os.path.join(get_user_dir(), 'agensight.config.json')
+            if os.path.exists(user_config_path):
+                logger.info(f"Found user config at: {user_config_path}")
+                try:
+                    write_main_config(load_json(user_config_path))
+                    logger.info(f"Copied user config to: {get_config_file_path()}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not copy user config {user_config_path}: {str(e)}")
+            config = initialize_config()
+            removed = prune_config_objects()
+            if removed:
+                logger.info(f"Pruned {removed} unreferenced config objects")
+        _initialized_dirs.add(config_dir)
+        return config
+
+
+@serialized
 def update_version(version, config, commit_message=None):
     """
     Update a specific version file with new config data
@@ -506,28 +696,14 @@ def update_version(version, config, commit_message=None):
         bool: True if update was successful, False otherwise
     """
     try:
-        logger.info(f"[DEBUG-CRITICAL] update_version called for version: {version}")
-        logger.info(f"[DEBUG-CRITICAL] version type: {type(version)}")
-        
         version_path = get_version_file_path(version)
-        logger.info(f"[DEBUG-CRITICAL] version_path: {version_path}")
-        
         if not os.path.exists(version_path):
-            logger.warning(f"[DEBUG-CRITICAL] Version file not found: {version_path}")
-            # Try to list all available version files for debugging
-            try:
-                version_dir = get_version_dir_path()
-                existing_files = os.listdir(version_dir)
-                logger.info(f"[DEBUG-CRITICAL] Available version files: {existing_files}")
-            except Exception as e:
-                logger.error(f"[DEBUG-CRITICAL] Error listing version files: {str(e)}")
+            logger.warning(f"Version file not found: {version_path}")
             return False
             
         # Read existing version data
         with open(version_path, 'r') as f:
             version_data = json.load(f)
-            
-        logger.info(f"[DEBUG-CRITICAL] Read existing version data with keys: {list(version_data.keys())}")
         
         # Make a clean copy of the config
         config_copy = copy.deepcopy(config)
@@ -538,22 +714,261 @@ def update_version(version, config, commit_message=None):
                 del config_copy['temp']
         
         # Update config but keep version number
-        version_data['config'] = config_copy
+        _set_version_config(version_data, config_copy)
         
         # Update commit message if provided
         if commit_message:
-            logger.info(f"[DEBUG-CRITICAL] Updating commit message to: {commit_message}")
             version_data['commit_message'] = commit_message
             
         # Update timestamp
         version_data['timestamp'] = datetime.datetime.now().isoformat()
         
         # Write back to the file
-        with open(version_path, 'w') as f:
-            json.dump(version_data, f, indent=2)
+        _write_json(version_path, version_data)
+        _record_version(version_data)
             
-        logger.info(f"[DEBUG-CRITICAL] Successfully updated version {version} with message: {version_data['commit_message']}")
+        logger.info(f"Updated version {version} with message: {version_data['commit_message']}")
         return True
     except Exception as e:
-        logger.error(f"[DEBUG-CRITICAL] Error updating version {version}: {str(e)}", exc_info=True)
-        return False 
\ No newline at end of file
+        logger.error(f"Error updating version {version}: {str(e)}", exc_info=True)
+        return False 
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Config services shared by the /api routes and the legacy /flask-compat routes
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ConfigError(Exception):
+    """A config operation failed"""
+
+
+class VersionNotFoundError(ConfigError):
+    """The requested config version does not exist"""
+
+
+class VersionConflictError(ConfigError):
+    """The config changed since the client read it (its If-Match ETag is stale)"""
+
+    def __init__(self, message, current_etag=None):
+        super().__init__(message)
+        self.current_etag = current_etag
+
+
+def config_etag(version=None):
+    """
+    Strong ETag of the stored config at `version`, or of the main config for
+    None or "current". Served on reads and checked against If-Match on writes.
+    """
+    if not version or version == 'current':
+        path, loader = get_config_file_path(), load_json
+    else:
+        path, loader = get_version_file_path(version), _load_version_config
+    try:
+        return f'"{config_cache.get_digest(path, loader, fresh=_in_writer())[:32]}"'
+    except FileNotFoundError:
+        raise VersionNotFoundError(f"Config version {version or 'current'} not found")
+
+
+def check_etag(expected_etag, version=None):
+    """Raise VersionConflictError unless `expected_etag` (an If-Match value) is still current"""
+    if expected_etag is None:
+        return
+    current = config_etag(version)
+    if not etag_matches(expected_etag, current, strong=True):
+        raise VersionConflictError(
+            f"Config {'version ' + version if version else 'main config'} was changed by someone else; "
+            f"reload it and reapply your edit",
+            current_etag=current,
+        )
+
+
+def read_main_config():
+    """A copy of .agensight/config.json"""
+    try:
+        return copy.deepcopy(config_cache.get(get_config_file_path(), fresh=_in_writer()))
+    except Exception as e:
+        raise ConfigError(f"Could not load configuration: {str(e)}")
+
+
+@serialized
+def write_main_config(config, update_user_config=False):
+    """Write .agensight/config.json and, optionally, the project's agensight.config.json"""
+    _write_json(get_config_file_path(), config)
+    if update_user_config:
+        _write_json(os.path.join(get_user_dir(), 'agensight.config.json'), config)
+
+
+def list_config_versions():
+    """
+    Version metadata, newest first, with exactly one version marked current:
+    the one whose config matches the main config, else the newest.
+    """
+    versions = [
+        {
+            'version': info.get('version'),
+            'commit_message': info.get('commit_message', 'No commit message'),
+            'timestamp': info.get('timestamp', ''),
+            'hash': info.get('hash'),
+            'is_current': False,
+        }
+        for info in get_version_history()
+        if info.get('version') != 'current'
+    ]
+    if not versions:
+        return [{
+            'version': '1.0.0',
+            'commit_message': 'Initial version',
+            'timestamp': datetime.datetime.now().isoformat(),
+            'is_current': True,
+        }]
+
+    versions.sort(key=lambda v: v.get('timestamp', ''), reverse=True)
+    current = versions[0]
+    try:
+        main_hash = config_cache.get(get_config_file_path(), _load_config_hash)
+        current = next((v for v in versions if v['hash'] == main_hash), current)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error finding current version: {e}")
+    current['is_current'] = True
+    return versions
+
+
+def _resolve_config(version):
+    """
+    (path, loader) of the file holding the config at `version`, or the main
+    config for "current", falling back to the project's agensight.config.json.
+    None if neither has a config.
+    """
+    if version == 'current':
+        candidates = [(get_config_file_path(), load_json)]
+    else:
+        candidates = [(get_version_file_path(version), _load_version_config)]
+    candidates.append((os.path.join(get_user_dir(), 'agensight.config.json'), load_json))
+
+    for path, loader in candidates:
+        try:
+            if config_cache.get(path, loader):
+                return path, loader
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.error(f"Error loading config from {path}: {e}")
+    logger.warning(f"Config version {version} not found and no agensight.config.json exists")
+    return None
+
+
+def load_config(version):
+    """
+    The config at `version` (see _resolve_config), else the default config.
+    The result is shared with the cache and must not be mutated.
+    """
+    resolved = _resolve_config(version)
+    return config_cache.get(*resolved) if resolved else create_default_config()
+
+
+def load_config_json(version):
+    """load_config, serialized; cached along with the parsed config"""
+    resolved = _resolve_config(version)
+    if resolved:
+        return config_cache.get_json(*resolved)
+    return json.dumps(create_default_config()).encode('utf-8')
+
+
+def upsert_agent(config, agent_data):
+    """Replace the agent with the same name in `config`, or append it"""
+    agents = config.setdefault('agents', [])
+    for i, agent in enumerate(agents):
+        if agent.get('name') == agent_data['name']:
+            agents[i] = agent_data
+            return config
+    agents.append(agent_data)
+    return config
+
+
+@serialized
+def update_agent(agent_data, version=None, commit_message=None, sync_to_main=False, expected_etag=None):
+    """
+    Update (or add) an agent. With `version` the agent is changed in place in
+    that version; without it a new version is created from the main config.
+    With `expected_etag`, the edited config (that version, or the main
+    config) must still have that ETag.
+
+    Returns:
+        str: The version that now holds the agent
+    """
+    commit_message = commit_message or f"Updated agent: {agent_data['name']}"
+    check_etag(expected_etag, version)
+    if version:
+        config = get_version(version)
+        if config is None:
+            raise VersionNotFoundError(f"Config version {version} not found")
+        upsert_agent(config, agent_data)
+        if not update_version(version, config, commit_message):
+            raise ConfigError(f"Failed to update version {version}")
+        if sync_to_main:
+            write_main_config(config)
+        return version
+
+    config = upsert_agent(read_main_config(), agent_data)
+    new_version = save_version(config, commit_message, sync_to_main)
+    if not new_version:
+        raise ConfigError("Failed to save new version")
+    return new_version
+
+
+@serialized
+def commit_config_version(source_version=None, commit_message=None, sync_to_main=False, expected_etag=None):
+    """Save the config at `source_version` (default: the main config) as a new version"""
+    check_etag(expected_etag, source_version)
+    if source_version:
+        config = get_version(source_version)
+        if config is None:
+            raise VersionNotFoundError(f"Source config version {source_version} not found")
+    else:
+        config = read_main_config()
+    new_version = save_version(config, commit_message, sync_to_main)
+    if not new_version:
+        raise ConfigError("Failed to save new version")
+    return new_version
+
+
+@serialized
+def sync_version_to_main(version, expected_etag=None):
+    """
+    Make `version` the main config, in .agensight and the project root. With
+    `expected_etag`, the main config being replaced must still have that ETag.
+    """
+    check_etag(expected_etag)
+    config = get_version(version)
+    if config is None:
+        raise VersionNotFoundError(f"Config version {version} not found")
+    try:
+        write_main_config(config, update_user_config=True)
+    except Exception as e:
+        raise ConfigError(f"Error syncing config: {str(e)}")
+    return version
+
+
+def _version_tree(version):
+    """(tree, object store) of a version; older full-copy versions get an in-memory tree"""
+    try:
+        with open(get_version_file_path(version), 'r') as f:
+            version_data = json.load(f)
+    except FileNotFoundError:
+        raise VersionNotFoundError(f"Config version {version} not found")
+    if 'tree' in version_data:
+        return version_data['tree'], get_object_store()
+    tree, objects = build_tree(version_data.get('config') or {})
+    return tree, MemoryObjectStore(objects)
+
+
+def diff_config_versions(from_version, to_version):
+    """Agents added, removed and changed between two versions, and changed settings"""
+    old_tree, old_store = _version_tree(from_version)
+    new_tree, new_store = _version_tree(to_version)
+    return {
+        'from_version': from_version,
+        'to_version': to_version,
+        **diff_trees(old_tree, new_tree, old_store, new_store),
+    }
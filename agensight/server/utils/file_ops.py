@@ -1,9 +1,23 @@
 import json
+import os
+import tempfile
 
 def read_config(filename):
     with open(filename, 'r') as f:
         return json.load(f)
 
 def write_config(filename, data):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+    # Readers see the old file or the new one, never a partial write
+    write_json_atomic(filename, data)
+
+def write_json_atomic(filename, data, indent=2):
+    """Write JSON to a temp file in the same directory and rename it into place"""
+    directory = os.path.dirname(filename) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
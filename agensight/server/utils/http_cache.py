@@ -0,0 +1,61 @@
+"""
+Conditional GET helpers for the JSON API.
+
+Handlers compute a cheap version key for the data behind a response (row
+counts, max rowids, ...) and call `conditional_response`. When the client's
+If-None-Match matches, a 304 is returned without building the payload.
+"""
+import hashlib
+from typing import Any, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Bump when the shape of cached API payloads changes, so old ETags stop matching.
+PAYLOAD_VERSION = "1"
+
+NO_CACHE = "no-cache"
+# Only for data that never changes once written (span attributes)
+COMPLETED_CACHE_CONTROL = "private, max-age=300"
+
+
+def make_etag(*parts: Any) -> str:
+    """A strong ETag from a version key"""
+    digest = hashlib.sha1("|".join(map(str, (PAYLOAD_VERSION,) + parts)).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def etag_matches(header: Optional[str], etag: str, strong: bool = False) -> bool:
+    """
+    Whether an If-None-Match (weak comparison) or, with `strong`, an If-Match
+    header matches `etag`. Strong comparison, which RFC 9110 requires for
+    If-Match, never matches a weak W/ tag.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    if not strong:
+        # GZipMiddleware leaves ETags alone, but proxies may weaken them
+        candidates = (tag.removeprefix("W/") for tag in candidates)
+    return etag in candidates
+
+
+def conditional_response(
+    request: Request,
+    etag: Optional[str],
+    build: Callable[[], Any],
+    cache_control: str = NO_CACHE,
+) -> Response:
+    """
+    304 if the request's If-None-Match matches `etag`, otherwise a JSON
+    response from `build()`. Without an etag the response is not cacheable.
+    """
+    if etag is None:
+        return JSONResponse(content=build(), headers={"Cache-Control": "no-store"})
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=build(), headers=headers)
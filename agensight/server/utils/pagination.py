@@ -0,0 +1,26 @@
+"""
+Opaque keyset cursors for paginated list endpoints.
+
+A cursor is the sort position and id of the last row of a page; the next
+page is the rows after it in the same order.
+"""
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def make_cursor(position: float, row_id: str) -> str:
+    # repr round-trips floats exactly, so the next page starts right after this row
+    return f"{position!r}:{row_id}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    if not cursor:
+        return None
+    position, sep, row_id = cursor.partition(":")
+    try:
+        if not sep:
+            raise ValueError(cursor)
+        return float(position), row_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
@@ -0,0 +1,112 @@
+"""
+Level-of-detail layout of a trace's timeline for a viewport.
+
+Spans are placed in lanes by tree depth and mapped to pixel columns of the
+viewport. A span at least `min_px` wide is its own bar; runs of narrower
+spans in a lane that touch (within a pixel) are merged into one aggregate
+bar carrying their count, so the response grows with the viewport's width
+rather than the trace's size and the client only draws what it gets.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from agensight.tracing.db import ERROR_STATUS
+
+
+def span_depths(rows: Iterable[dict]) -> Dict[str, int]:
+    """Depth of every span in its tree; spans whose parent isn't in `rows` are roots"""
+    parents = {row["id"]: row["parent_id"] for row in rows}
+    depths: Dict[str, int] = {}
+    for span_id in parents:
+        # Walk up to the nearest span with a known depth, then fill in the path
+        path = []
+        current = span_id
+        while current is not None and current not in depths:
+            path.append(current)
+            current = parents.get(current)
+        depth = depths[current] if current is not None else -1
+        for node in reversed(path):
+            depth += 1
+            depths[node] = depth
+    return depths
+
+
+def _bar(row: dict, end: float, x: float, w: float) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "start": row["started_at"],
+        "end": end,
+        "status": row["status"],
+        "count": 1,
+        "errors": int(row["status"] == ERROR_STATUS),
+        "x": round(x, 2),
+        "w": round(w, 2),
+    }
+
+
+def build_timeline(rows: List[dict], start: float, end: float, width: int, min_px: float = 1.0) -> dict:
+    """
+    Bars per lane for the spans in `rows` (ordered by started_at) that overlap
+    [start, end], laid out on `width` pixels. Aggregate bars have no id, the
+    name their spans share (None if they differ), and `count` > 1.
+    """
+    depths = span_depths(rows)
+    scale = width / (end - start) if end > start else 0.0
+    lanes: Dict[int, List[dict]] = {}
+    # The aggregate being extended in each lane: [bar, right edge in px]
+    open_groups: Dict[int, list] = {}
+    visible = 0
+
+    for row in rows:
+        span_start = row["started_at"]
+        span_end = row["ended_at"] if row["ended_at"] is not None else span_start
+        if span_end < start or span_start > end:
+            continue
+        visible += 1
+        x0 = (max(span_start, start) - start) * scale
+        x1 = (min(span_end, end) - start) * scale
+        depth = depths[row["id"]]
+        bars = lanes.setdefault(depth, [])
+        if x1 - x0 >= min_px:
+            bars.append(_bar(row, span_end, x0, x1 - x0))
+            continue
+
+        group = open_groups.get(depth)
+        if group is not None and x0 <= group[1] + min_px:
+            bar = group[0]
+            if bar["count"] == 1:
+                # A second narrow span joins: the bar becomes an aggregate
+                bar["id"] = None
+                bar["status"] = None
+            bar["count"] += 1
+            bar["errors"] += row["status"] == ERROR_STATUS
+            if bar["name"] != row["name"]:
+                bar["name"] = None
+            if span_end > bar["end"]:
+                bar["end"] = span_end
+            group[1] = max(group[1], x1)
+            bar["w"] = round(group[1] - bar["x"], 2)
+        else:
+            bar = _bar(row, span_end, x0, x1 - x0)
+            bars.append(bar)
+            open_groups[depth] = [bar, x1]
+
+    return {
+        "start": start,
+        "end": end,
+        "width": width,
+        "span_count": len(rows),
+        "visible_spans": visible,
+        "bar_count": sum(len(bars) for bars in lanes.values()),
+        "lanes": [{"depth": depth, "bars": lanes[depth]} for depth in sorted(lanes)],
+    }
+
+
+def trace_extent(rows: List[dict]) -> Optional[tuple]:
+    """(first start, last end) of a trace's spans, or None if it has none"""
+    if not rows:
+        return None
+    return (
+        min(row["started_at"] for row in rows),
+        max(row["ended_at"] if row["ended_at"] is not None else row["started_at"] for row in rows),
+    )
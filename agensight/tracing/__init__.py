@@ -1,4 +1,5 @@
 from .setup import setup_tracing
 from .tracer import get_tracer, start_span
 from .session import enable_session_tracking, set_session_id, get_session_id
-from .config import configure_tracing
\ No newline at end of file
+from .config import configure_tracing
+from .propagation import TraceCarrier, capture_context, attach_context, with_trace_context
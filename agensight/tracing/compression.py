@@ -0,0 +1,97 @@
+"""
+Transparent compression for large TEXT columns of the trace DB.
+
+Span attributes, prompts and completions are mostly repetitive English and
+JSON. Values above a size threshold are deflated against a preset dictionary
+of the strings that show up in almost every row and stored as BLOBs; smaller
+values stay plain TEXT. Readers call `inflate` only when they actually need
+the content, so listing views never pay for decompression.
+
+Stored layout: MAGIC (2 bytes) + dictionary version (1 byte) + raw deflate.
+"""
+import zlib
+from typing import Any, Optional
+
+from .config import config
+
+MAGIC = b"\x1fA"
+DICT_VERSION = 1
+MIN_COMPRESS_BYTES = 256
+
+# zlib gives the most weight to the end of a preset dictionary, so the
+# most frequent fragments come last.
+_ZDICT_V1 = (
+    " the and to of a in is that for it you with on as this be are was can "
+    "have your will not or from at by an but if they we what about which "
+    "Here is a summary of the Please provide I'm sorry, but I can help you "
+    "with that. Let me know if you have any other questions. "
+    '"gen_ai.request.model": "gpt-4o-mini", "gen_ai.system": "OpenAI", '
+    '"gen_ai.system": "Anthropic", "gen_ai.request.model": "claude-3", '
+    '"gen_ai.completion.0.tool_calls.0.name": "'
+    '"gen_ai.completion.0.tool_calls.0.arguments": "{\\"'
+    '"gen_ai.completion.0.finish_reason": "stop", '
+    '"gen_ai.completion.0.role": "assistant", "gen_ai.completion.0.content": "'
+    '"gen_ai.prompt.0.role": "system", "gen_ai.prompt.0.content": "'
+    '"gen_ai.prompt.1.role": "user", "gen_ai.prompt.1.content": "'
+    '"llm.usage.total_tokens": "gen_ai.usage.prompt_tokens": '
+    '"gen_ai.usage.completion_tokens": "trace.name": "session.id": "'
+    '"trace_id": "agent.name": "'
+    '"gen_ai.normalized_input_output": "{\\"prompts\\": [{\\"role\\": \\"user\\", '
+    '\\"content\\": \\"'
+    '\\"completions\\": [{\\"role\\": \\"assistant\\", \\"content\\": \\"'
+    '\\"finish_reason\\": \\"stop\\", \\"completion_tokens\\": '
+    '\\"prompt_tokens\\": \\"total_tokens\\": '
+    '{"prompts": [{"role": "user", "content": "'
+    '"completions": [{"role": "assistant", "content": "'
+    '"finish_reason": "stop", "completion_tokens": '
+    '"prompt_tokens": "total_tokens": '
+).encode("utf-8")
+
+_DICTS = {DICT_VERSION: _ZDICT_V1}
+
+
+def compression_enabled() -> bool:
+    return bool(config.get("compression", True))
+
+
+def deflate(value: Optional[str], min_bytes: int = MIN_COMPRESS_BYTES) -> Any:
+    """
+    Compress `value` for storage if it is large enough and compression pays
+    off. Returns either the original string or a BLOB understood by `inflate`.
+    """
+    if not isinstance(value, str) or not compression_enabled():
+        return value
+
+    raw = value.encode("utf-8")
+    if len(raw) < min_bytes:
+        return value
+
+    compressor = zlib.compressobj(level=6, wbits=-15, zdict=_DICTS[DICT_VERSION])
+    packed = MAGIC + bytes([DICT_VERSION]) + compressor.compress(raw) + compressor.flush()
+    return packed if len(packed) < len(raw) else value
+
+
+def inflate(value: Any) -> Any:
+    """Return the text for a value read from the DB, decompressing BLOBs written by `deflate`."""
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+
+    data = bytes(value)
+    if not data.startswith(MAGIC) or len(data) < 3:
+        return data.decode("utf-8", errors="replace")
+
+    zdict = _DICTS.get(data[2])
+    if zdict is None:
+        raise ValueError(f"Unknown compression dictionary version: {data[2]}")
+
+    decompressor = zlib.decompressobj(wbits=-15, zdict=zdict)
+    return (decompressor.decompress(data[3:]) + decompressor.flush()).decode("utf-8")
+
+
+def inflate_row(row, *columns: str) -> dict:
+    """Convert a DB row to a dict, inflating the given columns."""
+    record = dict(row)
+    for column in columns:
+        if column in record:
+            record[column] = inflate(record[column])
+    return record
@@ -2,7 +2,14 @@ import os
 
 config = {
     "exporter": os.getenv("TRACE_EXPORTER", "console"),
-    "session_tracking": os.getenv("TRACE_SESSION_ENABLED", "false").lower() == "true"
+    "session_tracking": os.getenv("TRACE_SESSION_ENABLED", "false").lower() == "true",
+    "compression": os.getenv("TRACE_COMPRESSION", "true").lower() == "true",
+    # Span batching; the OTEL_BSP_* names match what BatchSpanProcessor honoured.
+    "max_queue_size": int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048")),
+    "max_export_batch_size": int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+    "schedule_delay_millis": float(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000")),
+    "drop_policy": os.getenv("TRACE_DROP_POLICY", "drop_newest"),
+    "adaptive_batching": os.getenv("TRACE_ADAPTIVE_BATCHING", "true").lower() == "true",
 }
 
 def configure_tracing(**kwargs):
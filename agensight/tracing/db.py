@@ -1,21 +1,30 @@
+import os
 import sqlite3
+import threading
 from pathlib import Path
 
-DB_FILE = Path(__file__).parent / "traces.db"
+DB_FILE = Path(os.getenv("AGENSIGHT_TRACE_DB", Path(__file__).parent / "traces.db"))
 
-def get_db():
-    conn = sqlite3.connect(DB_FILE)
+def get_db(path=None, **kwargs):
+    conn = sqlite3.connect(path or DB_FILE, **kwargs)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_schema():
-    conn = get_db()
+def init_schema(path=None):
+    conn = get_db(path)
     cursor = conn.cursor()
     cursor.executescript('''
     CREATE TABLE IF NOT EXISTS sessions (
         id TEXT PRIMARY KEY,
         started_at REAL,
-        metadata TEXT
+        metadata TEXT,
+        trace_count INTEGER DEFAULT 0,
+        first_seen REAL,
+        last_seen REAL,
+        total_tokens INTEGER DEFAULT 0,
+        error_count INTEGER DEFAULT 0,
+        total_latency REAL DEFAULT 0,
+        total_cost REAL DEFAULT 0
     );
 
     CREATE TABLE IF NOT EXISTS traces (
@@ -25,7 +34,8 @@ def init_schema():
         started_at REAL,
         ended_at REAL,
         metadata TEXT,
-        total_tokens INTEGER
+        total_tokens INTEGER,
+        cost REAL
     );
 
     CREATE TABLE IF NOT EXISTS spans (
@@ -38,7 +48,9 @@ def init_schema():
         duration REAL,
         kind TEXT,
         status TEXT,
-        attributes TEXT
+        attributes TEXT,
+        cost REAL,
+        tokens INTEGER
     );
 
     CREATE TABLE IF NOT EXISTS prompts (
@@ -69,6 +81,252 @@ def init_schema():
         arguments TEXT,
         FOREIGN KEY(span_id) REFERENCES spans(id)
     );
+
+    CREATE TABLE IF NOT EXISTS cost_buckets (
+        bucket_start INTEGER,
+        model TEXT,
+        calls INTEGER DEFAULT 0,
+        unpriced_calls INTEGER DEFAULT 0,
+        prompt_tokens INTEGER DEFAULT 0,
+        completion_tokens INTEGER DEFAULT 0,
+        cached_tokens INTEGER DEFAULT 0,
+        cost REAL DEFAULT 0,
+        PRIMARY KEY (bucket_start, model)
+    );
     ''')
+    added = {table: _add_missing_columns(conn, table, columns) for table, columns in ADDED_COLUMNS.items()}
+    cursor.executescript('''
+    CREATE INDEX IF NOT EXISTS idx_traces_session ON traces (session_id, started_at, id);
+    CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions (last_seen, id);
+    CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans (trace_id, started_at);
+    CREATE INDEX IF NOT EXISTS idx_spans_parent ON spans (trace_id, parent_id, started_at);
+    CREATE INDEX IF NOT EXISTS idx_prompts_span ON prompts (span_id, message_index);
+    CREATE INDEX IF NOT EXISTS idx_completions_span ON completions (span_id);
+    CREATE INDEX IF NOT EXISTS idx_tools_span ON tools (span_id);
+
+    -- Bumped on every change to sessions and traces (new rows, but also session
+    -- links and totals added to existing ones), so readers can tell if a list
+    -- changed in O(1)
+    CREATE TABLE IF NOT EXISTS change_counters (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO change_counters (name, version) VALUES ('sessions', 0), ('traces', 0);
+    CREATE TRIGGER IF NOT EXISTS traces_inserted AFTER INSERT ON traces BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'traces';
+    END;
+    CREATE TRIGGER IF NOT EXISTS traces_updated AFTER UPDATE ON traces BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'traces';
+    END;
+    CREATE TRIGGER IF NOT EXISTS traces_deleted AFTER DELETE ON traces BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'traces';
+    END;
+    CREATE TRIGGER IF NOT EXISTS sessions_inserted AFTER INSERT ON sessions BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'sessions';
+    END;
+    CREATE TRIGGER IF NOT EXISTS sessions_updated AFTER UPDATE ON sessions BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'sessions';
+    END;
+    CREATE TRIGGER IF NOT EXISTS sessions_deleted AFTER DELETE ON sessions BEGIN
+        UPDATE change_counters SET version = version + 1 WHERE name = 'sessions';
+    END;
+    ''')
+    if added["sessions"]:
+        # Databases from before session rollups: derive them from what's there
+        rebuild_sessions(conn)
+    if "tokens" in added["spans"]:
+        fill_span_tokens(conn)
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def ensure_schema(path=None):
+    """init_schema once per process and database, for readers like the server"""
+    path = str(path or DB_FILE)
+    if path in _schema_ready:
+        return
+    with _schema_lock:
+        if path not in _schema_ready:
+            init_schema(path)
+            _schema_ready.add(path)
+
+
+# Aggregates kept on each sessions row; init_schema adds them to older databases
+SESSION_ROLLUP_COLUMNS = (
+    ("trace_count", "INTEGER DEFAULT 0"),
+    ("first_seen", "REAL"),
+    ("last_seen", "REAL"),
+    ("total_tokens", "INTEGER DEFAULT 0"),
+    ("error_count", "INTEGER DEFAULT 0"),
+    ("total_latency", "REAL DEFAULT 0"),
+    ("total_cost", "REAL DEFAULT 0"),
+)
+
+# Columns added since the tables were first created, by table
+ADDED_COLUMNS = {
+    "sessions": SESSION_ROLLUP_COLUMNS,
+    "traces": (("cost", "REAL"),),
+    "spans": (("cost", "REAL"), ("tokens", "INTEGER")),
+}
+
+# Width of the cost_buckets time buckets; coarser ranges sum them
+COST_BUCKET_SECONDS = 3600
+
+ERROR_STATUS = "StatusCode.ERROR"
+
+
+def change_counter(conn, name):
+    """The change_counters version of table `name`: it differs after any write to the table"""
+    row = conn.execute("SELECT version FROM change_counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def _add_missing_columns(conn, table, columns):
+    """ALTER TABLE in the columns `table` doesn't have yet; returns the names added"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    added = []
+    for name, decl in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
+
+def link_trace_session(conn, trace_id, session_id):
+    """
+    Set the session of a trace whose row has none yet. True if this call
+    linked it, i.e. the trace is new to the session's trace_count.
+    """
+    cursor = conn.execute(
+        "UPDATE traces SET session_id = ? WHERE id = ? AND session_id IS NULL", (session_id, trace_id)
+    )
+    return cursor.rowcount == 1
+
+
+def add_session_rollups(conn, rows):
+    """
+    Add deltas to the sessions' aggregates, creating rows for new sessions.
+    Rows are (session_id, traces, first_seen, last_seen, tokens, errors,
+    latency, cost); the caller owns the transaction.
+    """
+    conn.executemany(
+        """
+        INSERT INTO sessions (id, started_at, trace_count, first_seen, last_seen, total_tokens, error_count, total_latency, total_cost)
+        VALUES (?1, ?3, ?2, ?3, ?4, ?5, ?6, ?7, ?8)
+        ON CONFLICT(id) DO UPDATE SET
+            trace_count = trace_count + excluded.trace_count,
+            started_at = MIN(COALESCE(started_at, excluded.started_at), excluded.started_at),
+            first_seen = MIN(COALESCE(first_seen, excluded.first_seen), excluded.first_seen),
+            last_seen = MAX(COALESCE(last_seen, excluded.last_seen), excluded.last_seen),
+            total_tokens = total_tokens + excluded.total_tokens,
+            error_count = error_count + excluded.error_count,
+            total_latency = total_latency + excluded.total_latency,
+            total_cost = total_cost + excluded.total_cost
+        """,
+        rows,
+    )
+
+
+def add_cost_buckets(conn, rows):
+    """
+    Add to the per-model usage and cost of time buckets. Rows are
+    (bucket_start, model, calls, unpriced_calls, prompt_tokens,
+    completion_tokens, cached_tokens, cost).
+    """
+    conn.executemany(
+        """
+        INSERT INTO cost_buckets (bucket_start, model, calls, unpriced_calls, prompt_tokens, completion_tokens, cached_tokens, cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(bucket_start, model) DO UPDATE SET
+            calls = calls + excluded.calls,
+            unpriced_calls = unpriced_calls + excluded.unpriced_calls,
+            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+            completion_tokens = completion_tokens + excluded.completion_tokens,
+            cached_tokens = cached_tokens + excluded.cached_tokens,
+            cost = cost + excluded.cost
+        """,
+        rows,
+    )
+
+
+def rebuild_sessions(conn):
+    """Recompute every session's aggregates from the traces and spans tables"""
+    conn.execute(
+        """
+        INSERT INTO sessions (id, started_at, trace_count, first_seen, last_seen, total_tokens, error_count, total_latency, total_cost)
+        SELECT t.session_id, MIN(t.started_at), COUNT(*), MIN(t.started_at), MAX(t.ended_at),
+               TOTAL(t.total_tokens), TOTAL(s.errors), TOTAL(s.latency), TOTAL(t.cost)
+        FROM traces t
+        LEFT JOIN (
+            SELECT trace_id,
+                   SUM(status = ?) AS errors,
+                   TOTAL(CASE WHEN parent_id IS NULL THEN duration END) AS latency
+            FROM spans GROUP BY trace_id
+        ) s ON s.trace_id = t.id
+        WHERE t.session_id IS NOT NULL
+        GROUP BY t.session_id
+        ON CONFLICT(id) DO UPDATE SET
+            started_at = excluded.started_at,
+            trace_count = excluded.trace_count,
+            first_seen = excluded.first_seen,
+            last_seen = excluded.last_seen,
+            total_tokens = excluded.total_tokens,
+            error_count = excluded.error_count,
+            total_latency = excluded.total_latency,
+            total_cost = excluded.total_cost
+        """,
+        (ERROR_STATUS,),
+    )
+
+
+def fill_span_tokens(conn):
+    """
+    Set the token count of spans written without one, from their completions.
+    Only leaf spans are filled: an ancestor's completions can include usage
+    rolled up from below, which its descendants already count.
+    """
+    # A correlated subquery rather than UPDATE ... FROM, which needs SQLite 3.33+
+    conn.execute(
+        """
+        UPDATE spans SET tokens = (SELECT SUM(total_tokens) FROM completions WHERE completions.span_id = spans.id)
+        WHERE spans.tokens IS NULL
+          AND EXISTS (SELECT 1 FROM completions WHERE completions.span_id = spans.id)
+          AND NOT EXISTS (SELECT 1 FROM spans AS child WHERE child.trace_id = spans.trace_id AND child.parent_id = spans.id)
+        """
+    )
+
+
+def bulk_insert(conn, traces=(), spans=(), prompts=(), completions=(), tools=()):
+    """
+    Write pre-built rows with one executemany per table. Rows are tuples in
+    column order; the caller owns the transaction.
+    """
+    if traces:
+        conn.executemany(
+            "INSERT OR IGNORE INTO traces (id, session_id, name, started_at, ended_at, metadata, total_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            traces,
+        )
+    if spans:
+        conn.executemany(
+            "INSERT OR IGNORE INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            spans,
+        )
+    if prompts:
+        conn.executemany(
+            "INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)",
+            prompts,
+        )
+    if completions:
+        conn.executemany(
+            "INSERT INTO completions (span_id, role, content, finish_reason, total_tokens, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            completions,
+        )
+    if tools:
+        conn.executemany(
+            "INSERT INTO tools (span_id, name, arguments) VALUES (?, ?, ?)",
+            tools,
+        )
@@ -11,7 +11,7 @@ from opentelemetry.trace.status import Status, StatusCode
 from agensight.tracing import get_tracer
 from agensight.tracing.session import is_session_enabled, get_session_id
 from agensight.tracing.context import trace_input, trace_output
-from agensight.tracing.db import get_db
+from agensight.tracing.db import add_session_rollups, get_db, link_trace_session
 
 # Global contextvars
 current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
@@ -36,10 +36,13 @@ def trace(name: Optional[str] = None, **default_attributes):
                 conn = get_db()
                 metadata = json.dumps(default_attributes or {})
                 session_id = get_session_id() if is_session_enabled() else None
-                conn.execute(
+                cursor = conn.execute(
                     "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
                     (trace_id, trace_name, started_at, ended_at, session_id, metadata)
                 )
+                # The exporter may have written the row first, without a session
+                if session_id and (cursor.rowcount == 1 or link_trace_session(conn, trace_id, session_id)):
+                    add_session_rollups(conn, [(session_id, 1, started_at, ended_at, 0, 0, 0.0, 0.0)])
                 conn.commit()
             except Exception:
                 pass
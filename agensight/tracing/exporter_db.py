@@ -1,9 +1,17 @@
 import json
 import re
-from collections import defaultdict
+import threading
+import time
+from collections import OrderedDict
 from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
-from agensight.tracing.db import get_db
-from agensight.tracing.utils import parse_normalized_io_for_span
+from agensight.tracing.db import (
+    COST_BUCKET_SECONDS, ERROR_STATUS, add_cost_buckets, add_session_rollups, get_db, link_trace_session
+)
+from agensight.tracing.utils import parse_normalized_io_for_span, slim_span_attributes
+from agensight.tracing.compression import deflate
+from agensight.tracing import metrics
+from agensight.tracing.pricing import span_cost
+from agensight.tracing.token_propagator import descendant_usage
 
 TOKEN_PATTERNS = [
     r'"total_tokens":\s*(\d+)',
@@ -100,11 +108,108 @@ def _make_io_from_openai_attrs(attrs, span_id, span_name):
 
     return json.dumps({"prompts": prompts, "completions": completions})
 
+def _begin_write(conn):
+    """Take the SQLite write lock up front so the time spent waiting for it is measurable."""
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    metrics.sqlite_lock_wait.observe(time.perf_counter() - started)
+
+
+def _write_messages(conn, attrs, prompts, completions):
+    """
+    Insert a span's prompt and completion rows and return the attributes to
+    store with it: slimmed if the rows were written, in full (content
+    included) if they couldn't be, so no message content is lost.
+    """
+    conn.execute("SAVEPOINT messages")
+    try:
+        for p in prompts:
+            conn.execute("INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)",
+                         (p["span_id"], p["role"], deflate(p["content"]), p["message_index"]))
+        for c in completions:
+            conn.execute("INSERT INTO completions (span_id, role, content, finish_reason, total_tokens, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (
+                             c["span_id"], c["role"], deflate(c["content"]), c["finish_reason"],
+                             c["total_tokens"], c["prompt_tokens"], c["completion_tokens"]
+                         ))
+    except Exception as e:
+        conn.execute("ROLLBACK TO messages")
+        conn.execute("RELEASE messages")
+        metrics.export_errors.inc(stage="messages", reason=type(e).__name__)
+        return attrs
+    conn.execute("RELEASE messages")
+    return slim_span_attributes(attrs, prompts, completions)
+
+
+# Traces whose row or session isn't written yet, kept with their partial rollups
+PENDING_TRACES = 10_000
+
+
+class _Held:
+    """
+    Bounded map of per-trace deltas that can't be applied yet: spans can be
+    exported before their trace's row or session exists (children before
+    the root). The oldest traces are forgotten first.
+    """
+
+    def __init__(self, merge, limit=PENDING_TRACES):
+        self._merge = merge
+        self._limit = limit
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace_id, value):
+        with self._lock:
+            held = self._items.pop(trace_id, None)
+            self._items[trace_id] = value if held is None else self._merge(held, value)
+            while len(self._items) > self._limit:
+                self._items.popitem(last=False)
+
+    def pop(self, trace_id):
+        with self._lock:
+            return self._items.pop(trace_id, None)
+
+
 class DBSpanExporter(SpanExporter):
+    def __init__(self):
+        self._pending_sessions = _Held(_merge_trace_stats)
+        self._pending_traces = _Held(_merge_trace_deltas)
+
     def export(self, spans):
-        conn = get_db()
-        total_tokens_by_trace = defaultdict(int)
+        started = time.perf_counter()
+        metrics.export_batch_size.observe(len(spans))
+        try:
+            conn = get_db()
+            _begin_write(conn)
+        except Exception as e:
+            metrics.spans_dropped.inc(len(spans), reason=type(e).__name__)
+            metrics.export_duration.observe(time.perf_counter() - started)
+            return SpanExportResult.FAILURE
+
+        counts = {"written": 0, "dropped": 0}
+        try:
+            self._write_spans(conn, spans, counts)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            # Spans already counted as dropped individually aren't counted twice.
+            metrics.spans_dropped.inc(len(spans) - counts["dropped"], reason=type(e).__name__)
+            return SpanExportResult.FAILURE
+        finally:
+            conn.close()
+            metrics.export_duration.observe(time.perf_counter() - started)
+
+        metrics.spans_written.inc(counts["written"])
+        return SpanExportResult.SUCCESS
+
+    def _write_spans(self, conn, spans, counts):
         span_map = {format(span.get_span_context().span_id, "016x"): span for span in spans}
+        # Per trace: [first start, last end, error spans, root span latency, tokens, cost]
+        trace_stats = {}
+        # Per (bucket, model): [calls, unpriced calls, prompt, completion, cached tokens, cost]
+        cost_buckets = {}
+        session_by_trace = {}
+        new_traces = set()
 
         for span in spans:
             ctx = span.get_span_context()
@@ -121,40 +226,80 @@ class DBSpanExporter(SpanExporter):
             if "gen_ai.normalized_input_output" not in attrs and is_llm:
                 attrs["gen_ai.normalized_input_output"] = _make_io_from_openai_attrs(attrs, span_id, span.name)
 
+            nio = attrs.get("gen_ai.normalized_input_output")
+            prompts, completions = parse_normalized_io_for_span(span_id, nio) if nio else ([], [])
+
+            session_id = attrs.get("session.id")
+            if session_id:
+                session_by_trace.setdefault(trace_id, session_id)
+
+            span_tokens = sum(int(c["total_tokens"]) for c in completions if c["total_tokens"])
+            # Usage TokenPropagator rolled up from child spans is counted on those spans
+            own_tokens = max(span_tokens - descendant_usage(attrs)[0], 0)
+
+            cost = None
+            if completions:
+                prompt_tokens = sum(int(c["prompt_tokens"] or 0) for c in completions)
+                completion_tokens = sum(int(c["completion_tokens"] or 0) for c in completions)
+                # Only spans naming their model are priced, so usage rolled up onto parent spans isn't paid twice
+                model, cached_tokens, cost = span_cost(attrs, prompt_tokens, completion_tokens, start)
+                if model:
+                    bucket = cost_buckets.setdefault(
+                        (int(start // COST_BUCKET_SECONDS) * COST_BUCKET_SECONDS, model), [0, 0, 0, 0, 0, 0.0]
+                    )
+                    bucket[0] += 1
+                    bucket[1] += cost is None
+                    bucket[2] += prompt_tokens
+                    bucket[3] += completion_tokens
+                    bucket[4] += cached_tokens
+                    bucket[5] += cost or 0.0
+
+            # The span row and its messages are written together: slimmed
+            # attributes reference the message rows, so they're only stored
+            # once those rows are in.
+            conn.execute("SAVEPOINT span")
             try:
+                attributes = _write_messages(conn, attrs, prompts, completions)
                 if parent_id is None:
-                    conn.execute(
-                        "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, metadata) VALUES (?, ?, ?, ?, ?)",
-                        (trace_id, attrs.get("trace.name", span.name), start, end, json.dumps({}))
+                    session_id = session_by_trace.get(trace_id)
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO traces (id, session_id, name, started_at, ended_at, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                        (trace_id, session_id, attrs.get("trace.name", span.name), start, end, json.dumps({}))
                     )
+                    if session_id and cursor.rowcount == 1:
+                        new_traces.add(trace_id)
 
                 conn.execute(
-                    "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes, cost, tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                     (
                         span_id, trace_id, parent_id, span.name, start, end, duration,
-                        str(span.kind), str(span.status.status_code), json.dumps(attrs)
+                        str(span.kind), str(span.status.status_code),
+                        deflate(json.dumps(attributes)), cost, own_tokens
                     )
                 )
-            except:
+            except Exception as e:
+                conn.execute("ROLLBACK TO span")
+                conn.execute("RELEASE span")
+                metrics.spans_dropped.inc(reason=type(e).__name__)
+                counts["dropped"] += 1
                 continue
+            conn.execute("RELEASE span")
+            counts["written"] += 1
 
-            try:
-                nio = attrs.get("gen_ai.normalized_input_output")
-                if nio:
-                    prompts, completions = parse_normalized_io_for_span(span_id, nio)
-                    for p in prompts:
-                        conn.execute("INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)",
-                                     (p["span_id"], p["role"], p["content"], p["message_index"]))
-                    for c in completions:
-                        conn.execute("INSERT INTO completions (span_id, role, content, finish_reason, total_tokens, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                     (
-                                         c["span_id"], c["role"], c["content"], c["finish_reason"],
-                                         c["total_tokens"], c["prompt_tokens"], c["completion_tokens"]
-                                     ))
-                        if c["total_tokens"]:
-                            total_tokens_by_trace[trace_id] += int(c["total_tokens"])
-            except:
-                pass
+            stats = trace_stats.get(trace_id)
+            if stats is None:
+                stats = trace_stats[trace_id] = [start, end, 0, 0.0, 0, 0.0]
+            else:
+                stats[0] = min(stats[0], start)
+                stats[1] = max(stats[1], end)
+            if str(span.status.status_code) == ERROR_STATUS:
+                stats[2] += 1
+            if parent_id is None:
+                stats[3] += duration
+            if cost:
+                stats[5] += cost
+
+            stats[4] += own_tokens
 
             try:
                 has_tool_calls = False
@@ -185,8 +330,8 @@ class DBSpanExporter(SpanExporter):
                             if not existing:
                                 conn.execute("INSERT INTO tools (span_id, name, arguments) VALUES (?, ?, ?)",
                                              (parent_id, name, args))
-            except:
-                pass
+            except Exception as e:
+                metrics.export_errors.inc(stage="tools", reason=type(e).__name__)
 
         for span in spans:
             ctx = span.get_span_context()
@@ -207,10 +352,85 @@ class DBSpanExporter(SpanExporter):
                                      (parent_id, name, args))
 
         try:
-            for trace_id, total in total_tokens_by_trace.items():
-                conn.execute("UPDATE traces SET total_tokens=? WHERE id=?", (total, trace_id))
-            conn.commit()
-        except:
-            pass
+            self._update_traces(conn, trace_stats, cost_buckets)
+        except Exception as e:
+            metrics.export_errors.inc(stage="totals", reason=type(e).__name__)
+
+        try:
+            self._update_sessions(conn, trace_stats, session_by_trace, new_traces)
+        except Exception as e:
+            metrics.export_errors.inc(stage="sessions", reason=type(e).__name__)
+
+    def _update_traces(self, conn, trace_stats, cost_buckets):
+        """Add this batch's tokens and costs to their traces, and costs to their time buckets"""
+        for trace_id, stats in trace_stats.items():
+            delta = [stats[4], stats[5]]
+            held = self._pending_traces.pop(trace_id)
+            if held:
+                _merge_trace_deltas(delta, held)
+            if not any(delta):
+                continue
+            # Increments, not totals: a trace's spans arrive over several
+            # batches, and possibly from several processes
+            cursor = conn.execute(
+                """
+                UPDATE traces SET
+                    total_tokens = COALESCE(total_tokens, 0) + :tokens,
+                    cost = CASE WHEN :cost THEN COALESCE(cost, 0) + :cost ELSE cost END
+                WHERE id = :id
+                """,
+                {"tokens": delta[0], "cost": delta[1], "id": trace_id},
+            )
+            if cursor.rowcount == 0:
+                self._pending_traces.add(trace_id, delta)
+        if cost_buckets:
+            add_cost_buckets(conn, [key + tuple(values) for key, values in cost_buckets.items()])
+
+    def _update_sessions(self, conn, trace_stats, session_by_trace, new_traces):
+        """Fold this batch into the sessions' aggregates"""
+        rollups = {}
+        for trace_id, stats in trace_stats.items():
+            session_id = session_by_trace.get(trace_id)
+            if session_id:
+                if trace_id not in new_traces and link_trace_session(conn, trace_id, session_id):
+                    new_traces.add(trace_id)
+            else:
+                # Spans from instrumented libraries don't carry the session; their trace row does
+                row = conn.execute("SELECT session_id FROM traces WHERE id = ?", (trace_id,)).fetchone()
+                session_id = row[0] if row else None
+
+            if not session_id:
+                self._pending_sessions.add(trace_id, list(stats))
+                continue
+            pending = self._pending_sessions.pop(trace_id)
+            if pending:
+                stats = _merge_trace_stats(list(stats), pending)
+
+            first, last, errors, latency, tokens, cost = stats
+            rollup = rollups.get(session_id)
+            if rollup is None:
+                rollup = rollups[session_id] = [session_id, 0, first, last, 0, 0, 0.0, 0.0]
+            rollup[1] += trace_id in new_traces
+            rollup[2] = min(rollup[2], first)
+            rollup[3] = max(rollup[3], last)
+            rollup[4] += tokens
+            rollup[5] += errors
+            rollup[6] += latency
+            rollup[7] += cost
+
+        if rollups:
+            add_session_rollups(conn, [tuple(r) for r in rollups.values()])
+
+
+def _merge_trace_deltas(into, delta):
+    into[0] += delta[0]
+    into[1] += delta[1]
+    return into
+
 
-        return SpanExportResult.SUCCESS
\ No newline at end of file
+def _merge_trace_stats(into, stats):
+    into[0] = min(into[0], stats[0])
+    into[1] = max(into[1], stats[1])
+    for i in range(2, 6):
+        into[i] += stats[i]
+    return into
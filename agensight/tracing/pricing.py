@@ -0,0 +1,235 @@
+"""
+Model pricing used to put a cost on LLM spans as they are exported.
+
+Rates are USD per million tokens and can change over time: each model has a
+list of prices with the date they took effect, and a span is priced at the
+rate in effect when it started. Model names match case-insensitively, exactly
+or by the longest prefix followed by "-", so dated snapshots
+("gpt-4o-2024-08-06") use their family's price.
+
+The built-in table covers common OpenAI and Anthropic models. Override or
+extend it with `register_price(...)`, or point AGENSIGHT_PRICING_FILE at a
+JSON file shaped like:
+
+    {"my-model": [{"input": 1.0, "output": 2.0, "cached_input": 0.5,
+                   "cache_write_input": 1.25, "effective_from": "2025-01-01"}]}
+
+Providers count cached prompt tokens differently. OpenAI's cached tokens
+(`gen_ai.usage.cache_read_input_tokens` from its instrumentation) are part
+of `prompt_tokens`, so they are taken out of the prompt and charged at the
+cached rate. Anthropic's `input_tokens`, which the Claude integration records
+as prompt tokens, exclude the cache: cache reads and cache writes
+(`cache_creation_input_tokens`) come on top of them and are charged at the
+cached and cache-write rates. Spans are told apart by `gen_ai.system`.
+
+Spans of models without a price get no cost rather than a guess.
+"""
+import bisect
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+# Attributes naming the model of an LLM span, most specific first
+MODEL_ATTRIBUTES = ("gen_ai.response.model", "gen_ai.request.model", "llm.response.model", "llm.request.model")
+CACHE_READ_ATTRIBUTES = ("gen_ai.usage.cache_read_input_tokens", "gen_ai.usage.cached_tokens")
+CACHE_CREATION_ATTRIBUTE = "gen_ai.usage.cache_creation_input_tokens"
+# gen_ai.system of providers whose prompt tokens don't include cache reads and writes
+SEPARATE_CACHE_SYSTEMS = frozenset({"anthropic"})
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    input: float
+    output: float
+    cached_input: Optional[float] = None
+    effective_from: float = 0.0
+    cache_write_input: Optional[float] = None
+
+    def cost(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0,
+    ) -> float:
+        """
+        USD for one call. `cached_tokens` are the part of the prompt read from
+        cache; `cache_read_tokens` and `cache_creation_tokens` are read from and
+        written to the cache in addition to the prompt. Without a cached rate,
+        cache reads cost the input rate; without a cache-write rate, so do writes.
+        """
+        cached_rate = self.input if self.cached_input is None else self.cached_input
+        write_rate = self.input if self.cache_write_input is None else self.cache_write_input
+        cached = min(cached_tokens, prompt_tokens)
+        return (
+            (prompt_tokens - cached) * self.input
+            + (cached + cache_read_tokens) * cached_rate
+            + cache_creation_tokens * write_rate
+            + completion_tokens * self.output
+        ) / 1_000_000
+
+
+def _timestamp(value: Union[None, int, float, str]) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+# (model, input, cached input, cache write, output, effective from)
+_DEFAULT_PRICES = (
+    ("gpt-4o", 5.00, None, None, 15.00, "2024-05-13"),
+    ("gpt-4o", 2.50, 1.25, None, 10.00, "2024-10-01"),
+    ("gpt-4o-mini", 0.15, 0.075, None, 0.60, "2024-07-18"),
+    ("gpt-4.1", 2.00, 0.50, None, 8.00, "2025-04-14"),
+    ("gpt-4.1-mini", 0.40, 0.10, None, 1.60, "2025-04-14"),
+    ("gpt-4.1-nano", 0.10, 0.025, None, 0.40, "2025-04-14"),
+    ("gpt-4-turbo", 10.00, None, None, 30.00, None),
+    ("gpt-4", 30.00, None, None, 60.00, None),
+    ("gpt-3.5-turbo", 0.50, None, None, 1.50, None),
+    ("o1", 15.00, 7.50, None, 60.00, None),
+    ("o1-mini", 3.00, 1.50, None, 12.00, None),
+    ("o3-mini", 1.10, 0.55, None, 4.40, None),
+    ("claude-3-5-sonnet", 3.00, 0.30, 3.75, 15.00, None),
+    ("claude-3-7-sonnet", 3.00, 0.30, 3.75, 15.00, None),
+    ("claude-3-5-haiku", 0.80, 0.08, 1.00, 4.00, None),
+    ("claude-3-opus", 15.00, 1.50, 18.75, 75.00, None),
+    ("claude-3-haiku", 0.25, 0.03, 0.30, 1.25, None),
+)
+
+
+class PricingTable:
+    def __init__(self):
+        self._prices: Dict[str, List[ModelPrice]] = {}
+        self._starts: Dict[str, List[float]] = {}
+        # Model names as reported by spans -> the table key they resolve to
+        self._resolved: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        model: str,
+        input: float,
+        output: float,
+        cached_input: Optional[float] = None,
+        effective_from: Union[None, float, str] = None,
+        cache_write_input: Optional[float] = None,
+    ) -> None:
+        """Price `model` from `effective_from` (an ISO date or timestamp) on, in USD per 1M tokens"""
+        price = ModelPrice(input, output, cached_input, _timestamp(effective_from), cache_write_input)
+        model = model.lower()
+        with self._lock:
+            prices = [p for p in self._prices.get(model, []) if p.effective_from != price.effective_from]
+            prices.append(price)
+            prices.sort(key=lambda p: p.effective_from)
+            self._prices[model] = prices
+            self._starts[model] = [p.effective_from for p in prices]
+            self._resolved.clear()
+
+    def load_file(self, path: str) -> None:
+        with open(path) as f:
+            data = json.load(f)
+        for model, entries in data.items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                self.register(
+                    model, entry["input"], entry["output"],
+                    entry.get("cached_input"), entry.get("effective_from"), entry.get("cache_write_input"),
+                )
+
+    def _resolve(self, model: str) -> Optional[str]:
+        try:
+            return self._resolved[model]
+        except KeyError:
+            pass
+        name = model.lower()
+        # Provider-qualified names ("openai/gpt-4o") price like the bare model
+        name = name.rsplit("/", 1)[-1]
+        key = name if name in self._prices else max(
+            (known for known in self._prices if name.startswith(known + "-")), key=len, default=None
+        )
+        self._resolved[model] = key
+        return key
+
+    def price(self, model: Optional[str], at: Optional[float] = None) -> Optional[ModelPrice]:
+        """The price of `model` in effect at time `at` (default: the latest)"""
+        if not model:
+            return None
+        key = self._resolve(model)
+        if key is None:
+            return None
+        prices = self._prices[key]
+        if at is None:
+            return prices[-1]
+        index = bisect.bisect_right(self._starts[key], at) - 1
+        # Calls from before a model's first listed price use the earliest one
+        return prices[max(index, 0)]
+
+    def cost(
+        self,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        at: Optional[float] = None,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0,
+    ) -> Optional[float]:
+        price = self.price(model, at)
+        if price is None:
+            return None
+        return price.cost(prompt_tokens, completion_tokens, cached_tokens, cache_read_tokens, cache_creation_tokens)
+
+
+def _default_table() -> PricingTable:
+    table = PricingTable()
+    for model, input_rate, cached_rate, write_rate, output_rate, effective_from in _DEFAULT_PRICES:
+        table.register(model, input_rate, output_rate, cached_rate, effective_from, write_rate)
+    path = os.getenv("AGENSIGHT_PRICING_FILE")
+    if path:
+        table.load_file(path)
+    return table
+
+
+pricing = _default_table()
+
+
+def register_price(
+    model: str,
+    input: float,
+    output: float,
+    cached_input: Optional[float] = None,
+    effective_from: Union[None, float, str] = None,
+    cache_write_input: Optional[float] = None,
+) -> None:
+    """Add or override a model's price in the table the exporter uses"""
+    pricing.register(model, input, output, cached_input, effective_from, cache_write_input)
+
+
+def span_model(attrs) -> Optional[str]:
+    for key in MODEL_ATTRIBUTES:
+        model = attrs.get(key)
+        if model:
+            return str(model)
+    return None
+
+
+def span_cost(attrs, prompt_tokens: int, completion_tokens: int, at: Optional[float] = None) -> Tuple[Optional[str], int, Optional[float]]:
+    """
+    (model, cached tokens, cost) of an LLM span; cost is None if the model
+    isn't priced. Cached tokens are the tokens read from cache.
+    """
+    model = span_model(attrs)
+    if model is None:
+        return None, 0, None
+    cached = next((int(attrs[key]) for key in CACHE_READ_ATTRIBUTES if attrs.get(key)), 0)
+    if str(attrs.get("gen_ai.system") or "").lower() in SEPARATE_CACHE_SYSTEMS:
+        cache_creation = int(attrs.get(CACHE_CREATION_ATTRIBUTE) or 0)
+        cost = pricing.cost(model, prompt_tokens, completion_tokens, 0, at, cached, cache_creation)
+    else:
+        cost = pricing.cost(model, prompt_tokens, completion_tokens, cached, at)
+    return model, cached, cost
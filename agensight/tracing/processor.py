@@ -0,0 +1,240 @@
+"""
+AdaptiveBatchSpanProcessor — a BatchSpanProcessor replacement with
+tunable limits, a drop policy, adaptive batch sizing and an express lane.
+
+* Queue size, maximum batch size and schedule delay are configurable, and
+  when the queue is full spans are handled according to `drop_policy`:
+  `drop_newest` (the OpenTelemetry default), `drop_oldest`, or `block`
+  (wait up to `block_timeout_millis` for room before dropping).
+* The batch size adapts to measured export latency: it is halved when an
+  export takes longer than `target_latency_millis` and grows again while
+  exports are comfortably faster, so a slow SQLite disk is not handed
+  ever-larger transactions.
+* Error spans and root spans go through an express lane that wakes the
+  worker immediately instead of waiting for the schedule delay; the queued
+  spans are exported with them, so failures and finished traces show up in
+  the dashboard right away.
+"""
+from __future__ import annotations
+
+import collections
+import os
+import threading
+import time
+import weakref
+from typing import Deque, List, Optional
+
+from opentelemetry.context import Context, attach, detach, set_value
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.trace import Span, StatusCode
+
+from . import metrics
+
+try:  # The key moved between SDK releases.
+    from opentelemetry.context import _SUPPRESS_INSTRUMENTATION_KEY
+except ImportError:  # pragma: no cover
+    _SUPPRESS_INSTRUMENTATION_KEY = "suppress_instrumentation"
+
+DROP_POLICIES = ("drop_newest", "drop_oldest", "block")
+MIN_BATCH_SIZE = 16
+
+
+class AdaptiveBatchSpanProcessor(SpanProcessor):
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_queue_size: int = 2048,
+        max_export_batch_size: int = 512,
+        schedule_delay_millis: float = 5000,
+        drop_policy: str = "drop_newest",
+        block_timeout_millis: float = 1000,
+        adaptive: bool = True,
+        target_latency_millis: float = 250,
+    ):
+        if max_queue_size <= 0:
+            raise ValueError("max_queue_size must be a positive integer")
+        if max_export_batch_size <= 0 or max_export_batch_size > max_queue_size:
+            raise ValueError("max_export_batch_size must be positive and not exceed max_queue_size")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {', '.join(DROP_POLICIES)}")
+
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.max_export_batch_size = max_export_batch_size
+        self.schedule_delay = schedule_delay_millis / 1000
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout_millis / 1000
+        self.adaptive = adaptive
+        self.target_latency = target_latency_millis / 1000
+        self.batch_size = max_export_batch_size
+
+        self._queue: Deque[ReadableSpan] = collections.deque()
+        self._express: Deque[ReadableSpan] = collections.deque()
+        self._condition = threading.Condition(threading.Lock())
+        self._flush_requests: List[threading.Event] = []
+        self._shutdown = False
+        self._start_worker()
+
+        if hasattr(os, "register_at_fork"):
+            # A forked child inherits the queue but not the worker thread, and
+            # possibly a lock held mid-export; start it afresh in the child.
+            ref = weakref.WeakMethod(self._at_fork_reinit)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()())
+
+    # ─────────────────────────── SpanProcessor hooks ──────────────────────────
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        return
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if self._shutdown or not span.context.trace_flags.sampled:
+            return
+
+        express = span.parent is None or span.status.status_code == StatusCode.ERROR
+        with self._condition:
+            if express:
+                # The express lane is bounded by the same queue size so a storm
+                # of errors cannot grow memory without limit.
+                if len(self._express) >= self.max_queue_size:
+                    metrics.spans_dropped.inc(reason="QueueFull")
+                    return
+                self._express.append(span)
+                self._condition.notify_all()
+                return
+
+            if len(self._queue) >= self.max_queue_size and not self._make_room():
+                metrics.spans_dropped.inc(reason="QueueFull")
+                return
+
+            self._queue.append(span)
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+
+    def queue_depth(self) -> int:
+        return len(self._queue) + len(self._express)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        event = threading.Event()
+        with self._condition:
+            if self._shutdown:
+                return True
+            self._flush_requests.append(event)
+            self._condition.notify_all()
+        return event.wait(timeout_millis / 1000)
+
+    def shutdown(self) -> None:
+        with self._condition:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._condition.notify_all()
+        self._worker.join()
+        self.exporter.shutdown()
+
+    # ──────────────────────────────── internals ───────────────────────────────
+
+    def _start_worker(self) -> None:
+        self._worker = threading.Thread(name="AgensightSpanProcessor", target=self._run, daemon=True)
+        self._worker.start()
+
+    def _at_fork_reinit(self) -> None:
+        # Spans queued before the fork belong to the parent, which exports them.
+        self._condition = threading.Condition(threading.Lock())
+        self._queue.clear()
+        self._express.clear()
+        self._flush_requests = []
+        if not self._shutdown:
+            self._start_worker()
+
+    def _make_room(self) -> bool:
+        """Apply the drop policy to a full queue; called with the lock held."""
+        if self.drop_policy == "drop_oldest":
+            self._queue.popleft()
+            metrics.spans_dropped.inc(reason="QueueFull")
+            return True
+        if self.drop_policy == "block":
+            self._condition.notify_all()
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._queue) >= self.max_queue_size and not self._shutdown:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return len(self._queue) < self.max_queue_size
+        return False
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.schedule_delay
+        while True:
+            with self._condition:
+                while (
+                    not self._shutdown
+                    and not self._express
+                    and not self._flush_requests
+                    and len(self._queue) < self.batch_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                shutting_down = self._shutdown
+                flush_requests, self._flush_requests = self._flush_requests, []
+                express = list(self._express)
+                self._express.clear()
+
+            if shutting_down or flush_requests:
+                if express:
+                    self._export(express)
+                self._drain()
+            elif express or time.monotonic() >= deadline or len(self._queue) >= self.batch_size:
+                # Express spans ride along with whatever is queued, so a finished
+                # root is written in the same transaction as its children.
+                self._export(express + self._take(self.batch_size))
+                deadline = time.monotonic() + self.schedule_delay
+
+            for event in flush_requests:
+                event.set()
+            if shutting_down:
+                return
+
+    def _take(self, limit: int) -> List[ReadableSpan]:
+        with self._condition:
+            batch = [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+            if batch and self.drop_policy == "block":
+                self._condition.notify_all()
+            return batch
+
+    def _drain(self) -> None:
+        while True:
+            with self._condition:
+                express = list(self._express)
+                self._express.clear()
+            batch = express + self._take(self.batch_size)
+            if not batch:
+                return
+            self._export(batch)
+
+    def _export(self, batch: List[ReadableSpan]) -> None:
+        if not batch:
+            return
+        token = attach(set_value(_SUPPRESS_INSTRUMENTATION_KEY, True))
+        started = time.monotonic()
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            metrics.spans_dropped.inc(len(batch), reason=type(e).__name__)
+        finally:
+            detach(token)
+        if self.adaptive:
+            self._adapt(len(batch), time.monotonic() - started)
+
+    def _adapt(self, exported: int, elapsed: float) -> None:
+        """Multiplicative decrease when exports run slow, gentle growth when they run fast."""
+        if exported < self.batch_size // 2:
+            return  # Small batches tell us little about how a full batch performs.
+        if elapsed > self.target_latency:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+        elif elapsed < self.target_latency / 2:
+            self.batch_size = min(self.max_export_batch_size, self.batch_size + max(1, self.batch_size // 4))
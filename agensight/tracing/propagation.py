@@ -0,0 +1,117 @@
+"""
+Carry the current trace across process boundaries.
+
+`capture_context()` snapshots the active span (as a W3C `traceparent`), the
+AgenSight trace id/name and the session into a picklable `TraceCarrier`.
+`attach_context()` restores it in a worker process, setting up tracing there
+first if the worker did not inherit it, so spans created by the task are
+stitched under the parent trace. `with_trace_context(fn)` wraps a callable
+for `ProcessPoolExecutor.submit` / `multiprocessing.Pool` in one step:
+
+    with ProcessPoolExecutor() as pool:
+        pool.submit(with_trace_context(summarize), document)
+"""
+import contextlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+from . import session
+from .config import config
+
+_propagator = TraceContextTextMapPropagator()
+
+
+@dataclass
+class TraceCarrier:
+    headers: Dict[str, str] = field(default_factory=dict)
+    trace_id: Optional[str] = None
+    trace_name: Optional[str] = None
+    session_id: Optional[str] = None
+    session_enabled: bool = False
+    setup: Dict[str, Any] = field(default_factory=dict)
+    instrument_llms: bool = False
+
+
+def capture_context() -> TraceCarrier:
+    from .decorators import current_trace_id, current_trace_name
+    from .setup import _settings
+
+    headers: Dict[str, str] = {}
+    _propagator.inject(headers)
+    return TraceCarrier(
+        headers=headers,
+        trace_id=current_trace_id.get(),
+        trace_name=current_trace_name.get(),
+        session_id=session.get_session_id(),
+        session_enabled=session.is_session_enabled(),
+        setup=dict(_settings),
+        instrument_llms=config.get("auto_instrument_llms", False),
+    )
+
+
+def _ensure_tracing(carrier: TraceCarrier) -> None:
+    """Set up tracing in a worker that started without it (spawn/forkserver)."""
+    if isinstance(trace.get_tracer_provider(), TracerProvider) or not carrier.setup:
+        return
+    from .setup import setup_tracing
+
+    setup_tracing(**carrier.setup)
+    if carrier.instrument_llms:
+        from agensight.integrations import instrument_anthropic, instrument_openai
+
+        instrument_openai()
+        instrument_anthropic()
+
+
+@contextlib.contextmanager
+def attach_context(carrier: TraceCarrier, flush: bool = True):
+    """
+    Run the enclosed block inside the trace captured by `carrier`. With
+    `flush`, spans are exported before returning, since pool workers can be
+    torn down before their batch processor's next scheduled export.
+    """
+    from .decorators import current_trace_id, current_trace_name
+
+    _ensure_tracing(carrier)
+    if carrier.session_enabled:
+        session.enable_session_tracking()
+
+    token = otel_context.attach(_propagator.extract(carrier.headers))
+    id_token = current_trace_id.set(carrier.trace_id)
+    name_token = current_trace_name.set(carrier.trace_name)
+    session_token = session._session_id_var.set(carrier.session_id) if carrier.session_id else None
+    try:
+        yield
+    finally:
+        if session_token is not None:
+            session._session_id_var.reset(session_token)
+        current_trace_name.reset(name_token)
+        current_trace_id.reset(id_token)
+        otel_context.detach(token)
+        if flush:
+            provider = trace.get_tracer_provider()
+            if hasattr(provider, "force_flush"):
+                provider.force_flush()
+
+
+class _ContextTask:
+    """Picklable callable that runs `fn` under a captured trace context."""
+
+    def __init__(self, fn: Callable, carrier: TraceCarrier, flush: bool):
+        self.fn = fn
+        self.carrier = carrier
+        self.flush = flush
+
+    def __call__(self, *args, **kwargs):
+        with attach_context(self.carrier, flush=self.flush):
+            return self.fn(*args, **kwargs)
+
+
+def with_trace_context(fn: Callable, flush: bool = True) -> Callable:
+    """Wrap `fn` so it runs under the caller's current trace in a worker process."""
+    return _ContextTask(fn, capture_context(), flush)
@@ -1,11 +1,27 @@
 import os
 from agensight.tracing.exporters import get_exporter
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry import trace
+from agensight.tracing import token_propagator, usage
 from agensight.tracing.token_propagator import TokenPropagator
+from agensight.tracing import metrics
+from agensight.tracing.config import config
+from agensight.tracing.processor import AdaptiveBatchSpanProcessor
 
-def setup_tracing(service_name="default", exporter_type=None):
+# Arguments of the last setup_tracing() call, so worker processes that don't
+# inherit the provider (spawn start method) can set up the same pipeline.
+_settings = {}
+
+
+def setup_tracing(
+    service_name="default",
+    exporter_type=None,
+    max_queue_size=None,
+    max_export_batch_size=None,
+    schedule_delay_millis=None,
+    drop_policy=None,
+    adaptive_batching=None,
+):
     if exporter_type is None:
         exporter_type = os.getenv("TRACE_EXPORTER", "console")
     from agensight.tracing.db import init_schema
@@ -15,9 +31,30 @@ def setup_tracing(service_name="default", exporter_type=None):
         print("DB not initialized")
 
     exporter = get_exporter(exporter_type)
-    processor = BatchSpanProcessor(exporter)
+    # Only None means "use the configured default": an explicit 0 or "" is
+    # passed on, and the processor rejects it with a ValueError naming the argument
+    processor = AdaptiveBatchSpanProcessor(
+        exporter,
+        max_queue_size=config["max_queue_size"] if max_queue_size is None else max_queue_size,
+        max_export_batch_size=config["max_export_batch_size"] if max_export_batch_size is None else max_export_batch_size,
+        schedule_delay_millis=config["schedule_delay_millis"] if schedule_delay_millis is None else schedule_delay_millis,
+        drop_policy=config["drop_policy"] if drop_policy is None else drop_policy,
+        adaptive=config["adaptive_batching"] if adaptive_batching is None else adaptive_batching,
+    )
+    _settings.clear()
+    _settings.update(
+        service_name=service_name,
+        exporter_type=exporter_type,
+        max_queue_size=max_queue_size,
+        max_export_batch_size=max_export_batch_size,
+        schedule_delay_millis=schedule_delay_millis,
+        drop_policy=drop_policy,
+        adaptive_batching=adaptive_batching,
+    )
+    metrics.queue_depth.set_function(processor.queue_depth)
     provider = TracerProvider()
-    provider.add_span_processor(TokenPropagator())   
+    token_propagator.active = TokenPropagator(usage=usage.registry)
+    provider.add_span_processor(token_propagator.active)
     provider.add_span_processor(processor)
     trace.set_tracer_provider(provider)
     return trace.get_tracer(service_name)
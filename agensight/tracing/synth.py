@@ -0,0 +1,265 @@
+"""
+Synthetic trace generator for load-testing the server.
+
+Produces traces shaped like real agent runs — sessions of several traces,
+nested agents, LLM calls with long prompts, tool calls and the occasional
+error — and writes them straight into a trace DB through `bulk_insert`,
+in the same slim/compressed row format the exporter produces.
+"""
+import json
+import random
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .compression import deflate
+from .db import DB_FILE, bulk_insert, fill_span_tokens, get_db, init_schema, rebuild_sessions
+from .utils import normalized_io, slim_span_attributes
+
+TRACE_NAMES = ["multi_agent_chat", "support_ticket", "trip_planner", "code_review", "research_report"]
+AGENT_NAMES = ["Planner", "Researcher", "Scheduler", "Critic", "Writer", "Presenter", "Router"]
+MODELS = [("OpenAI", "gpt-4o-mini", "openai.chat"), ("OpenAI", "gpt-4o", "openai.chat"), ("Anthropic", "claude-3", "claude.chat")]
+TOOLS = [
+    ("get_weather", lambda rng: {"location": rng.choice(["Bangalore", "Berlin", "Lima", "Osaka"])}),
+    ("get_news", lambda rng: {"topic": rng.choice(["AI", "markets", "football", "climate"])}),
+    ("search_docs", lambda rng: {"query": rng.choice(["refund policy", "rate limits", "SSO setup"]), "top_k": 5}),
+    ("create_event", lambda rng: {"title": "Sync", "day": rng.choice(["Mon", "Tue", "Wed"]), "duration_min": 30}),
+]
+SENTENCES = [
+    "The user wants a short summary of the quarterly report.",
+    "Please answer concisely and cite the relevant section of the document.",
+    "You are a helpful assistant that plans trips for busy travellers.",
+    "Here is the weather forecast for the next three days.",
+    "I'm sorry, but I can't help with that request.",
+    "Let me know if you have any other questions about your booking.",
+    "The latest AI news covers new open-source models and evaluation suites.",
+    "Schedule the meeting for Tuesday afternoon and send a reminder to the team.",
+    "Format the final answer as a bulleted list with at most five items.",
+    "The function returned an error because the location was not recognised.",
+    "Compare the two proposals and list the trade-offs of each approach.",
+    "Customer reports that the invoice total does not match the order.",
+]
+
+_INTERNAL = "SpanKind.INTERNAL"
+_CLIENT = "SpanKind.CLIENT"
+_OK = "StatusCode.UNSET"
+_ERROR = "StatusCode.ERROR"
+
+
+class _TextPool:
+    """Pre-generated message texts, kept alongside their stored (deflated) form."""
+
+    def __init__(self, rng: random.Random, size: int = 400):
+        self.items = []
+        for _ in range(size):
+            # Mostly short messages with a long tail of multi-KB prompts.
+            sentences = min(int(rng.paretovariate(1.2) * 3), 120)
+            text = " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+            self.items.append((text, deflate(text)))
+
+    def pick(self, rng: random.Random) -> Tuple[str, object]:
+        return rng.choice(self.items)
+
+
+class _TraceBuilder:
+    def __init__(self, rng: random.Random, pool: _TextPool, error_rate: float):
+        self.rng = rng
+        self.pool = pool
+        self.error_rate = error_rate
+        self.spans: List[tuple] = []
+        self.prompts: List[tuple] = []
+        self.completions: List[tuple] = []
+        self.tools: List[tuple] = []
+        self.total_tokens = 0
+
+    def _span_id(self) -> str:
+        return format(self.rng.getrandbits(64), "016x")
+
+    def _status(self) -> str:
+        return _ERROR if self.rng.random() < self.error_rate else _OK
+
+    def _add_span(self, span_id, trace_id, parent_id, name, start, end, kind, attrs, prompts=(), completions=()):
+        if "gen_ai.normalized_input_output" in attrs:
+            # Filled in from the message rows, as the exporter would have parsed it
+            attrs["gen_ai.normalized_input_output"] = normalized_io(prompts, completions)
+        stored = slim_span_attributes(attrs, prompts, completions)
+        self.spans.append((
+            span_id, trace_id, parent_id, name, start, end, end - start,
+            kind, self._status(), deflate(json.dumps(stored)),
+        ))
+
+    def llm_call(self, trace_id, parent_id, start) -> Tuple[float, Tuple[str, object], Tuple[str, object], List[tuple]]:
+        rng = self.rng
+        system, model, span_name = rng.choice(MODELS)
+        span_id = self._span_id()
+        prompt = self.pool.pick(rng)
+        answer = self.pool.pick(rng)
+        prompt_tokens = len(prompt[0]) // 4 + 20
+        completion_tokens = len(answer[0]) // 4 + 5
+        total = prompt_tokens + completion_tokens
+        end = start + rng.uniform(0.2, 4.0)
+
+        attrs = {
+            "gen_ai.system": system,
+            "gen_ai.request.model": model,
+            "gen_ai.prompt.0.role": "system",
+            "gen_ai.prompt.0.content": SENTENCES[2],
+            "gen_ai.prompt.1.role": "user",
+            "gen_ai.prompt.1.content": prompt[0],
+            "gen_ai.completion.0.role": "assistant",
+            "gen_ai.completion.0.content": answer[0],
+            "gen_ai.completion.0.finish_reason": "stop",
+            "llm.usage.total_tokens": total,
+            "gen_ai.usage.prompt_tokens": prompt_tokens,
+            "gen_ai.usage.completion_tokens": completion_tokens,
+            # Placeholder: filled in from the message rows, then slimmed away.
+            "gen_ai.normalized_input_output": "",
+        }
+
+        tool_rows = []
+        if rng.random() < 0.3:
+            for i in range(rng.randint(1, 2)):
+                tool_name, make_args = rng.choice(TOOLS)
+                arguments = json.dumps(make_args(rng))
+                attrs[f"gen_ai.completion.0.tool_calls.{i}.name"] = tool_name
+                attrs[f"gen_ai.completion.0.tool_calls.{i}.arguments"] = arguments
+                tool_rows.append((tool_name, arguments))
+                self.tools.append((span_id, tool_name, arguments))
+            attrs["gen_ai.completion.0.finish_reason"] = "tool_calls"
+
+        finish_reason = attrs["gen_ai.completion.0.finish_reason"]
+        self._add_span(
+            span_id, trace_id, parent_id, span_name, start, end, _CLIENT, attrs,
+            prompts=[{"role": "system", "content": SENTENCES[2]}, {"role": "user", "content": prompt[0]}],
+            completions=[{"role": "assistant", "content": answer[0], "finish_reason": finish_reason,
+                          "total_tokens": total, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}],
+        )
+        self.prompts.append((span_id, "system", SENTENCES[2], 0))
+        self.prompts.append((span_id, "user", prompt[1], 1))
+        self.completions.append((span_id, "assistant", answer[1], finish_reason,
+                                 total, prompt_tokens, completion_tokens))
+        self.total_tokens += total
+        return end, prompt, answer, tool_rows
+
+    def agent(self, trace_id, parent_id, start, depth) -> float:
+        rng = self.rng
+        span_id = self._span_id()
+        name = rng.choice(AGENT_NAMES)
+        cursor = start + rng.uniform(0.001, 0.05)
+        first_prompt = last_answer = None
+        agent_tools = []
+
+        for _ in range(rng.randint(1, 3)):
+            cursor, prompt, answer, tool_rows = self.llm_call(trace_id, span_id, cursor)
+            first_prompt = first_prompt or prompt
+            last_answer = answer
+            for tool_name, arguments in tool_rows:
+                tool_span = self._span_id()
+                tool_end = cursor + rng.uniform(0.01, 0.8)
+                self._add_span(tool_span, trace_id, span_id, tool_name, cursor, tool_end, _INTERNAL,
+                               {"tool.name": tool_name, "tool.arguments": arguments})
+                agent_tools.append((tool_name, arguments))
+                cursor = tool_end
+
+        if depth < 3 and rng.random() < 0.25:
+            for _ in range(rng.randint(1, 2)):
+                cursor = self.agent(trace_id, span_id, cursor, depth + 1)
+
+        end = cursor + rng.uniform(0.001, 0.05)
+        attrs = {"agent.name": name, "trace_id": trace_id, "gen_ai.normalized_input_output": ""}
+        self._add_span(span_id, trace_id, parent_id, name, start, end, _INTERNAL, attrs,
+                       prompts=[{"role": "user", "content": first_prompt[0]}],
+                       completions=[{"role": "assistant", "content": last_answer[0], "finish_reason": "stop"}])
+        self.prompts.append((span_id, "user", first_prompt[1], 0))
+        self.completions.append((span_id, "assistant", last_answer[1], "stop", None, None, None))
+        for tool_name, arguments in agent_tools:
+            self.tools.append((span_id, tool_name, arguments))
+        return end
+
+    def trace(self, trace_id, session_id, start) -> tuple:
+        rng = self.rng
+        root_id = self._span_id()
+        name = rng.choice(TRACE_NAMES)
+        cursor = start + rng.uniform(0.001, 0.02)
+        for _ in range(rng.randint(1, 4)):
+            cursor = self.agent(trace_id, root_id, cursor, depth=1)
+        end = cursor + rng.uniform(0.001, 0.02)
+        self._add_span(root_id, trace_id, None, name, start, end, _INTERNAL,
+                       {"trace.name": name, "trace_id": trace_id, "session.id": session_id})
+        return (trace_id, session_id, name, start, end, json.dumps({"synthetic": True}), self.total_tokens)
+
+
+def generate(
+    n_spans: int,
+    path: Optional[str] = None,
+    sessions: Optional[int] = None,
+    seed: int = 0,
+    error_rate: float = 0.03,
+    days: float = 7.0,
+    batch_spans: int = 50_000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, object]:
+    """
+    Write at least `n_spans` synthetic spans into the trace DB at `path`
+    (default: the SDK trace DB) and return summary statistics.
+    """
+    path = path or DB_FILE
+    rng = random.Random(seed)
+    pool = _TextPool(rng)
+    sessions = sessions or max(1, n_spans // 200)
+    session_ids = [uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(sessions)]
+
+    init_schema(path)
+    conn = get_db(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    started = time.perf_counter()
+    window_start = time.time() - days * 86400
+    written_spans = written_traces = 0
+    builder = _TraceBuilder(rng, pool, error_rate)
+    traces: List[tuple] = []
+    session_id = session_ids[0]
+
+    def flush():
+        nonlocal builder, traces
+        with conn:
+            bulk_insert(conn, traces, builder.spans, builder.prompts, builder.completions, builder.tools)
+        builder = _TraceBuilder(rng, pool, error_rate)
+        traces = []
+
+    while written_spans < n_spans:
+        trace_id = uuid.UUID(int=rng.getrandbits(128)).hex
+        # Sessions are bursty: consecutive traces tend to share a session.
+        if rng.random() < 0.3:
+            session_id = rng.choice(session_ids)
+        start = window_start + (written_spans / max(n_spans, 1)) * days * 86400
+
+        before = len(builder.spans)
+        builder.total_tokens = 0
+        traces.append(builder.trace(trace_id, session_id, start))
+        written_spans += len(builder.spans) - before
+        written_traces += 1
+
+        if len(builder.spans) >= batch_spans:
+            flush()
+            if progress:
+                progress(written_spans, n_spans)
+
+    flush()
+    with conn:
+        rebuild_sessions(conn)
+        fill_span_tokens(conn)
+    if progress:
+        progress(written_spans, n_spans)
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "db": str(path),
+        "traces": written_traces,
+        "spans": written_spans,
+        "sessions": sessions,
+        "seconds": round(elapsed, 2),
+        "spans_per_sec": round(written_spans / elapsed, 1) if elapsed else None,
+    }
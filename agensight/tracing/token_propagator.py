@@ -1,61 +1,196 @@
 # agentsight/tracing/token_propagator.py
 """
 TokenPropagator — bubble token-usage numbers from child LLM spans
-(e.g. `openai.chat`) up to their parent span so the exporter can write
+(e.g. `openai.chat`) up to every ancestor span so the exporter can write
 complete rows for higher-level spans like `generate_joke`, `improve_joke`, …
+
+Spans are tracked by span id from start to end, so usage reaches its
+ancestors no matter which thread, task or context the child ends in. Each
+ancestor that is still recording gets the usage added to its attributes,
+together with `agensight.descendant_usage.*` recording how much of its
+usage came from below; the exporter subtracts that to count every token
+once. Per-trace totals are kept in memory and published when the trace's
+last span ends, and each LLM call's own usage is handed to the live usage
+counters (usage.py).
 """
 
 from __future__ import annotations
 
-from typing import Dict, Tuple
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
 from opentelemetry.sdk.trace import SpanProcessor, ReadableSpan
-from opentelemetry.trace import get_current_span, Span
+from opentelemetry.trace import Span
 from opentelemetry.util.types import Attributes
 
+from agensight.tracing.pricing import span_cost
+
 _USAGE_KEYS: Tuple[str, ...] = (
     "llm.usage.total_tokens",
     "gen_ai.usage.prompt_tokens",
     "gen_ai.usage.completion_tokens",
 )
 
+# How much of each usage attribute was added from descendant spans
+DESCENDANT_USAGE_KEYS: Tuple[str, ...] = (
+    "agensight.descendant_usage.total",
+    "agensight.descendant_usage.prompt",
+    "agensight.descendant_usage.completion",
+)
+
+_TOTAL_NAMES = ("total_tokens", "prompt_tokens", "completion_tokens")
+
+# Finished traces whose totals stay readable through trace_usage()
+FINISHED_TRACES = 1024
+
+
+class _Node:
+    __slots__ = ("span", "parent", "trace", "applied")
+
+    def __init__(self, span: Span, parent: Optional["_Node"], trace: "_TraceTotals"):
+        self.span = span
+        # Ancestors stay reachable through their descendants after they end
+        self.parent = parent
+        self.trace = trace
+        # Usage from descendants that made it into this span's attributes
+        self.applied = [0, 0, 0]
+
+
+class _TraceTotals:
+    __slots__ = ("trace_id", "usage", "live")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.usage = [0, 0, 0]
+        self.live = 0
+
+
+def _usage(attrs: Attributes) -> List[int]:
+    prompt = int(attrs.get(_USAGE_KEYS[1]) or 0)
+    completion = int(attrs.get(_USAGE_KEYS[2]) or 0)
+    total = int(attrs.get(_USAGE_KEYS[0]) or 0) or prompt + completion
+    return [total, prompt, completion]
+
+
+def descendant_usage(attrs: Attributes) -> Tuple[int, int, int]:
+    """(total, prompt, completion) tokens of a span's attributes that came from its descendants"""
+    return tuple(int(attrs.get(key) or 0) for key in DESCENDANT_USAGE_KEYS)
+
 
 class TokenPropagator(SpanProcessor):
     """
-    SpanProcessor that – when a child span ends – immediately adds its
-    token-usage attributes onto the parent span *if* that parent is still
-    recording.
+    SpanProcessor that, when a span with token usage ends, adds the usage it
+    incurred itself onto all of its ancestors and its trace's totals.
 
-    No state has to be kept beyond the current stack of running spans, so
-    there’s nothing to flush/shutdown.
+    `on_trace_end(trace_id, totals)` is called with a trace's cumulative
+    totals whenever it has no open spans left in this process: once the
+    root ends, or after each top-level span of a @trace. Spans with usage of
+    their own are recorded in `usage` (a UsageRegistry) as they end.
     """
 
+    def __init__(self, on_trace_end: Optional[Callable[[str, Dict[str, int]], None]] = None, usage=None):
+        self._on_trace_end = on_trace_end
+        self._usage = usage
+        self._lock = threading.Lock()
+        self._nodes: Dict[int, _Node] = {}
+        self._traces: Dict[str, _TraceTotals] = {}
+        self._finished: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        if hasattr(os, "register_at_fork"):
+            # Spans open at fork time never end in the child
+            ref = weakref.WeakMethod(self._at_fork_reinit)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()())
+
+    def _at_fork_reinit(self) -> None:
+        self._lock = threading.Lock()
+        self._nodes.clear()
+        self._traces.clear()
+
     # ─────────────────────────── SpanProcessor hooks ──────────────────────────
 
     # Accept the new 1.26+ signature      ↓
     def on_start(self, span: Span, parent_context=None):  # noqa: D401, N802
-        # We don’t need to do anything on span start.
-        return
+        context = span.context
+        parent_context = span.parent
+        attrs = span.attributes
+        trace_id = attrs.get("trace_id") if attrs else None
+        with self._lock:
+            parent = self._nodes.get(parent_context.span_id) if parent_context is not None else None
+            if trace_id is None:
+                own_trace_id = format(context.trace_id, "032x")
+                # AgenSight traces can span several OTel traces (one per top-level span)
+                trace_id = parent.trace.trace_id if parent is not None else own_trace_id
+                if trace_id != own_trace_id:
+                    # Spans of instrumented libraries inside a @trace belong to it too
+                    span.set_attribute("trace_id", trace_id)
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                trace = self._traces[trace_id] = _TraceTotals(trace_id)
+                # Top-level spans of a @trace run one after another; keep counting
+                finished = self._finished.pop(trace_id, None)
+                if finished is not None:
+                    trace.usage = [finished[name] for name in _TOTAL_NAMES]
+            trace.live += 1
+            self._nodes[context.span_id] = _Node(span, parent, trace)
 
     def on_end(self, span: ReadableSpan) -> None:  # noqa: D401, N802
-        """
-        When *any* span ends, check if it has token counters; if so, add them
-        onto its (still-recording) parent span.
-        """
-        attrs: Attributes = span.attributes
-        if "llm.usage.total_tokens" not in attrs:
-            return  # Nothing to propagate.
-
-        # The current span at this moment is the *parent* (because the child
-        # just ended and popped off the context stack).
-        parent = get_current_span()
-        if parent is None or not parent.is_recording():
-            return
-
-        # Defensive: make sure relationship is correct
-        if span.parent is None or span.parent.span_id != parent.context.span_id:
-            return
-
-        _merge_usage(parent, attrs)  # ← do the in-place update
+        finished = None
+        with self._lock:
+            node = self._nodes.pop(span.context.span_id, None)
+            if node is None:
+                return  # Started before this processor was registered.
+
+            attrs = span.attributes
+            total_key, prompt_key, completion_key = _USAGE_KEYS
+            if node.applied[0] or total_key in attrs or prompt_key in attrs or completion_key in attrs:
+                # What this span used itself: its usage minus what its descendants added
+                own = [max(value - applied, 0) for value, applied in zip(_usage(attrs), node.applied)]
+                own = own if any(own) else None
+            else:
+                own = None
+            if own is not None:
+                ancestor = node.parent
+                while ancestor is not None:
+                    _add_usage(ancestor, own)
+                    ancestor = ancestor.parent
+                trace_usage = node.trace.usage
+                for i, value in enumerate(own):
+                    trace_usage[i] += value
+
+            trace = node.trace
+            trace.live -= 1
+            if trace.live == 0:
+                finished = dict(zip(_TOTAL_NAMES, trace.usage))
+                del self._traces[trace.trace_id]
+                self._finished[trace.trace_id] = finished
+                self._finished.move_to_end(trace.trace_id)
+                while len(self._finished) > FINISHED_TRACES:
+                    self._finished.popitem(last=False)
+
+        if own is not None and self._usage is not None:
+            model, _, cost = span_cost(attrs, own[1], own[2], span.start_time / 1e9 if span.start_time else None)
+            self._usage.record(*_scope(node, model is not None), *own, cost)
+        if finished is not None and self._on_trace_end is not None:
+            self._on_trace_end(trace.trace_id, finished)
+
+    def scope(self, span: Span) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """(trace id, session id, agent) of LLM calls made under `span`"""
+        with self._lock:
+            node = self._nodes.get(span.get_span_context().span_id)
+        if node is None:
+            return None, None, None
+        return _scope(node, is_llm=False)
+
+    def trace_usage(self, trace_id: str) -> Optional[Dict[str, int]]:
+        """Token totals of a trace so far, or final once its spans have all ended"""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is not None:
+                return dict(zip(_TOTAL_NAMES, trace.usage))
+            finished = self._finished.get(trace_id)
+            return dict(finished) if finished is not None else None
 
     # Optional no-ops (SpanProcessor requires them)
     def shutdown(self) -> None:  # noqa: D401, N802
@@ -65,21 +200,55 @@ class TokenPropagator(SpanProcessor):
         return True
 
 
+# The propagator of the pipeline set up by setup_tracing()
+active: Optional[TokenPropagator] = None
+
+
+def get_trace_usage(trace_id: str) -> Optional[Dict[str, int]]:
+    """Token totals of a trace in this process, or None if it isn't known"""
+    return active.trace_usage(trace_id) if active is not None else None
+
+
 # ───────────────────────────── helper function ───────────────────────────────
 
 
-def _merge_usage(parent_span: Span, child_attrs: Attributes) -> None:
+def _scope(node: _Node, is_llm: bool) -> Tuple[str, Optional[str], Optional[str]]:
     """
-    Add the child’s usage numbers onto the parent span’s attributes,
-    *incrementing* existing totals if they’re already present.
+    The trace, session and agent a span's usage counts towards. The agent is
+    the `agent.name` or the name of the nearest span that isn't itself an
+    LLM call, i.e. the span that made the call.
     """
-    for key in _USAGE_KEYS:
-        child_val = child_attrs.get(key)
-        if child_val is None:
-            continue
-
-        current_val = parent_span.attributes.get(key)
-        if current_val is None:
-            parent_span.set_attribute(key, int(child_val))
-        else:
-            parent_span.set_attribute(key, int(current_val) + int(child_val))
+    session = agent = None
+    current = node
+    while current is not None and (session is None or agent is None):
+        attrs = current.span.attributes or {}
+        if session is None:
+            session = attrs.get("session.id")
+        if agent is None:
+            agent = attrs.get("agent.name")
+            if agent is None and not (is_llm and current is node):
+                agent = current.span.name
+        current = current.parent
+    return node.trace.trace_id, session, agent
+
+
+def _add_usage(node: _Node, own: List[int]) -> None:
+    """
+    Add a descendant's usage onto `node`'s span if it is still recording.
+    Usage and descendant totals are set in one call, so an ancestor ending
+    concurrently keeps both or neither.
+    """
+    span = node.span
+    if not span.is_recording():
+        return
+    current = _usage(span.attributes)
+    applied = [a + o for a, o in zip(node.applied, own)]
+    updates = {}
+    for i, key in enumerate(_USAGE_KEYS):
+        if own[i] or i == 0:
+            updates[key] = current[i] + own[i]
+            updates[DESCENDANT_USAGE_KEYS[i]] = applied[i]
+    span.set_attributes(updates)
+    # set_attributes is ignored if the span ended in the meantime
+    if span.attributes.get(DESCENDANT_USAGE_KEYS[0]) == applied[0]:
+        node.applied = applied
@@ -0,0 +1,249 @@
+"""
+Live token and cost counters, kept in process as LLM calls finish.
+
+Every LLM span the integrations produce is counted when it ends (by the
+TokenPropagator, before the span is queued for export) under its trace, its
+session and its agent: the `agent.name` of the span that made the call, or
+that span's name. `usage(session=...)` reads the counters right away; the
+SQLite rollups only catch up once the exporter has written the spans.
+
+Budgets cap tokens and/or USD for one trace, session or agent, or with "*"
+for each of them separately. Crossing a soft budget calls its `on_exceeded`
+(or warns); after a hard budget is crossed, further LLM calls in that scope
+raise BudgetExceededError before they are sent.
+"""
+import functools
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from opentelemetry import trace as ot_trace
+
+from agensight.tracing import token_propagator
+from agensight.tracing.session import get_session_id, is_session_enabled
+
+SCOPES = ("trace", "session", "agent")
+
+# Keys kept per scope; the least recently updated are dropped first (traces come and go)
+MAX_KEYS = 10_000
+
+_FIELDS = ("calls", "total_tokens", "prompt_tokens", "completion_tokens", "cost")
+
+
+@dataclass(eq=False)
+class Budget:
+    scope: str
+    key: str
+    tokens: Optional[int] = None
+    cost: Optional[float] = None
+    hard: bool = False
+    on_exceeded: Optional[Callable[["Budget", str, Dict[str, float]], None]] = None
+
+    def exceeded(self, counts: List[float]) -> bool:
+        return (self.tokens is not None and counts[1] > self.tokens) or (
+            self.cost is not None and counts[4] > self.cost
+        )
+
+    def applies_to(self, scope: str, key: str) -> bool:
+        return self.scope == scope and self.key in ("*", key)
+
+
+class BudgetExceededError(RuntimeError):
+    def __init__(self, budget: Budget, key: str, usage: Dict[str, float]):
+        self.budget = budget
+        self.key = key
+        self.usage = usage
+        limits = ", ".join(
+            f"{name} {limit}" for name, limit in (("tokens", budget.tokens), ("cost", budget.cost)) if limit is not None
+        )
+        super().__init__(f"Hard budget ({limits}) exceeded for {budget.scope} {key!r}: {usage}")
+
+
+def _as_dict(counts: List[float]) -> Dict[str, float]:
+    return dict(zip(_FIELDS, counts))
+
+
+class UsageRegistry:
+    """Per-trace, per-session and per-agent counters of LLM calls, tokens and cost"""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counters: Dict[str, "OrderedDict[str, List[float]]"] = {scope: OrderedDict() for scope in SCOPES}
+        self._budgets: List[Budget] = []
+        # (budget, key) pairs already reported, so each crossing is reported once
+        self._crossed: Dict[Tuple[int, str], Budget] = {}
+        # (scope, key) -> the hard budget blocking further calls
+        self._blocked: Dict[Tuple[str, str], Budget] = {}
+
+    def _at_fork_reinit(self) -> None:
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        trace_id: Optional[str],
+        session_id: Optional[str],
+        agent: Optional[str],
+        total_tokens: int,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: Optional[float] = None,
+    ) -> None:
+        """Count one LLM call against its trace, session and agent"""
+        delta = (1, total_tokens, prompt_tokens, completion_tokens, cost or 0.0)
+        crossed = []
+        with self._lock:
+            for scope, key in zip(SCOPES, (trace_id, session_id, agent)):
+                if key is None:
+                    continue
+                counters = self._counters[scope]
+                counts = counters.get(key)
+                if counts is None:
+                    counts = counters[key] = [0, 0, 0, 0, 0.0]
+                    if len(counters) > self.max_keys:
+                        self._evict(scope, counters.popitem(last=False)[0])
+                else:
+                    counters.move_to_end(key)
+                for i, value in enumerate(delta):
+                    counts[i] += value
+                for budget in self._budgets:
+                    if budget.applies_to(scope, key) and budget.exceeded(counts):
+                        if (id(budget), key) in self._crossed:
+                            continue
+                        self._crossed[(id(budget), key)] = budget
+                        if budget.hard:
+                            self._blocked[(scope, key)] = budget
+                        crossed.append((budget, key, _as_dict(counts)))
+        # Callbacks run outside the lock and can read usage() themselves
+        for budget, key, counts in crossed:
+            if budget.on_exceeded is not None:
+                budget.on_exceeded(budget, key, counts)
+            elif not budget.hard:
+                warnings.warn(f"Soft budget exceeded for {budget.scope} {key!r}: {counts}", RuntimeWarning)
+
+    def _evict(self, scope: str, key: str) -> None:
+        # Its crossings and blocks go with it, or "*" budgets would keep one per key ever seen
+        self._blocked.pop((scope, key), None)
+        for budget in self._budgets:
+            if budget.scope == scope:
+                self._crossed.pop((id(budget), key), None)
+
+    def usage(self, scope: str, key: str) -> Dict[str, float]:
+        with self._lock:
+            counts = self._counters[scope].get(key)
+            return _as_dict(counts if counts is not None else [0, 0, 0, 0, 0.0])
+
+    def add_budget(self, budget: Budget) -> Budget:
+        with self._lock:
+            self._budgets.append(budget)
+            # Usage so far counts: a budget set below it blocks right away
+            for key, counts in self._counters[budget.scope].items():
+                if budget.applies_to(budget.scope, key) and budget.exceeded(counts):
+                    self._crossed[(id(budget), key)] = budget
+                    if budget.hard:
+                        self._blocked[(budget.scope, key)] = budget
+        return budget
+
+    def remove_budget(self, budget: Budget) -> None:
+        with self._lock:
+            self._budgets = [b for b in self._budgets if b is not budget]
+            self._crossed = {k: b for k, b in self._crossed.items() if b is not budget}
+            self._blocked = {k: b for k, b in self._blocked.items() if b is not budget}
+
+    def reset(self, scope: str, key: str) -> None:
+        """Forget a trace's, session's or agent's counts and lift its hard budgets"""
+        with self._lock:
+            self._counters[scope].pop(key, None)
+            self._blocked.pop((scope, key), None)
+            self._crossed = {k: b for k, b in self._crossed.items() if not (k[1] == key and b.scope == scope)}
+
+    def check(self, trace_id: Optional[str], session_id: Optional[str], agent: Optional[str]) -> None:
+        """Raise BudgetExceededError if a hard budget of any of these scopes has been crossed"""
+        if not self._blocked:
+            return
+        with self._lock:
+            for scope, key in zip(SCOPES, (trace_id, session_id, agent)):
+                budget = self._blocked.get((scope, key))
+                if budget is not None:
+                    raise BudgetExceededError(budget, key, _as_dict(self._counters[scope].get(key, [0, 0, 0, 0, 0.0])))
+
+
+registry = UsageRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._at_fork_reinit)
+
+
+def _scope_of(kwargs: Dict[str, Optional[str]]) -> Tuple[str, str]:
+    given = [(scope, kwargs[scope]) for scope in SCOPES if kwargs[scope] is not None]
+    if len(given) != 1:
+        raise ValueError("Pass exactly one of trace=, session= or agent=")
+    return given[0]
+
+
+def usage(trace: Optional[str] = None, session: Optional[str] = None, agent: Optional[str] = None) -> Dict[str, float]:
+    """
+    LLM calls, tokens and USD cost so far for one trace, session or agent, e.g.
+    `agensight.usage(session="user-42")`. Counts what this process has seen.
+    """
+    return registry.usage(*_scope_of({"trace": trace, "session": session, "agent": agent}))
+
+
+def set_budget(
+    trace: Optional[str] = None,
+    session: Optional[str] = None,
+    agent: Optional[str] = None,
+    tokens: Optional[int] = None,
+    cost: Optional[float] = None,
+    hard: bool = False,
+    on_exceeded: Optional[Callable[[Budget, str, Dict[str, float]], None]] = None,
+) -> Budget:
+    """
+    Limit the tokens and/or USD cost of one trace, session or agent ("*" for
+    each one). `on_exceeded(budget, key, usage)` is called once when the limit
+    is crossed; a hard budget then stops further LLM calls in that scope.
+    """
+    if tokens is None and cost is None:
+        raise ValueError("A budget needs tokens= and/or cost=")
+    scope, key = _scope_of({"trace": trace, "session": session, "agent": agent})
+    return registry.add_budget(Budget(scope, key, tokens, cost, hard, on_exceeded))
+
+
+def remove_budget(budget: Budget) -> None:
+    registry.remove_budget(budget)
+
+
+def reset_usage(trace: Optional[str] = None, session: Optional[str] = None, agent: Optional[str] = None) -> None:
+    registry.reset(*_scope_of({"trace": trace, "session": session, "agent": agent}))
+
+
+def check_budget() -> None:
+    """
+    Called by the integrations before each LLM request: raise
+    BudgetExceededError if the current trace, session or agent is over a hard budget.
+    """
+    if not registry._blocked:
+        return
+    trace_id = session_id = agent = None
+    propagator = token_propagator.active
+    if propagator is not None:
+        trace_id, session_id, agent = propagator.scope(ot_trace.get_current_span())
+    if session_id is None and is_session_enabled():
+        session_id = get_session_id()
+    registry.check(trace_id, session_id, agent)
+
+
+def guarded(func: Callable) -> Callable:
+    """Wrap an LLM client method so hard budgets are checked before each request"""
+    if getattr(func, "_agensight_guarded", False):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        check_budget()
+        return func(*args, **kwargs)
+
+    wrapper._agensight_guarded = True
+    return wrapper
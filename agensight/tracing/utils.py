@@ -1,6 +1,11 @@
 import json
 from typing import List, Dict, Any
 
+from .compression import inflate
+
+IO_REF_KEY = "agensight.io_ref"
+_STORABLE = (str, int, float, type(None))
+
 def ns_to_seconds(nanoseconds: int) -> float:
     return nanoseconds / 1e9
 
@@ -38,10 +43,10 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
         if span["kind"] != "SpanKind.INTERNAL":
             continue
 
-        attributes = json.loads(span["attributes"])
+        attributes = json.loads(inflate(span["attributes"]))
         children = [s for s in spans if s["parent_id"] == span["id"]]
         has_llm_child = any("openai.chat" in c["name"] for c in children)
-        has_io = "gen_ai.normalized_input_output" in attributes
+        has_io = "gen_ai.normalized_input_output" in attributes or attributes.get(IO_REF_KEY, {}).get("normalized", False)
         has_tools = span["id"] in span_details_by_id and span_details_by_id[span["id"]].get("tools", [])
 
         if not (has_llm_child or has_io or has_tools):
@@ -81,7 +86,7 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
                 break
 
         for child in children:
-            child_attrs = json.loads(child["attributes"])
+            child_attrs = json.loads(inflate(child["attributes"]))
 
             for i in range(5):
                 tool_name = child_attrs.get(f"gen_ai.completion.0.tool_calls.{i}.name")
@@ -157,5 +162,79 @@ def parse_normalized_io_for_span(span_id: str, attribute_json: str):
 
         return prompt_records, completion_records
 
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, TypeError, AttributeError):
         return [], []
+
+
+def slim_span_attributes(attrs: Dict[str, Any], prompts: List[Dict[str, Any]], completions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Drop message-bearing attributes whose content is stored in the `prompts`
+    and `completions` tables, leaving an `agensight.io_ref` entry describing
+    what was removed so `expand_span_attributes` can rebuild them.
+    """
+    records = prompts + completions
+    if not records or not all(isinstance(r.get("content"), _STORABLE) for r in records):
+        return attrs
+
+    slim = dict(attrs)
+    ref = {}
+
+    # Only dropped if rebuilding it from the rows gives back the same string:
+    # extra keys or other formatting would otherwise be lost
+    if slim.get("gen_ai.normalized_input_output") == normalized_io(prompts, completions):
+        del slim["gen_ai.normalized_input_output"]
+        ref["normalized"] = True
+
+    for field, rows in (("prompt", prompts), ("completion", completions)):
+        stripped = []
+        for idx, row in enumerate(rows):
+            key = f"gen_ai.{field}.{idx}.content"
+            if key in slim and slim[key] == row["content"]:
+                del slim[key]
+                stripped.append(idx)
+        if stripped:
+            ref[f"{field}s"] = stripped
+
+    slim[IO_REF_KEY] = ref
+    return slim
+
+
+def expand_span_attributes(attributes: Dict[str, Any], details: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Inverse of `slim_span_attributes`: restore message attributes from the
+    span's prompt and completion rows (as returned by the span details queries).
+    """
+    ref = attributes.pop(IO_REF_KEY, None)
+    if not ref:
+        return attributes
+
+    prompts = sorted(details.get("prompts", []), key=lambda p: p.get("message_index") or 0)
+    completions = details.get("completions", [])
+
+    for field, rows in (("prompt", prompts), ("completion", completions)):
+        for idx in ref.get(f"{field}s", []):
+            if idx < len(rows):
+                attributes[f"gen_ai.{field}.{idx}.content"] = rows[idx]["content"]
+
+    if ref.get("normalized"):
+        attributes["gen_ai.normalized_input_output"] = normalized_io(prompts, completions)
+
+    return attributes
+
+
+def normalized_io(prompts: List[Dict[str, Any]], completions: List[Dict[str, Any]]) -> str:
+    """The gen_ai.normalized_input_output value expand_span_attributes rebuilds from message rows"""
+    return json.dumps({
+        "prompts": [{"role": p["role"], "content": p["content"]} for p in prompts],
+        "completions": [
+            {
+                "role": c["role"],
+                "content": c["content"],
+                "finish_reason": c.get("finish_reason"),
+                "completion_tokens": c.get("completion_tokens"),
+                "prompt_tokens": c.get("prompt_tokens"),
+                "total_tokens": c.get("total_tokens"),
+            }
+            for c in completions
+        ],
+    })
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Write precompressed .gz (and, if the `brotli` package is installed, .br)
+siblings for the static export, for the server to negotiate via
+Accept-Encoding. Runs automatically after `npm run build` (postbuild).
+
+    python3 scripts/precompress.py out
+"""
+import argparse
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone still covers every browser
+    brotli = None
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".map", ".xml", ".ico", ".webmanifest"}
+MIN_SIZE = 1024
+
+
+def _write_if_smaller(path: str, data: bytes, original_size: int) -> bool:
+    # A variant that doesn't save at least 5% isn't worth a separate file
+    if len(data) >= original_size * 0.95:
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def precompress(root: str) -> dict:
+    stats = {"files": 0, "bytes": 0, "gz_bytes": 0, "br_bytes": 0}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < MIN_SIZE:
+                continue
+
+            stats["files"] += 1
+            stats["bytes"] += len(data)
+            # mtime=0 keeps the output byte-identical across builds
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if _write_if_smaller(path + ".gz", gz, len(data)):
+                stats["gz_bytes"] += len(gz)
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if _write_if_smaller(path + ".br", br, len(data)):
+                    stats["br_bytes"] += len(br)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", nargs="?", default="out", help="Static export directory (default: out)")
+    args = parser.parse_args()
+    if not os.path.isdir(args.root):
+        print(f"[precompress] {args.root} is not a directory", file=sys.stderr)
+        return 1
+
+    stats = precompress(args.root)
+    print(
+        f"[precompress] {stats['files']} files, {stats['bytes']:,} bytes -> "
+        f"gzip {stats['gz_bytes']:,}" + (f", brotli {stats['br_bytes']:,}" if brotli else " (install brotli for .br)")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
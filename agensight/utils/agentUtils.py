@@ -2,6 +2,15 @@ from string import Formatter
 import os
 import json
 
+def extract_variables(prompt_text):
+    """Names of the {placeholders} in a prompt, in order of appearance"""
+    formatter = Formatter()
+    return [
+        field_name
+        for _, field_name, _, _ in formatter.parse(prompt_text)
+        if field_name
+    ]
+
 def add_new_prompt(agent_name, new_prompt_text, prompt_file_path):
     # Load existing promptData
     if os.path.exists(prompt_file_path):
@@ -16,12 +25,7 @@ def add_new_prompt(agent_name, new_prompt_text, prompt_file_path):
         p["current"] = False
 
     # Extract variables from the new prompt
-    formatter = Formatter()
-    variables = [
-        field_name
-        for _, field_name, _, _ in formatter.parse(new_prompt_text)
-        if field_name
-    ]
+    variables = extract_variables(new_prompt_text)
 
     # Add the new prompt as current
     prompts.append({
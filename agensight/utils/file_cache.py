@@ -0,0 +1,138 @@
+"""
+In-memory cache of parsed files, invalidated by file changes.
+
+Entries are revalidated with one os.stat — (mtime_ns, size, inode) — at most
+every `check_interval` seconds, so repeated reads in between cost a dict
+lookup. Writers in this process call `put` (or `invalidate`) after writing,
+which makes their own changes visible immediately; changes made by other
+processes show up within `check_interval`.
+
+Cached values are shared between callers and must not be mutated; copy
+before changing them.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def load_json(path: str) -> Any:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _signature(path: str) -> Tuple[int, int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class _Entry:
+    __slots__ = ("signature", "checked_at", "value", "body", "digest")
+
+    def __init__(self, signature, checked_at, value):
+        self.signature = signature
+        self.checked_at = checked_at
+        self.value = value
+        self.body = None
+        self.digest = None
+
+
+# Value of entries recording that the file didn't exist
+_MISSING = object()
+
+
+class _Failed:
+    """Value of entries whose file couldn't be parsed; re-raised until the file changes"""
+    __slots__ = ("error",)
+
+    def __init__(self, error: ValueError):
+        self.error = error
+
+
+def _body(entry: _Entry) -> bytes:
+    if entry.body is None:
+        entry.body = json.dumps(entry.value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return entry.body
+
+
+class FileCache:
+    def __init__(self, check_interval: float = 0.5):
+        self.check_interval = check_interval
+        self._entries: Dict[Tuple[str, Callable], _Entry] = {}
+        # Only serializes loads; hits never take it
+        self._load_lock = threading.Lock()
+
+    def _entry(self, path: str, loader: Callable[[str], Any], fresh: bool = False) -> _Entry:
+        key = (path, loader)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and not fresh and now - entry.checked_at < self.check_interval:
+            if entry.value is _MISSING:
+                raise FileNotFoundError(path)
+            if isinstance(entry.value, _Failed):
+                raise entry.value.error.with_traceback(None)
+            return entry
+
+        try:
+            signature = _signature(path)
+        except FileNotFoundError:
+            # Remembered too, so fallbacks to another file don't stat this one every time
+            self._entries[key] = _Entry(None, now, _MISSING)
+            raise
+        if entry is not None and entry.signature == signature:
+            entry.checked_at = now
+        else:
+            with self._load_lock:
+                entry = self._entries.get(key)
+                if entry is None or entry.signature != signature:
+                    try:
+                        value = loader(path)
+                    except ValueError as e:
+                        # Remembered as well: a broken file isn't re-parsed on every read
+                        value = _Failed(e)
+                    # Entries are replaced, never modified in place, so readers see old or new
+                    entry = _Entry(signature, now, value)
+                    self._entries[key] = entry
+        if isinstance(entry.value, _Failed):
+            raise entry.value.error.with_traceback(None)
+        return entry
+
+    def get(self, path: str, loader: Callable[[str], Any] = load_json, fresh: bool = False) -> Any:
+        """
+        The parsed contents of `path`; raises FileNotFoundError if it doesn't
+        exist. `fresh` revalidates against the file now instead of trusting a
+        recent check.
+        """
+        return self._entry(path, loader, fresh).value
+
+    def get_json(self, path: str, loader: Callable[[str], Any] = load_json, fresh: bool = False) -> bytes:
+        """The parsed contents of `path`, serialized once as compact JSON"""
+        return _body(self._entry(path, loader, fresh))
+
+    def get_digest(self, path: str, loader: Callable[[str], Any] = load_json, fresh: bool = False) -> str:
+        """SHA-256 of get_json's bytes, computed once per version of the file"""
+        entry = self._entry(path, loader, fresh)
+        if entry.digest is None:
+            entry.digest = hashlib.sha256(_body(entry)).hexdigest()
+        return entry.digest
+
+    def put(self, path: str, value: Any, loader: Callable[[str], Any] = load_json) -> None:
+        """Record `value` as the contents of `path`, just written by this process"""
+        self.invalidate(path)
+        try:
+            signature = _signature(path)
+        except OSError:
+            return
+        # A copy, so the writer can keep using its own object
+        self._entries[(path, loader)] = _Entry(signature, time.monotonic(), copy.deepcopy(value))
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the entries of `path`, or all entries"""
+        if path is None:
+            self._entries.clear()
+            return
+        for key in [key for key in list(self._entries) if key[0] == path]:
+            self._entries.pop(key, None)
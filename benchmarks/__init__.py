@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for AgenSight.
+
+Run a module directly, e.g. `python -m benchmarks.bench_storage`.
+"""
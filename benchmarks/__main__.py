@@ -0,0 +1,56 @@
+"""
+Run the benchmark suite and store results as JSON for comparison across commits.
+
+    python -m benchmarks                      # run everything, write results/<commit>.json
+    python -m benchmarks --quick --only sdk   # smaller inputs, selected suites
+    python -m benchmarks compare base.json head.json
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+
+from .harness import compare, write_results
+
+SUITES = ["import", "sdk", "exporter", "transform", "server", "storage"]
+
+
+def run_suites(names, quick):
+    results = {}
+    for name in names:
+        module = importlib.import_module(f".bench_{name}", __package__)
+        start = time.perf_counter()
+        print(f"[benchmarks] running {name}...", file=sys.stderr)
+        results[name] = module.run(quick=quick)
+        print(f"[benchmarks] {name} done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "compare":
+        parser = argparse.ArgumentParser(prog="python -m benchmarks compare")
+        parser.add_argument("base")
+        parser.add_argument("head")
+        parser.add_argument("--threshold", type=float, default=1.1,
+                            help="Ratio above which a result is flagged as a regression")
+        args = parser.parse_args(argv[1:])
+        print("\n".join(compare(args.base, args.head, args.threshold)))
+        return 0
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--quick", action="store_true", help="Use smaller inputs and fewer repeats")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = run_suites(args.only, args.quick)
+    path = write_results(results, args.output)
+    print(json.dumps(results, indent=2))
+    print(f"[benchmarks] results written to {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
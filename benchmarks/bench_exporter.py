@@ -0,0 +1,47 @@
+"""
+Exporter throughput benchmark: DBSpanExporter.export spans/sec for batches
+shaped like the ones BatchSpanProcessor hands over.
+
+    python -m benchmarks.bench_exporter
+"""
+import json
+import time
+
+from agensight.tracing.exporter_db import DBSpanExporter
+
+from .fixtures import make_spans, scratch_db
+
+
+def spans_per_second(batch_size: int, batches: int) -> dict:
+    spans = make_spans(batch_size * batches)
+    chunks = [spans[i:i + batch_size] for i in range(0, batch_size * batches, batch_size)]
+    exporter = DBSpanExporter()
+
+    with scratch_db():
+        timings = []
+        for chunk in chunks:
+            start = time.perf_counter()
+            exporter.export(chunk)
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        "batch_size": batch_size,
+        "batches": len(chunks),
+        "spans_per_sec": round(sum(len(c) for c in chunks) / total, 1),
+        "batch_latency": {"min": timings[0], "median": timings[len(timings) // 2], "max": timings[-1]},
+    }
+
+
+def run(quick: bool = False) -> dict:
+    batches = 3 if quick else 10
+    return {f"batch_{size}": spans_per_second(size, batches) for size in (64, 512)}
+
+
+def main():
+    print(json.dumps(run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
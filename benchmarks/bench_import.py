@@ -0,0 +1,71 @@
+"""
+Import-time benchmark and budget check: cost of `import agensight` and the
+entry points built on it, each measured in a fresh interpreter.
+
+    python -m benchmarks.bench_import           # exits non-zero if over budget
+
+A statement is over budget when its median import time exceeds its budget or
+it loads a module it must not (provider SDKs, the web stack).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statement -> (budget in seconds, modules that must not be loaded)
+BUDGETS = {
+    "import agensight": (0.05, ("opentelemetry.sdk", "openai", "anthropic", "fastapi", "flask")),
+    "from agensight import trace, span": (0.3, ("openai", "anthropic", "fastapi", "flask")),
+    "import agensight.server": (0.05, ("openai", "anthropic", "fastapi", "flask")),
+    "import cli.main": (0.1, ("openai", "anthropic", "fastapi", "flask")),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({stmt!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def time_import(stmt: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.check_output([sys.executable, "-c", _PROBE.format(stmt=stmt)], cwd=ROOT, env=env)
+    return json.loads(out)
+
+
+def run(quick: bool = False) -> dict:
+    repeat = 3 if quick else 7
+    results = {}
+    for stmt, (budget, forbidden) in BUDGETS.items():
+        probes = [time_import(stmt) for _ in range(repeat)]
+        seconds = sorted(p["seconds"] for p in probes)
+        loaded = probes[0]["modules"]
+        leaked = sorted(m for m in forbidden if any(x == m or x.startswith(m + ".") for x in loaded))
+        results[stmt] = {
+            "min": seconds[0],
+            "median": statistics.median(seconds),
+            "max": seconds[-1],
+            "budget": budget,
+            "modules": len(loaded),
+            "unexpected_modules": leaked,
+            "within_budget": statistics.median(seconds) <= budget and not leaked,
+        }
+    return results
+
+
+def main():
+    results = run()
+    print(json.dumps(results, indent=2))
+    over = [stmt for stmt, r in results.items() if not r["within_budget"]]
+    if over:
+        print(f"[benchmarks] over import budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+SDK overhead benchmark: per-call cost of `@trace`/`@span` and of the
+OpenAI/Anthropic wrappers against stub clients that never touch the network.
+
+    python -m benchmarks.bench_sdk
+"""
+import json
+
+from opentelemetry import trace as ot_trace
+
+from .fixtures import scratch_db
+from .harness import measure
+
+_CHAT_COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Sunny, 25°C."}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 42, "completion_tokens": 7, "total_tokens": 49},
+}
+
+_MESSAGE = {
+    "id": "msg-bench",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-3",
+    "content": [{"type": "text", "text": "Sunny, 25°C."}],
+    "stop_reason": "end_turn",
+    "usage": {"input_tokens": 42, "output_tokens": 7},
+}
+
+_MESSAGES = [{"role": "user", "content": "What's the weather in Bangalore?"}]
+
+
+def _stub_openai_client():
+    import openai
+    from openai.types.chat import ChatCompletion
+
+    response = ChatCompletion.model_validate(_CHAT_COMPLETION)
+    client = openai.OpenAI(api_key="sk-bench")
+    client.chat.completions._post = lambda *args, **kwargs: response
+    return client
+
+
+def _stub_anthropic_client():
+    import anthropic
+    from anthropic.types import Message
+
+    response = Message.model_validate(_MESSAGE)
+    client = anthropic.Anthropic(api_key="sk-bench")
+    client.messages._post = lambda *args, **kwargs: response
+    return client
+
+
+def _decorator_overhead(results, repeat):
+    from agensight.tracing.decorators import trace, span
+
+    def plain():
+        return {"usage": {"total_tokens": 3, "prompt_tokens": 2, "completion_tokens": 1}}
+
+    spanned = span(name="bench_span")(plain)
+    traced = trace("bench_trace")(plain)
+
+    @trace("bench_trace_with_span")
+    def traced_with_span():
+        return spanned()
+
+    baseline = measure(plain, repeat=repeat)
+    results["decorators"] = {
+        "baseline": baseline,
+        "span": measure(spanned, repeat=repeat),
+        "trace": measure(traced, repeat=repeat),
+        "trace_with_span": measure(traced_with_span, repeat=repeat),
+    }
+
+
+def _wrapper_overhead(results, repeat):
+    from agensight.integrations import instrument_openai, instrument_anthropic
+
+    entry = results["wrappers"] = {}
+
+    try:
+        client = _stub_openai_client()
+
+        def call():
+            return client.chat.completions.create(model="gpt-4o-mini", messages=_MESSAGES)
+
+        entry["openai_baseline"] = measure(call, repeat=repeat)
+        instrument_openai()
+        entry["openai_instrumented"] = measure(call, repeat=repeat)
+    except ImportError as e:
+        entry["openai_skipped"] = str(e)
+
+    try:
+        client = _stub_anthropic_client()
+
+        def call():
+            return client.messages.create(model="claude-3", max_tokens=64, messages=_MESSAGES)
+
+        entry["anthropic_baseline"] = measure(call, repeat=repeat)
+        instrument_anthropic()
+        entry["anthropic_instrumented"] = measure(call, repeat=repeat)
+    except ImportError as e:
+        entry["anthropic_skipped"] = str(e)
+
+
+def run(quick: bool = False) -> dict:
+    from agensight.tracing.setup import setup_tracing
+
+    repeat = 3 if quick else 7
+    results = {}
+    with scratch_db():
+        setup_tracing(service_name="benchmarks", exporter_type="db")
+        try:
+            _decorator_overhead(results, repeat)
+            _wrapper_overhead(results, repeat)
+        finally:
+            ot_trace.get_tracer_provider().shutdown()
+    return results
+
+
+def main():
+    print(json.dumps(run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
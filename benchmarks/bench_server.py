@@ -0,0 +1,67 @@
+"""
+Endpoint latency benchmark for `/api/traces`, `/api/traces/{id}/spans` and
+`/api/traces/{id}/timeline` against a seeded trace DB, using FastAPI's
+in-process test client.
+
+    python -m benchmarks.bench_server
+"""
+import json
+import logging
+
+from agensight.tracing import db
+from agensight.tracing.exporter_db import DBSpanExporter
+
+from .fixtures import make_spans, scratch_db
+from .harness import measure
+
+
+def _client():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from agensight.server.routes.trace import trace_router
+
+    # The test client logs every request at INFO, which swamps the report.
+    for name in ("httpx", "httpx2"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    app = FastAPI()
+    app.include_router(trace_router, prefix="/api")
+    return TestClient(app)
+
+
+def run(quick: bool = False) -> dict:
+    n_spans = 1000 if quick else 5000
+    repeat = 3 if quick else 5
+
+    with scratch_db():
+        DBSpanExporter().export(make_spans(n_spans))
+        conn = db.get_db()
+        trace_id = conn.execute("SELECT id FROM traces ORDER BY started_at DESC LIMIT 1").fetchone()[0]
+        trace_count = conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0]
+        conn.close()
+
+        client = _client()
+
+        def list_traces():
+            assert client.get("/api/traces").status_code == 200
+
+        def trace_spans():
+            assert client.get(f"/api/traces/{trace_id}/spans").status_code == 200
+
+        def trace_timeline():
+            assert client.get(f"/api/traces/{trace_id}/timeline?width=1200").status_code == 200
+
+        return {
+            "seed": {"spans": n_spans, "traces": trace_count},
+            "list_traces": measure(list_traces, repeat=repeat),
+            "trace_spans": measure(trace_spans, repeat=repeat),
+            "trace_timeline": measure(trace_timeline, repeat=repeat),
+        }
+
+
+def main():
+    print(json.dumps(run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Storage benchmark: bytes per span written by DBSpanExporter.
+
+    python -m benchmarks.bench_storage [--spans N]
+"""
+import argparse
+import json
+
+from agensight.tracing.config import config
+from agensight.tracing.exporter_db import DBSpanExporter
+
+from .fixtures import db_size_bytes, make_spans, scratch_db
+
+
+def bytes_per_span(spans, compression: bool) -> float:
+    previous = config.get("compression", True)
+    config["compression"] = compression
+    try:
+        with scratch_db() as path:
+            DBSpanExporter().export(spans)
+            return db_size_bytes(path) / len(spans)
+    finally:
+        config["compression"] = previous
+
+
+def run(quick: bool = False, n_spans: int = None) -> dict:
+    spans = make_spans(n_spans or (600 if quick else 3000))
+    plain = bytes_per_span(spans, compression=False)
+    packed = bytes_per_span(spans, compression=True)
+    return {
+        "spans": len(spans),
+        "bytes_per_span_uncompressed": round(plain, 1),
+        "bytes_per_span": round(packed, 1),
+        "ratio": round(plain / packed, 2) if packed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spans", type=int, default=3000)
+    args = parser.parse_args()
+    print(json.dumps(run(n_spans=args.spans), indent=2))
+
+
+if __name__ == "__main__":
+    main()
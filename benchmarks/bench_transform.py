@@ -0,0 +1,55 @@
+"""
+Agent-view benchmark: transform_trace_to_agent_view over one trace of about
+100, 1k and 10k spans (rounded up to whole agent runs; 100 and 1k with
+--quick), loaded the same way the `/api/traces/{id}/spans` route does.
+
+    python -m benchmarks.bench_transform
+"""
+import json
+
+from agensight.tracing import db
+from agensight.tracing.compression import inflate_row
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.utils import transform_trace_to_agent_view
+
+from .fixtures import make_spans, scratch_db
+from .harness import measure
+
+
+def load_view_inputs(n_spans: int):
+    """Export one trace of at least `n_spans` spans and read back its rows and details."""
+    with scratch_db():
+        DBSpanExporter().export(make_spans(n_spans, single_trace=True))
+        conn = db.get_db()
+        spans = [dict(s) for s in conn.execute("SELECT * FROM spans ORDER BY started_at")]
+        details = {s["id"]: {"prompts": [], "completions": [], "tools": []} for s in spans}
+        for row in conn.execute("SELECT * FROM prompts"):
+            details[row["span_id"]]["prompts"].append(inflate_row(row, "content"))
+        for row in conn.execute("SELECT * FROM completions"):
+            details[row["span_id"]]["completions"].append(inflate_row(row, "content"))
+        for row in conn.execute("SELECT * FROM tools"):
+            details[row["span_id"]]["tools"].append(dict(row))
+        conn.close()
+    return spans, details
+
+
+def run(quick: bool = False) -> dict:
+    sizes = (100, 1000) if quick else (100, 1000, 10000)
+    results = {}
+    for size in sizes:
+        spans, details = load_view_inputs(size)
+        repeat = 1 if size >= 10000 else 3
+        results[f"spans_{size}"] = measure(
+            lambda: transform_trace_to_agent_view(spans, details),
+            repeat=repeat,
+            number=1 if size >= 1000 else None,
+        )
+    return results
+
+
+def main():
+    print(json.dumps(run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
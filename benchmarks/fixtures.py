@@ -0,0 +1,115 @@
+"""
+Shared fixtures for the benchmarks: realistic finished spans and scratch trace DBs.
+"""
+import json
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+
+from opentelemetry.trace import SpanKind
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+SENTENCES = [
+    "The user wants a short summary of the quarterly report.",
+    "Please answer concisely and cite the relevant section of the document.",
+    "You are a helpful assistant that plans trips for busy travellers.",
+    "Here is the weather forecast for Bangalore for the next three days.",
+    "I'm sorry, but I can't help with that request.",
+    "Let me know if you have any other questions about your booking.",
+    "The latest AI news covers new open-source models and evaluation suites.",
+    "Schedule the meeting for Tuesday afternoon and send a reminder to the team.",
+    "Format the final answer as a bulleted list with at most five items.",
+    "The function returned an error because the location was not recognised.",
+]
+
+
+def make_text(rng: random.Random, sentences: int) -> str:
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def _add_agent_spans(tracer, rng, prompt_sentences: int) -> int:
+    """Three agent spans, each with an `openai.chat` child, under the current span; returns 6"""
+    for agent in ("Planner", "Scheduler", "Presenter"):
+        prompt = make_text(rng, prompt_sentences)
+        answer = make_text(rng, prompt_sentences // 2 or 1)
+        io = {
+            "prompts": [{"role": "user", "content": prompt}],
+            "completions": [{
+                "role": "assistant", "content": answer, "finish_reason": "stop",
+                "completion_tokens": 80, "prompt_tokens": 240, "total_tokens": 320,
+            }],
+        }
+        with tracer.start_as_current_span(agent, attributes={"agent.name": agent}) as agent_span:
+            with tracer.start_as_current_span("openai.chat", kind=SpanKind.CLIENT) as llm:
+                llm.set_attribute("gen_ai.system", "OpenAI")
+                llm.set_attribute("gen_ai.request.model", "gpt-4o-mini")
+                llm.set_attribute("gen_ai.prompt.0.role", "system")
+                llm.set_attribute("gen_ai.prompt.0.content", SENTENCES[2])
+                llm.set_attribute("gen_ai.prompt.1.role", "user")
+                llm.set_attribute("gen_ai.prompt.1.content", prompt)
+                llm.set_attribute("gen_ai.completion.0.role", "assistant")
+                llm.set_attribute("gen_ai.completion.0.content", answer)
+                llm.set_attribute("gen_ai.completion.0.finish_reason", "stop")
+                llm.set_attribute("llm.usage.total_tokens", 320)
+                llm.set_attribute("gen_ai.usage.prompt_tokens", 240)
+                llm.set_attribute("gen_ai.usage.completion_tokens", 80)
+                if agent == "Planner":
+                    llm.set_attribute("gen_ai.completion.0.tool_calls.0.name", "get_weather")
+                    llm.set_attribute("gen_ai.completion.0.tool_calls.0.arguments", json.dumps({"location": "Bangalore"}))
+            agent_span.set_attribute("gen_ai.normalized_input_output", json.dumps(io))
+    return 6
+
+
+def make_spans(n_spans: int, seed: int = 7, prompt_sentences: int = 12, single_trace: bool = False):
+    """
+    Produce at least `n_spans` finished ReadableSpans shaped like real agent runs:
+    a root span per trace, agent spans from `@span` carrying normalized IO, and
+    `openai.chat` children carrying `gen_ai.*` prompt/completion attributes.
+    Traces have 7 spans each, or with `single_trace` all spans share one root.
+    """
+    rng = random.Random(seed)
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer("benchmarks")
+
+    produced = 0
+    while produced < n_spans:
+        with tracer.start_as_current_span("multi_agent_chat", attributes={"trace.name": "multi_agent_chat"}):
+            produced += 1
+            produced += _add_agent_spans(tracer, rng, prompt_sentences)
+            while single_trace and produced < n_spans:
+                produced += _add_agent_spans(tracer, rng, prompt_sentences)
+
+    provider.shutdown()
+    return list(memory.get_finished_spans())
+
+
+@contextmanager
+def scratch_db():
+    """Point the trace DB at a fresh temporary file for the duration of the block."""
+    from agensight.tracing import db
+
+    previous = db.DB_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_FILE = os.path.join(tmp, "traces.db")
+        try:
+            db.init_schema()
+            yield db.DB_FILE
+        finally:
+            db.DB_FILE = previous
+
+
+def db_size_bytes(path) -> int:
+    """On-disk size of a SQLite DB after compaction."""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return page_count * page_size
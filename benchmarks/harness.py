@@ -0,0 +1,124 @@
+"""
+Minimal asv-style timing harness shared by the benchmark modules.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05, number: Optional[int] = None) -> Dict[str, float]:
+    """
+    Time `fn` and return per-call statistics in seconds.
+
+    Each of the `repeat` samples runs `fn` `number` times; when `number` is not
+    given it is calibrated so that one sample takes at least `min_time`.
+    """
+    fn()  # warm up lazy initialisation outside the timed samples
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time or number >= 1_000_000:
+                break
+            number *= 10
+
+    samples: List[float] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    samples.sort()
+    return {
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "max": samples[-1],
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(RESULTS_DIR),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(results: Dict[str, Dict], path: Optional[str] = None) -> str:
+    """Write a results document for the current commit and return its path."""
+    revision = git_revision()
+    document = {
+        "commit": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{revision}.json")
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    return path
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results to dotted names; timing entries collapse to their median."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict) and "median" in value:
+            flat[name] = value["median"]
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def _higher_is_better(name: str) -> bool:
+    return name.endswith(("per_sec", "ratio"))
+
+
+def compare(base_path: str, head_path: str, threshold: float = 1.1) -> List[str]:
+    """
+    Compare two results documents and return report lines. Regressions beyond
+    `threshold` are marked with `!`, improvements with `*`.
+    """
+    with open(base_path) as f:
+        base = _flatten(json.load(f)["results"])
+    with open(head_path) as f:
+        head = _flatten(json.load(f)["results"])
+
+    lines = [f"{'benchmark':<60} {'base':>12} {'head':>12} {'ratio':>7}"]
+    for name in sorted(set(base) & set(head)):
+        old, new = base[name], head[name]
+        if not old:
+            continue
+        ratio = new / old
+        worse = ratio < 1 / threshold if _higher_is_better(name) else ratio > threshold
+        better = ratio > threshold if _higher_is_better(name) else ratio < 1 / threshold
+        flag = " !" if worse else (" *" if better else "")
+        lines.append(f"{name:<60} {old:>12.6g} {new:>12.6g} {ratio:>7.2f}{flag}")
+    return lines
@@ -1,22 +1,100 @@
 # agensight/cli/main.py
 
 import argparse
+import json
+import sys
 import webbrowser
-from agensight.server.app import start_server
+
+
+def synth(args):
+    from agensight.tracing.synth import generate
+
+    def progress(done, total):
+        print(f"\r[agensight] {done:,}/{total:,} spans", end="", file=sys.stderr, flush=True)
+
+    stats = generate(
+        args.spans,
+        path=args.db,
+        sessions=args.sessions,
+        seed=args.seed,
+        error_rate=args.error_rate,
+        days=args.days,
+        progress=progress,
+    )
+    print(file=sys.stderr)
+    print(json.dumps(stats, indent=2))
+
+
+def loadtest(args):
+    from agensight.server.loadtest import run_load, format_report
+
+    report = run_load(
+        base_url=args.url,
+        endpoints=args.endpoints,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        max_requests=args.requests,
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+def tail(args):
+    from agensight.server.tail import stream_spans, format_span, format_trace
+
+    seen_traces = set()
+    try:
+        for event, row in stream_spans(args.url, trace_id=args.trace, after=args.after):
+            if event == "span":
+                print(format_span(row), flush=True)
+            elif row["id"] not in seen_traces:
+                # A traces row is written with the root span, i.e. when the run finishes
+                seen_traces.add(row["id"])
+                print(format_trace(row), flush=True)
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
-    print("Starting agensight server...")
     parser = argparse.ArgumentParser(prog="agensight")
     subparsers = parser.add_subparsers(dest="command")
 
     view_parser = subparsers.add_parser("view", help="View the agensight project")
 
+    synth_parser = subparsers.add_parser("synth", help="Generate synthetic traces into a trace DB")
+    synth_parser.add_argument("--spans", type=int, default=1_000_000, help="Number of spans to generate")
+    synth_parser.add_argument("--db", help="Trace DB to write to (default: the SDK trace DB)")
+    synth_parser.add_argument("--sessions", type=int, help="Number of distinct sessions (default: spans / 200)")
+    synth_parser.add_argument("--seed", type=int, default=0)
+    synth_parser.add_argument("--error-rate", type=float, default=0.03, help="Fraction of spans marked as errors")
+    synth_parser.add_argument("--days", type=float, default=7.0, help="Spread traces over this many past days")
+
+    load_parser = subparsers.add_parser("loadtest", help="Load-test the /api endpoints of a running server")
+    load_parser.add_argument("--url", default="http://127.0.0.1:5001")
+    load_parser.add_argument("--endpoints", nargs="+", choices=["traces", "trace_spans", "span_details"])
+    load_parser.add_argument("--concurrency", type=int, default=8)
+    load_parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    load_parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    load_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    tail_parser = subparsers.add_parser("tail", help="Follow spans as a running server receives them")
+    tail_parser.add_argument("--url", default="http://127.0.0.1:5001")
+    tail_parser.add_argument("--trace", help="Only follow this trace id")
+    tail_parser.add_argument("--after", type=int, help="Replay spans after this cursor (0 for all)")
+
     args = parser.parse_args()
     if args.command ==  "view":
+        # Only here: other commands print JSON or span lines that get piped
+        print("Starting agensight server...")
+        from agensight.server.app import start_server
         start_server()
+    elif args.command == "synth":
+        synth(args)
+    elif args.command == "loadtest":
+        loadtest(args)
+    elif args.command == "tail":
+        tail(args)
     else:
         parser.print_help()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -15,16 +15,13 @@ setup(
     install_requires=[
         "openai",
         "requests",
-        "flask",
-        "flask_cors",
         "fastapi",
         "uvicorn",
         "sqlalchemy",
         "pydantic",
-        "starlette",
+        "starlette>=0.46.0",
         "typing-extensions",
         "python-multipart",
-        "werkzeug",
         "jinja2",
         "aiofiles",
         "click",
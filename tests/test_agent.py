@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from agensight.agent_config import AgentConfigClient
+
+# Imported only once something that needs them is used
+HEAVY_MODULES = ("openai", "anthropic", "opentelemetry", "fastapi", "uvicorn", "starlette", "pydantic", "httpx")
+
+
+def test_import_agensight_loads_no_heavy_modules():
+    code = (
+        "import json, sys\n"
+        "import agensight\n"
+        "print(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))\n"
+    )
+    # The child finds agensight wherever this process does
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    loaded = set(json.loads(result.stdout))
+    assert loaded.isdisjoint(HEAVY_MODULES), sorted(loaded.intersection(HEAVY_MODULES))
+
+
+def test_agent_config_raw_is_deeply_read_only(tmp_path):
+    agent = {"name": "Planner", "prompt": "Plan {task}", "modelParams": {"stop": ["END"]}, "variables": ["task"]}
+    (tmp_path / "agensight.config.json").write_text(json.dumps({"agents": [agent]}))
+    config = AgentConfigClient(str(tmp_path)).get("Planner")
+
+    assert config.render(task="a trip") == "Plan a trip"
+    assert config.raw["modelParams"]["stop"] == ("END",)
+    with pytest.raises(TypeError):
+        config.raw["modelParams"]["temperature"] = 2
+    with pytest.raises(AttributeError):
+        config.raw["variables"].append("city")
+
+
+def test_agent_config_rejects_version_outside_versions_dir(tmp_path):
+    (tmp_path / "agensight.config.json").write_text(json.dumps({"agents": [{"name": "Planner", "prompt": ""}]}))
+    client = AgentConfigClient(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        client.get("Planner", version="../../agensight.config")
+    with pytest.raises(FileNotFoundError):
+        client.get("Planner", version="1.0.2")
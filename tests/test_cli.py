@@ -0,0 +1,17 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_synth_prints_only_json_to_stdout(tmp_path):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([ROOT, *sys.path])}
+    result = subprocess.run(
+        [sys.executable, "-m", "cli.main", "synth", "--spans", "50", "--db", str(tmp_path / "synth.db")],
+        capture_output=True, text=True, env=env, cwd=tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    stats = json.loads(result.stdout)
+    assert stats["spans"] >= 50  # whole traces
@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from agensight.server.app import app
+from agensight.tracing import db, metrics
+from agensight.tracing.exporter_db import DBSpanExporter
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    errors = registry.counter("errors_total", "Errors", ("reason",))
+    errors.inc(reason="Timeout")
+    errors.inc(2, reason='bad "quote"')
+    registry.gauge("depth", "Queue depth").set_function(lambda: 7)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render_prometheus().splitlines()
+    assert "# TYPE errors_total counter" in lines
+    assert 'errors_total{reason="Timeout"} 1' in lines
+    assert 'errors_total{reason="bad \\"quote\\""} 2' in lines
+    assert "depth 7" in lines
+    assert [line for line in lines if line.startswith("latency_seconds")] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+    # Registering again returns the same metric; a different kind is an error
+    assert registry.counter("errors_total", "Errors", ("reason",)) is errors
+    with pytest.raises(ValueError):
+        registry.gauge("errors_total", "Errors")
+    with pytest.raises(ValueError):
+        errors.inc(stage="export")
+
+
+def test_exporter_and_server_report_metrics(tmp_path, monkeypatch):
+    # The legacy config route creates a config in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_FILE", tmp_path / "traces.db")
+    db.init_schema()
+    written = metrics.spans_written.value()
+    batches = metrics.export_batch_size.count()
+
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(DBSpanExporter()))
+    with provider.get_tracer("test").start_as_current_span("run"):
+        pass
+    provider.shutdown()
+    assert metrics.spans_written.value() == written + 1
+    assert metrics.export_batch_size.count() == batches + 1
+
+    client = TestClient(app)
+    client.get("/api/traces/t1/tree")
+    client.get("/flask-compat/api/config", params={"version": "9.9.9"})
+    text = client.get("/metrics").text
+    # Labelled by route template, not by the requested path
+    assert 'route="/api/traces/{trace_id}/tree",status="404"' in text
+    assert 'route="/flask-compat/api/config"' in text
+    assert "agensight_spans_written_total" in text
@@ -0,0 +1,129 @@
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from agensight.tracing import db
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.pricing import ModelPrice, PricingTable, span_cost
+
+
+def test_model_price_charges_cached_part_of_prompt_at_cached_rate():
+    price = ModelPrice(input=2.0, output=8.0, cached_input=0.5)
+    # 1M prompt tokens of which 400k cached, 100k completion
+    assert price.cost(1_000_000, 100_000, cached_tokens=400_000) == pytest.approx(0.6 * 2.0 + 0.4 * 0.5 + 0.1 * 8.0)
+
+
+def test_model_price_adds_cache_reads_and_writes_on_top_of_prompt():
+    price = ModelPrice(input=3.0, output=15.0, cached_input=0.3, cache_write_input=3.75)
+    cost = price.cost(1_000_000, 0, cache_read_tokens=2_000_000, cache_creation_tokens=1_000_000)
+    assert cost == pytest.approx(3.0 + 2 * 0.3 + 3.75)
+
+
+def test_model_price_without_cache_rates_charges_input_rate():
+    price = ModelPrice(input=10.0, output=30.0)
+    assert price.cost(1_000_000, 0, cached_tokens=500_000) == pytest.approx(10.0)
+    assert price.cost(0, 0, cache_read_tokens=1_000_000, cache_creation_tokens=1_000_000) == pytest.approx(20.0)
+
+
+def test_pricing_table_resolves_snapshots_and_effective_dates():
+    table = PricingTable()
+    table.register("gpt-4o", 5.0, 15.0, effective_from="2024-05-13")
+    table.register("gpt-4o", 2.5, 10.0, cached_input=1.25, effective_from="2024-10-01")
+    table.register("gpt-4o-mini", 0.15, 0.6)
+
+    assert table.price("openai/GPT-4o-2024-08-06").input == 2.5
+    assert table.price("gpt-4o-mini-2024-07-18").input == 0.15
+    assert table.price("gpt-4o", at=1_720_000_000).input == 5.0  # July 2024
+    assert table.price("gpt-4o", at=0).input == 5.0
+    assert table.price("gpt-4") is None
+    assert table.cost("unknown-model", 10, 10) is None
+
+
+def test_span_cost_openai_cached_tokens_are_part_of_prompt():
+    attrs = {
+        "gen_ai.system": "openai",
+        "gen_ai.response.model": "gpt-4o-2024-08-06",
+        "gen_ai.usage.cache_read_input_tokens": 400_000,
+    }
+    model, cached, cost = span_cost(attrs, 1_000_000, 100_000, at=1_750_000_000)
+    assert model == "gpt-4o-2024-08-06"
+    assert cached == 400_000
+    assert cost == pytest.approx(0.6 * 2.5 + 0.4 * 1.25 + 0.1 * 10.0)
+
+
+def test_span_cost_anthropic_cache_tokens_are_billed_separately():
+    attrs = {
+        "gen_ai.system": "Anthropic",
+        "gen_ai.request.model": "claude-3-5-sonnet-20241022",
+        "gen_ai.usage.cache_read_input_tokens": 2_000_000,
+        "gen_ai.usage.cache_creation_input_tokens": 1_000_000,
+    }
+    model, cached, cost = span_cost(attrs, 1_000_000, 100_000)
+    assert cached == 2_000_000
+    assert cost == pytest.approx(3.0 + 2 * 0.30 + 3.75 + 0.1 * 15.0)
+
+
+def test_span_cost_without_model_is_unpriced():
+    assert span_cost({"gen_ai.usage.cache_read_input_tokens": 5}, 10, 10) == (None, 0, None)
+
+
+@pytest.fixture
+def trace_db(tmp_path, monkeypatch):
+    path = tmp_path / "traces.db"
+    monkeypatch.setattr(db, "DB_FILE", path)
+    db.init_schema(path)
+    return path
+
+
+def _llm_span(tracer, model, prompt_tokens, completion_tokens, **attrs):
+    with tracer.start_as_current_span("openai.chat") as span:
+        span.set_attribute("gen_ai.response.model", model)
+        span.set_attribute("gen_ai.usage.prompt_tokens", prompt_tokens)
+        span.set_attribute("gen_ai.usage.completion_tokens", completion_tokens)
+        span.set_attribute("llm.usage.total_tokens", prompt_tokens + completion_tokens)
+        span.set_attribute("gen_ai.completion.0.role", "assistant")
+        span.set_attribute("gen_ai.completion.0.content", "ok")
+        for key, value in attrs.items():
+            span.set_attribute(key, value)
+
+
+def test_costs_roll_up_to_trace_session_and_buckets(trace_db):
+    provider = TracerProvider()
+    # One span per export: children arrive before their trace row exists
+    provider.add_span_processor(SimpleSpanProcessor(DBSpanExporter()))
+    tracer = provider.get_tracer("test")
+
+    with tracer.start_as_current_span("agent") as root:
+        root.set_attribute("session.id", "s1")
+        _llm_span(tracer, "gpt-4o-mini", 1_000_000, 0)
+        _llm_span(tracer, "gpt-4o-mini", 0, 1_000_000)
+        _llm_span(tracer, "claude-3-haiku", 1_000_000, 0, **{"gen_ai.system": "Anthropic"})
+        _llm_span(tracer, "unpriced-model", 1_000, 1_000)
+    provider.shutdown()
+
+    expected = 0.15 + 0.60 + 0.25
+    conn = db.get_db(trace_db)
+    try:
+        trace = conn.execute("SELECT cost, total_tokens FROM traces").fetchone()
+        assert trace["cost"] == pytest.approx(expected)
+        assert trace["total_tokens"] == 3_002_000
+
+        session = conn.execute("SELECT trace_count, total_cost, total_tokens FROM sessions WHERE id = 's1'").fetchone()
+        assert session["trace_count"] == 1
+        assert session["total_cost"] == pytest.approx(expected)
+        assert session["total_tokens"] == 3_002_000
+
+        buckets = {
+            row["model"]: row
+            for row in conn.execute("SELECT model, calls, unpriced_calls, prompt_tokens, completion_tokens, cost FROM cost_buckets")
+        }
+        assert buckets["gpt-4o-mini"]["calls"] == 2
+        assert buckets["gpt-4o-mini"]["cost"] == pytest.approx(0.75)
+        assert buckets["claude-3-haiku"]["cost"] == pytest.approx(0.25)
+        assert buckets["unpriced-model"]["unpriced_calls"] == 1
+        assert buckets["unpriced-model"]["cost"] == 0
+
+        span_costs = sorted(row[0] for row in conn.execute("SELECT cost FROM spans WHERE cost IS NOT NULL"))
+        assert span_costs == pytest.approx(sorted([0.15, 0.60, 0.25]))
+    finally:
+        conn.close()
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+
+from agensight.tracing.processor import AdaptiveBatchSpanProcessor
+
+
+class _RecordingExporter(SpanExporter):
+    """Records exported span names; with a `gate`, each export waits for it to open"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.batches = []
+        self.exporting = threading.Event()
+        self.exported = threading.Event()
+
+    def export(self, spans):
+        self.exporting.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append([span.name for span in spans])
+        self.exported.set()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def names(self):
+        return [name for batch in self.batches for name in batch]
+
+
+def _tracer(processor):
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    return provider, provider.get_tracer("test")
+
+
+def test_root_span_is_exported_at_once_with_queued_children():
+    exporter = _RecordingExporter()
+    provider, tracer = _tracer(AdaptiveBatchSpanProcessor(exporter, schedule_delay_millis=60_000))
+
+    with tracer.start_as_current_span("root"):
+        tracer.start_span("child").end()
+        time.sleep(0.1)
+        assert exporter.batches == []  # Waits for the schedule delay
+    assert exporter.exported.wait(5)
+    assert exporter.batches == [["root", "child"]]
+    provider.shutdown()
+
+
+def test_error_span_is_exported_at_once():
+    exporter = _RecordingExporter()
+    provider, tracer = _tracer(AdaptiveBatchSpanProcessor(exporter, schedule_delay_millis=60_000))
+
+    root = tracer.start_span("root")
+    failed = tracer.start_span("tool", context=trace.set_span_in_context(root))
+    failed.set_status(Status(StatusCode.ERROR))
+    failed.end()
+    assert exporter.exported.wait(5)
+    assert exporter.batches == [["tool"]]
+    root.end()
+    provider.shutdown()
+
+
+def _fill_while_exporting(policy, gate, **kwargs):
+    """Ends a root span, then four children while its export is held at `gate`; returns the exporter"""
+    exporter = _RecordingExporter(gate)
+    processor = AdaptiveBatchSpanProcessor(
+        exporter, max_queue_size=2, max_export_batch_size=2, schedule_delay_millis=60_000,
+        drop_policy=policy, **kwargs,
+    )
+    provider, tracer = _tracer(processor)
+    root = tracer.start_span("root")
+    root.end()
+    assert exporter.exporting.wait(5)
+    for i in range(4):
+        tracer.start_span(f"c{i}", context=trace.set_span_in_context(root)).end()
+    gate.set()
+    provider.shutdown()
+    return exporter
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_newest", ["c0", "c1"]), ("drop_oldest", ["c2", "c3"])])
+def test_full_queue_follows_drop_policy(policy, kept):
+    exporter = _fill_while_exporting(policy, threading.Event())
+    assert exporter.names() == ["root", *kept]
+
+
+def test_block_policy_waits_for_room_instead_of_dropping():
+    gate = threading.Event()
+    opener = threading.Timer(0.2, gate.set)
+    opener.start()
+    exporter = _fill_while_exporting("block", gate, block_timeout_millis=5000)
+    opener.join()
+    assert exporter.names() == ["root", "c0", "c1", "c2", "c3"]
+
+
+def test_block_policy_drops_after_timeout():
+    exporter = _fill_while_exporting("block", threading.Event(), block_timeout_millis=50)
+    assert exporter.names() == ["root", "c0", "c1"]
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from agensight.tracing import db
+
+# Run as its own process: tracing setup installs a global tracer provider
+POOL_JOB = textwrap.dedent("""
+    import json
+    import multiprocessing
+    import sys
+    from concurrent.futures import ProcessPoolExecutor
+
+    from opentelemetry import trace
+
+    from agensight.tracing.propagation import with_trace_context
+
+
+    def work(x):
+        with trace.get_tracer("worker").start_as_current_span("child"):
+            return x * 2
+
+
+    if __name__ == "__main__":
+        from agensight.tracing.setup import setup_tracing
+
+        tracer = setup_tracing("pool", exporter_type="db")
+        with tracer.start_as_current_span("parent"):
+            pool = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context(sys.argv[1]))
+            with pool:
+                result = pool.submit(with_trace_context(work), 21).result()
+        trace.get_tracer_provider().shutdown()
+        print(json.dumps(result))
+""")
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_trace_context_reaches_process_pool_worker(tmp_path, start_method):
+    script = tmp_path / "pool_job.py"
+    script.write_text(POOL_JOB)
+    path = tmp_path / "traces.db"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path), "AGENSIGHT_TRACE_DB": str(path)}
+    result = subprocess.run(
+        [sys.executable, str(script), start_method], capture_output=True, text=True, env=env, cwd=tmp_path, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == 42
+
+    conn = db.get_db(path)
+    try:
+        spans = {row["name"]: row for row in conn.execute("SELECT id, trace_id, parent_id, name FROM spans")}
+    finally:
+        conn.close()
+    assert spans["child"]["trace_id"] == spans["parent"]["trace_id"]
+    assert spans["child"]["parent_id"] == spans["parent"]["id"]
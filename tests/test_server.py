@@ -0,0 +1,210 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from agensight.server.app import app
+from agensight.server.static_files import CachedStaticFiles
+from agensight.server.utils import config_utils
+from agensight.server.utils.config_store import MemoryObjectStore, load_tree, store_config
+from agensight.tracing import db
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project directory with one agent, as the server's working directory"""
+    (tmp_path / "agensight.config.json").write_text(
+        json.dumps({"agents": [{"name": "Planner", "prompt": "Plan {task}"}], "connections": []})
+    )
+    monkeypatch.chdir(tmp_path)
+    config_utils.ensure_config_initialized()
+    return tmp_path
+
+
+@pytest.fixture
+def client(project):
+    return TestClient(app)
+
+
+def _agent(name, prompt="hello"):
+    return {"name": name, "prompt": prompt, "modelParams": {}}
+
+
+def test_config_if_none_match_returns_304(client):
+    response = client.get("/api/config", params={"version": "1.0.0"})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    cached = client.get("/api/config", params={"version": "1.0.0"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+
+def test_stale_if_match_returns_409_with_current_etag(client):
+    etag = client.get("/api/config", params={"version": "1.0.0"}).headers["ETag"]
+    body = {"agent": _agent("Planner", "first edit"), "config_version": "1.0.0"}
+
+    first = client.post("/api/update_agent", json=body, headers={"If-Match": etag})
+    assert first.status_code == 200
+    current = first.headers["ETag"]
+    assert current != etag
+
+    body["agent"] = _agent("Planner", "second edit from a stale copy")
+    stale = client.post("/api/update_agent", json=body, headers={"If-Match": etag})
+    assert stale.status_code == 409
+    assert stale.headers["ETag"] == current
+    assert client.get("/api/config", params={"version": "1.0.0"}).headers["ETag"] == current
+
+    # Nothing was written by the rejected edit
+    agents = client.get("/api/config", params={"version": "1.0.0"}).json()["agents"]
+    assert [a["prompt"] for a in agents if a["name"] == "Planner"] == ["first edit"]
+
+
+def test_concurrent_update_agent_loses_no_updates(project):
+    names = [f"Agent {i}" for i in range(16)]
+    errors = []
+    start = threading.Barrier(len(names))
+
+    def update(name):
+        try:
+            start.wait()
+            config_utils.update_agent(_agent(name), version="1.0.0")
+        except Exception as e:  # surfaced below; a thread can't fail the test itself
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    agents = {agent["name"] for agent in config_utils.get_version("1.0.0")["agents"]}
+    assert agents == {"Planner", *names}
+
+
+def test_concurrent_edits_with_same_if_match_let_only_one_win(client):
+    etag = client.get("/api/config", params={"version": "1.0.0"}).headers["ETag"]
+    statuses = []
+    start = threading.Barrier(8)
+
+    def edit(i):
+        start.wait()
+        response = client.post(
+            "/api/update_agent",
+            json={"agent": _agent("Planner", f"edit {i}"), "config_version": "1.0.0"},
+            headers={"If-Match": etag},
+        )
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=edit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200] + [409] * 7
+
+
+def test_legacy_config_unknown_version_falls_back_to_main_config(client):
+    config_utils.write_main_config({"agents": [_agent("Main only")], "connections": []})
+
+    config = client.get("/flask-compat/api/config", params={"version": "9.9.9"}).json()
+    assert [agent["name"] for agent in config["agents"]] == ["Main only"]
+
+
+def test_config_tree_round_trips_without_agents():
+    store = MemoryObjectStore()
+    assert load_tree(store_config({"connections": []}, store), store) == {"connections": []}
+
+    config = {"agents": [_agent("A")], "connections": []}
+    assert load_tree(store_config(config, store), store) == config
+
+
+def test_prune_config_objects_keeps_only_referenced_objects(project):
+    # Only the prompt changes, so only the old prompt's object is left unreferenced
+    config_utils.update_agent({"name": "Planner", "prompt": "rewritten in place"}, version="1.0.0")
+    store = config_utils.get_object_store()
+    before = set(store.digests())
+
+    assert config_utils.prune_config_objects() == 1
+    after = set(store.digests())
+    assert after < before
+    assert config_utils.get_version("1.0.0")["agents"][0]["prompt"] == "rewritten in place"
+    assert config_utils.prune_config_objects() == 0
+
+
+def test_waiting_config_write_does_not_block_other_requests(project, monkeypatch):
+    monkeypatch.setattr(db, "DB_FILE", project / "traces.db")
+    # Entered, the client serves every request from one event loop, like the server
+    with TestClient(app) as client:
+        _check_write_waits_off_the_event_loop(client)
+
+
+def _check_write_waits_off_the_event_loop(client):
+    release = threading.Event()
+    locked = threading.Event()
+
+    def hold_writer():
+        with config_utils.config_writer():
+            locked.set()
+            release.wait(10)
+
+    holder = threading.Thread(target=hold_writer)
+    holder.start()
+    locked.wait(5)
+    writer = threading.Thread(
+        target=client.post,
+        args=("/api/update_agent",),
+        kwargs={"json": {"agent": _agent("Waiting"), "config_version": "1.0.0"}},
+    )
+    writer.start()
+    time.sleep(0.3)  # Let the write reach the lock
+    try:
+        health = []
+        reader = threading.Thread(target=lambda: health.append(client.get("/metrics").status_code))
+        reader.start()
+        reader.join(5)
+        assert health == [200]
+    finally:
+        release.set()
+        holder.join()
+        writer.join()
+
+
+def test_weak_if_match_is_rejected(client):
+    etag = client.get("/api/config", params={"version": "1.0.0"}).headers["ETag"]
+    body = {"agent": _agent("Planner", "edit"), "config_version": "1.0.0"}
+
+    weak = client.post("/api/update_agent", json=body, headers={"If-Match": f"W/{etag}"})
+    assert weak.status_code == 409
+    assert client.post("/api/update_agent", json=body, headers={"If-Match": etag}).status_code == 200
+
+
+def _static_client(root):
+    return TestClient(Starlette(routes=[Mount("/", CachedStaticFiles(directory=root))]))
+
+
+def test_static_files_serve_fresh_precompressed_sibling_only(tmp_path):
+    (tmp_path / "app.js").write_text("console.log('new');" * 100)
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress(b"console.log('new');" * 100))
+    client = _static_client(tmp_path)
+
+    fresh = client.get("/app.js", headers={"Accept-Encoding": "gzip"})
+    assert fresh.headers["Content-Encoding"] == "gzip"
+    assert fresh.headers["Vary"] == "Accept-Encoding"
+    assert fresh.text == "console.log('new');" * 100
+
+    # The sibling from a previous build is older than the file it stood for
+    stat = (tmp_path / "app.js").stat()
+    os.utime(tmp_path / "app.js.gz", (stat.st_atime, stat.st_mtime - 60))
+    stale = client.get("/app.js", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in stale.headers
+    assert stale.text == "console.log('new');" * 100
@@ -0,0 +1,402 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import Status, StatusCode
+
+from agensight.server.app import app
+from agensight.server.routes import stream
+from agensight.tracing import db
+from agensight.tracing.compression import MIN_COMPRESS_BYTES, deflate, inflate
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.token_propagator import TokenPropagator
+
+
+@pytest.fixture
+def trace_db(tmp_path, monkeypatch):
+    path = tmp_path / "traces.db"
+    monkeypatch.setattr(db, "DB_FILE", path)
+    db.init_schema(path)
+    return path
+
+
+@pytest.fixture
+def client(trace_db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def tracer(trace_db):
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(DBSpanExporter()))
+    yield provider.get_tracer("test")
+    provider.shutdown()
+
+
+def _span_id(span):
+    return format(span.get_span_context().span_id, "016x")
+
+
+def test_traces_list_304_until_a_trace_changes(trace_db, client):
+    conn = db.get_db(trace_db)
+    conn.execute("INSERT INTO traces (id, name, started_at, ended_at) VALUES ('t1', 'run', 1.0, 2.0)")
+    conn.commit()
+
+    first = client.get("/api/traces")
+    etag = first.headers["ETag"]
+    assert [t["session_id"] for t in first.json()] == [None]
+    assert client.get("/api/traces", headers={"If-None-Match": etag}).status_code == 304
+
+    # Neither the row count nor the token total changes
+    assert db.link_trace_session(conn, "t1", "s1")
+    conn.commit()
+    changed = client.get("/api/traces", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [t["session_id"] for t in changed.json()] == ["s1"]
+
+    conn.execute("UPDATE traces SET cost = 0.5 WHERE id = 't1'")
+    conn.commit()
+    assert client.get("/api/traces", headers={"If-None-Match": changed.headers["ETag"]}).status_code == 200
+    conn.close()
+
+
+def test_span_attributes_round_trip_through_message_rows(trace_db, client, tracer):
+    io = {
+        "prompts": [{"role": "user", "content": "Plan a trip " * 50}],
+        "completions": [{
+            "role": "assistant", "content": "Day 1: Paris", "finish_reason": "stop",
+            "completion_tokens": 5, "prompt_tokens": 100, "total_tokens": 105,
+        }],
+    }
+    extended = {**io, "input": "a trip", "metadata": {"step": 2}}
+    with tracer.start_as_current_span("run"):
+        with tracer.start_as_current_span("Planner") as plain:
+            plain.set_attribute("gen_ai.normalized_input_output", json.dumps(io))
+        with tracer.start_as_current_span("Presenter") as extra:
+            extra.set_attribute("gen_ai.normalized_input_output", json.dumps(extended))
+        with tracer.start_as_current_span("openai.chat") as llm:
+            llm.set_attribute("gen_ai.request.model", "gpt-4o-mini")
+            llm.set_attribute("gen_ai.prompt.0.role", "user")
+            llm.set_attribute("gen_ai.prompt.0.content", "Hello")
+            llm.set_attribute("gen_ai.completion.0.role", "assistant")
+            llm.set_attribute("gen_ai.completion.0.content", "Hi there")
+
+    conn = db.get_db(trace_db)
+    stored = {
+        row["name"]: json.loads(inflate(row["attributes"]))
+        for row in conn.execute("SELECT name, attributes FROM spans")
+    }
+    conn.close()
+    # Slimmed when the rows rebuild it exactly, kept inline otherwise
+    assert "gen_ai.normalized_input_output" not in stored["Planner"]
+    assert "gen_ai.prompt.0.content" not in stored["openai.chat"]
+    assert json.loads(stored["Presenter"]["gen_ai.normalized_input_output"]) == extended
+
+    for span in (plain, extra):
+        attributes = client.get(f"/api/span/{_span_id(span)}/attributes").json()
+        assert attributes == dict(span.attributes)
+    attributes = client.get(f"/api/span/{_span_id(llm)}/attributes").json()
+    assert {k: attributes[k] for k in llm.attributes} == dict(llm.attributes)
+
+
+def test_deflate_round_trips_large_values_and_keeps_small_ones_plain():
+    text = "Let me know if you have any other questions about your booking. " * 20
+    packed = deflate(text)
+    assert isinstance(packed, bytes) and len(packed) < len(text)
+    assert inflate(packed) == text
+
+    small = "x" * (MIN_COMPRESS_BYTES - 1)
+    assert deflate(small) == small
+    assert inflate(small) == small
+    assert inflate(None) is None
+
+
+def test_exported_messages_are_stored_compressed_and_served_inflated(trace_db, client, tracer):
+    question = "Compare the two proposals and list the trade-offs of each approach. " * 20
+    with tracer.start_as_current_span("openai.chat") as llm:
+        llm.set_attribute("gen_ai.prompt.0.role", "user")
+        llm.set_attribute("gen_ai.prompt.0.content", question)
+        llm.set_attribute("gen_ai.completion.0.role", "assistant")
+        llm.set_attribute("gen_ai.completion.0.content", "Proposal A")
+
+    conn = db.get_db(trace_db)
+    assert isinstance(conn.execute("SELECT content FROM prompts").fetchone()[0], bytes)
+    assert conn.execute("SELECT content FROM completions").fetchone()[0] == "Proposal A"
+    conn.close()
+
+    details = client.get(f"/api/span/{_span_id(llm)}/details").json()
+    assert [p["content"] for p in details["prompts"]] == [question]
+    assert [c["content"] for c in details["completions"]] == ["Proposal A"]
+
+
+def test_legacy_plain_text_rows_are_read_as_stored(trace_db, client):
+    # Written before compression and slimming: plain TEXT, messages inline in the attributes
+    question = "Plan a trip to Lima. " * 30
+    attrs = {"gen_ai.prompt.0.role": "user", "gen_ai.prompt.0.content": question}
+    conn = db.get_db(trace_db)
+    conn.execute("INSERT INTO traces (id, name, started_at, ended_at) VALUES ('t1', 'run', 1.0, 2.0)")
+    conn.execute(
+        "INSERT INTO spans (id, trace_id, name, started_at, ended_at, duration, attributes) "
+        "VALUES ('s1', 't1', 'openai.chat', 1.0, 2.0, 1.0, ?)",
+        (json.dumps(attrs),),
+    )
+    conn.execute("INSERT INTO prompts (span_id, role, content, message_index) VALUES ('s1', 'user', ?, 0)", (question,))
+    conn.commit()
+    conn.close()
+
+    assert client.get("/api/span/s1/attributes").json() == attrs
+    assert [p["content"] for p in client.get("/api/span/s1/details").json()["prompts"]] == [question]
+    assert client.get("/api/traces/t1/spans").status_code == 200
+
+
+class _Request:
+    """Stands in for a client that stays connected for `polls` polls"""
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    async def is_disconnected(self):
+        self.polls -= 1
+        return self.polls < 0
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def _sse_events(chunks):
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+def test_span_stream_resumes_after_last_event_id(trace_db, client, monkeypatch):
+    conn = db.get_db(trace_db)
+    conn.execute("INSERT INTO traces (id, name, started_at, ended_at) VALUES ('t1', 'run', 1.0, 2.0)")
+    for i in range(3):
+        conn.execute(
+            "INSERT INTO spans (rowid, id, trace_id, name, started_at, ended_at) VALUES (?, ?, 't1', 'step', 1.0, 2.0)",
+            (i + 1, f"s{i + 1}"),
+        )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(stream, "POLL_INTERVAL", 0)
+    events = _sse_events(asyncio.run(_collect(stream._span_events(_Request(1), 1, None))))
+    assert [(name, event_id, data["id"]) for name, event_id, data in events] == [
+        ("span", "2", "s2"), ("span", "3", "s3"), ("trace", None, "t1"),
+    ]
+
+    # The header a reconnecting EventSource sends takes precedence over ?after=
+    cursors = []
+
+    async def record_cursor(request, after, trace_id):
+        cursors.append(after)
+        yield "retry: 0\n\n"
+
+    monkeypatch.setattr(stream, "_span_events", record_cursor)
+    client.get("/api/stream/spans", params={"after": 0}, headers={"Last-Event-ID": "3"})
+    client.get("/api/stream/spans", params={"after": 1})
+    assert cursors == [3, 1]
+
+
+def _llm_call(tracer, prompt_tokens, completion_tokens, error=False, context=None):
+    with tracer.start_as_current_span("openai.chat", context=context) as span:
+        span.set_attribute("gen_ai.request.model", "unpriced-model")
+        span.set_attribute("gen_ai.usage.prompt_tokens", prompt_tokens)
+        span.set_attribute("gen_ai.usage.completion_tokens", completion_tokens)
+        span.set_attribute("llm.usage.total_tokens", prompt_tokens + completion_tokens)
+        span.set_attribute("gen_ai.completion.0.role", "assistant")
+        span.set_attribute("gen_ai.completion.0.content", "ok")
+        if error:
+            span.set_status(Status(StatusCode.ERROR))
+
+
+def test_session_rollups_add_up_across_export_batches(trace_db, client, tracer):
+    # One span per export: every trace's rollup is folded in over several batches
+    for tokens, error in ((100, False), (250, True)):
+        with tracer.start_as_current_span("run") as root:
+            root.set_attribute("session.id", "s1")
+            _llm_call(tracer, tokens, 0, error)
+            _llm_call(tracer, 5, 5)
+    with tracer.start_as_current_span("run"):
+        _llm_call(tracer, 1, 1)
+
+    session = client.get("/api/sessions/s1").json()
+    assert len(session["traces"]) == 2
+    rollup = session["session"]
+    assert rollup["trace_count"] == 2
+    assert rollup["total_tokens"] == 370
+    assert rollup["error_count"] == 1
+    assert rollup["first_seen"] == min(t["started_at"] for t in session["traces"])
+    assert rollup["last_seen"] == max(t["ended_at"] for t in session["traces"])
+
+    # The same aggregates as recomputing them from scratch
+    conn = db.get_db(trace_db)
+    try:
+        db.rebuild_sessions(conn)
+        rebuilt = dict(conn.execute("SELECT * FROM sessions WHERE id = 's1'").fetchone())
+    finally:
+        conn.close()
+    assert rebuilt == pytest.approx(rollup)
+
+
+def test_usage_rolls_up_across_threads_and_counts_once(trace_db):
+    provider = TracerProvider()
+    propagator = TokenPropagator()
+    provider.add_span_processor(propagator)
+    provider.add_span_processor(SimpleSpanProcessor(DBSpanExporter()))
+    tracer = provider.get_tracer("test")
+
+    with tracer.start_as_current_span("run") as root:
+        with tracer.start_as_current_span("Planner") as agent:
+            # Started and ended in a thread that doesn't carry the agent's context
+            parent = trace.set_span_in_context(agent)
+            worker = threading.Thread(target=_llm_call, args=(tracer, 60, 40), kwargs={"context": parent})
+            worker.start()
+            worker.join()
+        _llm_call(tracer, 15, 5)
+    provider.shutdown()
+
+    assert propagator.trace_usage(format(root.get_span_context().trace_id, "032x"))["total_tokens"] == 120
+    conn = db.get_db(trace_db)
+    try:
+        attrs = {
+            row["name"]: json.loads(inflate(row["attributes"]))
+            for row in conn.execute("SELECT name, attributes FROM spans WHERE name IN ('run', 'Planner')")
+        }
+        own_tokens = conn.execute("SELECT TOTAL(tokens) FROM spans").fetchone()[0]
+        trace_tokens = conn.execute("SELECT total_tokens FROM traces").fetchone()[0]
+    finally:
+        conn.close()
+    assert attrs["Planner"]["llm.usage.total_tokens"] == 100
+    assert attrs["run"]["llm.usage.total_tokens"] == 120
+    assert attrs["run"]["gen_ai.usage.prompt_tokens"] == 75
+    assert own_tokens == 120
+    assert trace_tokens == 120
+
+
+def _insert_trace(path, spans):
+    """A trace 't1' with `spans` as (id, parent_id, name, started_at, ended_at, status, tokens, cost) rows"""
+    conn = db.get_db(path)
+    conn.execute("INSERT INTO traces (id, name, started_at, ended_at) VALUES ('t1', 'run', 0.0, 100.0)")
+    conn.executemany(
+        "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, status, tokens, cost) "
+        "VALUES (?1, 't1', ?2, ?3, ?4, ?5, ?5 - ?4, ?6, ?7, ?8)",
+        spans,
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_timeline_merges_narrow_spans_until_zoomed_in(trace_db, client):
+    spans = [("root", None, "run", 0.0, 100.0, "StatusCode.UNSET", None, None)]
+    for i in range(1000):
+        status = db.ERROR_STATUS if i == 500 else "StatusCode.UNSET"
+        spans.append((f"s{i}", "root", "tool", 10 + i * 0.05, 10 + i * 0.05 + 0.01, status, None, None))
+    spans.append(("summary", "root", "openai.chat", 70.0, 90.0, "StatusCode.UNSET", None, None))
+    _insert_trace(trace_db, spans)
+
+    timeline = client.get("/api/traces/t1/timeline", params={"width": 100}).json()
+    assert timeline["span_count"] == timeline["visible_spans"] == 1002
+    lanes = {lane["depth"]: lane["bars"] for lane in timeline["lanes"]}
+    assert [bar["id"] for bar in lanes[0]] == ["root"]
+    aggregate, summary = lanes[1]
+    assert (aggregate["id"], aggregate["name"], aggregate["count"], aggregate["errors"]) == (None, "tool", 1000, 1)
+    assert (summary["id"], summary["count"], summary["x"], summary["w"]) == ("summary", 1, 70.0, 20.0)
+
+    zoomed = client.get("/api/traces/t1/timeline", params={"width": 100, "start": 10, "end": 10.12}).json()
+    assert zoomed["visible_spans"] == 4
+    assert [bar["id"] for lane in zoomed["lanes"] for bar in lane["bars"]] == ["root", "s0", "s1", "s2"]
+
+    assert client.get("/api/traces/t1/timeline", params={"start": 5, "end": 5}).status_code == 400
+    assert client.get("/api/traces/missing/timeline").status_code == 404
+
+
+def test_tree_pages_children_with_subtree_summaries(trace_db, client):
+    ok = "StatusCode.UNSET"
+    _insert_trace(trace_db, [
+        ("root", None, "run", 0.0, 10.0, ok, None, None),
+        ("a", "root", "Planner", 1.0, 4.0, ok, None, None),
+        ("a1", "a", "openai.chat", 1.0, 2.0, ok, 100, 0.01),
+        ("a2", "a", "openai.chat", 2.0, 4.0, db.ERROR_STATUS, 50, 0.02),
+        ("b", "root", "Writer", 5.0, 6.0, ok, 30, 0.03),
+        ("c", "root", "Critic", 7.0, 9.0, ok, None, None),
+    ])
+
+    top = client.get("/api/traces/t1/tree").json()
+    assert [span["id"] for span in top["children"]] == ["root"]
+    assert top["children"][0]["subtree"] == {
+        "descendant_count": 5, "error_count": 1, "total_duration": 19.0, "tokens": 180, "cost": pytest.approx(0.06),
+    }
+
+    first = client.get("/api/traces/t1/tree", params={"node": "root", "limit": 2}).json()
+    assert first["node"]["id"] == "root"
+    assert [span["id"] for span in first["children"]] == ["a", "b"]
+    assert first["children"][0]["subtree"]["descendant_count"] == 2
+    assert first["children"][0]["subtree"]["tokens"] == 150
+    assert first["children"][1]["subtree"]["descendant_count"] == 0
+
+    rest = client.get("/api/traces/t1/tree", params={"node": "root", "limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [span["id"] for span in rest["children"]] == ["c"]
+    assert rest["next_cursor"] is None
+
+    assert client.get("/api/traces/t1/tree", params={"node": "missing"}).status_code == 404
+
+
+def test_fill_span_tokens_sums_completions_of_leaf_spans(trace_db):
+    ok = "StatusCode.UNSET"
+    _insert_trace(trace_db, [
+        ("root", None, "run", 0.0, 10.0, ok, None, None),
+        ("leaf", "root", "openai.chat", 1.0, 2.0, ok, None, None),
+        ("counted", "root", "openai.chat", 2.0, 3.0, ok, 7, None),
+        ("quiet", "root", "tool", 3.0, 4.0, ok, None, None),
+    ])
+    conn = db.get_db(trace_db)
+    try:
+        conn.executemany(
+            "INSERT INTO completions (span_id, role, content, total_tokens) VALUES (?, 'assistant', 'ok', ?)",
+            [("root", 100), ("leaf", 30), ("leaf", 20), ("counted", 99)],
+        )
+        db.fill_span_tokens(conn)
+        tokens = dict(conn.execute("SELECT id, tokens FROM spans").fetchall())
+    finally:
+        conn.close()
+    assert tokens == {"root": None, "leaf": 50, "counted": 7, "quiet": None}
+
+
+def test_batch_details_cover_more_ids_than_one_query_chunk(trace_db, client):
+    ok = "StatusCode.UNSET"
+    ids = [f"s{i:03}" for i in range(600)]
+    _insert_trace(trace_db, [(span_id, None, "openai.chat", float(i), i + 0.5, ok, None, None) for i, span_id in enumerate(ids)])
+    conn = db.get_db(trace_db)
+    conn.executemany(
+        "INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, 'user', ?, 0)",
+        [(span_id, f"question {span_id}") for span_id in ids],
+    )
+    conn.executemany("INSERT INTO tools (span_id, name, arguments) VALUES (?, 'search', '{}')", [(ids[-1],)])
+    conn.commit()
+    conn.close()
+
+    details = client.post("/api/spans/details", json={"span_ids": ids}).json()["spans"]
+    assert list(details) == ids
+    assert all(details[span_id]["prompts"][0]["content"] == f"question {span_id}" for span_id in ids)
+    assert [tool["name"] for tool in details[ids[-1]]["tools"]] == ["search"]
+
+    page = client.post("/api/spans/details", json={"trace_id": "t1", "limit": 400}).json()
+    assert list(page["spans"]) == ids[:400]
+    rest = client.post("/api/spans/details", json={"trace_id": "t1", "limit": 400, "cursor": page["next_cursor"]}).json()
+    assert list(rest["spans"]) == ids[400:]
+    assert rest["next_cursor"] is None
+
+    too_many = [f"x{i}" for i in range(1001)]
+    assert client.post("/api/spans/details", json={"span_ids": too_many}).status_code == 400
+    assert client.post("/api/spans/details", json={}).status_code == 400
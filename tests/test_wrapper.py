@@ -0,0 +1,33 @@
+import pytest
+
+from agensight.tracing.usage import guarded
+
+
+def _wrap_depth(func):
+    depth = 0
+    while hasattr(func, "__wrapped__"):
+        func = func.__wrapped__
+        depth += 1
+    return depth
+
+
+def test_guarded_wraps_once():
+    def create():
+        return "ok"
+
+    once = guarded(create)
+    assert guarded(once) is once
+    assert once() == "ok"
+
+
+def test_openai_instrumentation_is_idempotent():
+    pytest.importorskip("openai")
+    from openai.resources.chat.completions import AsyncCompletions, Completions
+
+    from agensight.integrations import openai_tracer
+
+    openai_tracer._instrument(None)
+    depths = (_wrap_depth(Completions.create), _wrap_depth(AsyncCompletions.create))
+    openai_tracer._instrument(None)
+    openai_tracer._instrument(None)
+    assert (_wrap_depth(Completions.create), _wrap_depth(AsyncCompletions.create)) == depths